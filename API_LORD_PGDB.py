@@ -1,17 +1,24 @@
-# Importing the required libraries:  Check env for libraries, pip ls.  If missing install the following libraries: "pip install fastapi" and "pip install psycopg2"
+# Importing the required libraries:  Check env for libraries, pip ls.  If missing install the following libraries: "pip install fastapi" and "pip install "psycopg[binary,pool]"" and "pip install orjson" (optional: "pip install brotli msgpack pyarrow")
 # How to run the API:  Run the API by executing the following command in the terminal: "uvicorn API_LORD_PGDB:app --reload"
-from fastapi import FastAPI, HTTPException
-import psycopg2
+# After reloading the database by hand, clear the response cache with: "curl -X POST http://127.0.0.1:8000/cache/invalidate"
+# (that reaches one worker; with "--workers N" run UPDATE "DataVersion" SET "Version" = "Version" + 1 instead, every worker
+# clears its cache within CACHE_VERSION_CHECK seconds.  load_to_postgres.py and incremental_sync.py do both.)
+from fastapi import FastAPI, HTTPException, Query, Request
+import psycopg
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+from contextlib import asynccontextmanager
 from typing import List, Dict
 import json
+import time
 # import os
 # from dotenv import load_dotenv
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.openapi.docs import get_redoc_html
-import re
 from config import DBpassword
-
-app = FastAPI(description="API Endpoints for recreational facilities")
+from api_metrics import METRICS_MEDIA_TYPE, MetricsMiddleware, TimedCursor, configure_slow_query_log, render_metrics
+from api_responses import CompressionMiddleware, ORJSONResponse, dumps, rows_response
+from response_cache import DATA_VERSION_QUERY, ResponseCache, ResponseCacheMiddleware
+from spatial_index import GridIndex, cluster_cell_degrees, snap_bbox
 
 # Database connection configuration
 DB_HOST = "localhost"  
@@ -19,13 +26,119 @@ DB_NAME = "LORD"
 DB_USER = "postgres"      
 DB_PASSWORD = DBpassword  # Replace with your actual database password
 
-# Function to try connection to the database and returne conn if successful and error if not
+# Connection pool configuration
+DB_POOL_MIN_SIZE = 2  # connections kept open even when the API is idle
+DB_POOL_MAX_SIZE = 10  # keep well below the Postgres max_connections
+DB_POOL_TIMEOUT = 10  # seconds a request waits for a free connection
+DB_POOL_MAX_LIFETIME = 30 * 60  # seconds before a connection is recycled
+DB_POOL_MAX_IDLE = 5 * 60  # seconds an idle connection above min_size is kept
+
+# Response cache configuration, the data only changes when the ETL reloads it.  Each worker process has its own cache.
+CACHE_MAX_ENTRIES = 256  # distinct endpoint + query combinations kept in memory
+CACHE_MAX_BYTES = 256 * 1024 * 1024  # response bytes kept in memory per worker, one /campsites body can be tens of MB
+CACHE_TTL = 60 * 60  # seconds before a cached response is rebuilt even without an invalidation
+CACHE_VERSION_CHECK = 5  # seconds between reads of "DataVersion", how workers that missed POST /cache/invalidate see a reload
+                         # (the response cache and the spatial index of /facilities/nearby and /facilities/bbox)
+CACHED_PATHS = ["/facilities", "/campsites", "/campsites/query", "/activities", "/facilities/clusters", "/search"]
+
+# Response compression (gzip, or Brotli when the client accepts it and the brotli package is installed)
+COMPRESS_MIN_SIZE = 1000  # bytes, smaller responses are sent as they are
+GZIP_LEVEL = 6  # 9 is barely smaller on JSON and much slower on the multi-megabyte /all_* responses
+BROTLI_QUALITY = 5
+
+# Slow-query log: queries slower than this are written with their EXPLAIN plan (GET /metrics counts them)
+SLOW_QUERY_MS = 500
+SLOW_QUERY_LOG_FILE = "slow_queries.log"  # opened on startup in the working directory; None logs to stderr only
+
+# Paging configuration for the /all_* endpoints
+MAX_PAGE_SIZE = 10000  # largest limit a client may ask for
+STREAM_BATCH_SIZE = 2000  # rows fetched from the server-side cursor per round trip when streaming
+
+# Spatial queries (/facilities/nearby and /facilities/bbox)
+MAX_NEARBY_RADIUS_KM = 500  # largest radius_km a client may ask for
+DEFAULT_NEARBY_LIMIT = 100
+MAX_MAP_ZOOM = 18  # deepest zoom level of the map tiles
+
+# Full-text search (/search), over the "FacilitySearch" view from DBSetup/migrations/005
+SEARCH_CONFIG = "english"  # text search configuration the view's tsvector was built with
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+# Filtered campsite queries (/campsites/query), backed by the indexes of DBSetup/migrations/007
+DEFAULT_QUERY_LIMIT = 100
+
+# Keyset columns used to page through each table in a stable order: the primary key, or a natural key where the table has none
+TABLE_KEYS = {
+    "Facilities": ["FacilityID"],
+    "Campsites": ["CampsiteID"],
+    "Activities": ["FacilityID", "ActivityID"],
+    "CampSiteAttribute": ["CampsiteID", "AttributeName"],
+    "PermittedEquipment": ["CampsiteID", "EquipmentName"],
+    "FacilityAddresses": ["FacilityAddressID"],
+}
 
-def get_db_connection():
+# One async pool shared by every endpoint, so queries await the socket instead of blocking the event loop and
+# concurrent requests overlap their I/O.  check_connection runs a health check when a connection is handed out,
+# and prepare_threshold=0 makes psycopg prepare every statement server side on first use so plans are cached per connection.
+# TimedCursor records the time and rows of every query for /metrics and logs the slow ones.
+pool = AsyncConnectionPool(
+    kwargs={"host": DB_HOST, "dbname": DB_NAME, "user": DB_USER, "password": DB_PASSWORD, "prepare_threshold": 0,
+            "cursor_factory": TimedCursor},
+    min_size=DB_POOL_MIN_SIZE,
+    max_size=DB_POOL_MAX_SIZE,
+    timeout=DB_POOL_TIMEOUT,
+    max_lifetime=DB_POOL_MAX_LIFETIME,
+    max_idle=DB_POOL_MAX_IDLE,
+    check=AsyncConnectionPool.check_connection,
+    open=False,
+)
+
+async def read_data_version():
+    """Returns the "DataVersion" the loaders bump on every reload, or None before the first reload or when the database is down."""
+    try:
+        async with pool.connection(timeout=1) as conn:  # short, a cache hit should not wait out DB_POOL_TIMEOUT
+            cur = await conn.execute(DATA_VERSION_QUERY)
+            row = await cur.fetchone()
+    except (PoolTimeout, psycopg.Error):
+        return None
+    return row[0] if row else None
+
+# In-memory index of facility locations, used when the database has no PostGIS (see DBSetup/migrations/002)
+facility_index = GridIndex()
+
+@asynccontextmanager
+async def lifespan(app):
+    configure_slow_query_log(SLOW_QUERY_MS / 1000, SLOW_QUERY_LOG_FILE)
+    app.state.use_postgis = False
+    app.state.spatial_loaded = False
+    app.state.spatial_version = None  # "DataVersion" the spatial index was built from
+    app.state.spatial_version_checked_at = 0.0
+    await pool.open()
     try:
-        conn = psycopg2.connect(host=DB_HOST, database=DB_NAME, user=DB_USER, password=DB_PASSWORD)
-        return conn
-    except Exception as e:
+        await refresh_spatial_index()
+    except HTTPException as e:  # the database is not reachable yet
+        print(f"Spatial index not loaded at startup, will retry on the first spatial query: {e.detail}")
+    yield
+    await pool.close()
+
+app = FastAPI(description="API Endpoints for recreational facilities", lifespan=lifespan, default_response_class=ORJSONResponse)
+
+# Compression is added first so it runs inside the cache: cached responses are stored already compressed, per Accept-Encoding
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESS_MIN_SIZE, compresslevel=GZIP_LEVEL, brotli_quality=BROTLI_QUALITY)
+response_cache = ResponseCache(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES,
+                               version_check_interval=CACHE_VERSION_CHECK)
+app.add_middleware(ResponseCacheMiddleware, cache=response_cache, paths=CACHED_PATHS, read_version=read_data_version)
+# Added last so it is the outermost middleware and its latencies include cache hits and compression
+app.add_middleware(MetricsMiddleware)
+
+# Function to borrow a connection from the pool and return it when the request is done, raises an error if none is available
+
+@asynccontextmanager
+async def get_db_connection():
+    try:
+        async with pool.connection() as conn:
+            yield conn
+    except (PoolTimeout, psycopg.OperationalError) as e:
         raise HTTPException(status_code=500, detail=f"Database connection error: {e}")
 
 def create_full_description(summary, path, base_url = "http://127.0.0.1:8000"):
@@ -70,10 +183,20 @@ async def redoc():
         openapi_url="/openapi.json", title="API documentation"
     )
 
+@app.post("/cache/invalidate", include_in_schema=False, summary="Clear cached responses after a data reload (local callers only)")
+async def invalidate_cache(request: Request):
+    if request.client is None or request.client.host not in ("127.0.0.1", "::1", "localhost"):
+        raise HTTPException(status_code=403, detail="Cache invalidation is only allowed from the API host")
+    response_cache.clear()
+    app.state.spatial_loaded = False  # the facilities were reloaded, rebuild the spatial index on the next query
+    return {"status": "cleared"}
+
+@app.get("/metrics", include_in_schema=False, summary="Request, database and connection pool metrics in the Prometheus text format")
+async def read_metrics():
+    return PlainTextResponse(render_metrics(pool.get_stats()), media_type=METRICS_MEDIA_TYPE)
+
 @app.get("/facilities", response_model=List[Dict], summary="Read Facilities (optional filters by state and ADA accessibility)")
 async def read_facilities(state: str = None, ada_accessible: bool = None):
-    conn = get_db_connection()
-    cur = conn.cursor()
     query = """
         SELECT
             f."FacilityID",
@@ -82,63 +205,305 @@ async def read_facilities(state: str = None, ada_accessible: bool = None):
             f."FacilityLongitude",
             f."GEOJSON",
             f."FacilityAdaAccess",
-            a."AddressStateCode",
+            f."AddressStateCode",
             f."Reservable"
-        FROM "Facilities" AS f
-        LEFT JOIN "FacilityAddresses" AS a ON f."FacilityID" = a."FacilityID"
+        FROM "FacilitiesWithState" AS f
         WHERE f."FacilityLongitude" !=0 
     """
 
     conditions = []
+    params = []
     if state:
-      conditions.append(f""" a."AddressStateCode" = '{state}'""")
+      conditions.append(""" f."AddressStateCode" = %s""")
+      params.append(state)
 
     if ada_accessible is not None:
         if ada_accessible == True:
-            conditions.append(""" f."FacilityAdaAccess" LIKE '%Y%' """)
+            conditions.append(""" f."AdaAccessible" """)
         else:
-           conditions.append(""" f."FacilityAdaAccess" NOT LIKE '%Y%' """)
+           conditions.append(""" NOT f."AdaAccessible" """)
 
 
     if conditions:
       query += " AND " + " AND ".join(conditions)
-    print(f"SQL Query: {query}") 
-    cur.execute(query)
-    rows = cur.fetchall()
-    conn.close()
+    async with get_db_connection() as conn:
+        cur = await conn.execute(query, params)
+        rows = await cur.fetchall()
 
     facilities = []
     for row in rows:
        if row[2] != 0.0 or row[3] != 0.0 :
-        try:
-          geojson = row[4] if row[4] else None
-          if geojson and isinstance(geojson, str):
-             geojson = re.sub(r"null", r"None", geojson, flags=re.IGNORECASE)
-             geojson = json.dumps(json.loads(geojson)) if geojson else None
-            #  geojson = json.loads(geojson)
-          else:
-            geojson = None
-        except json.JSONDecodeError:
-           geojson = None
-
         facility = {
             "FacilityID":row[0],
             "FacilityName":row[1],
             "FacilityLatitude":row[2],
             "FacilityLongitude":row[3],
-            "GEOJSON": geojson,
+            "GEOJSON": row[4],  # JSONB column, psycopg already returns it as a dict (or None)
             "FacilityAdaAccess": row[5],
             "AddressStateCode":row[6],
             "Reservable": row[7],
         }
         facilities.append(facility)
-      
-    return facilities      
 
-@app.get("/campsites", response_model=List[Dict], summary="Read Campsites (optional filters by state)")
-async def read_campsites(state:str = None):
-    conn = get_db_connection()
-    cur = conn.cursor()
+    # Returned as a response so FastAPI does not validate thousands of rows against List[Dict] again
+    return ORJSONResponse(facilities)
+
+# Facility columns returned by the spatial endpoints, with one state per facility instead of one row per address
+FACILITY_COLUMNS = """
+    f."FacilityID", f."FacilityName", f."FacilityLatitude", f."FacilityLongitude", f."GEOJSON", f."FacilityAdaAccess",
+    (SELECT a."AddressStateCode" FROM "FacilityAddresses" AS a WHERE a."FacilityID" = f."FacilityID" LIMIT 1) AS "AddressStateCode",
+    f."Reservable"
+"""
+# The expression indexed by "ix_Facilities_location" (PostGIS only), so the planner can use the GiST index
+FACILITY_POINT = """ST_SetSRID(ST_MakePoint(f."FacilityLongitude", f."FacilityLatitude"), 4326)::geography"""
+
+def facility_from_row(row):
+    return {
+        "FacilityID": row[0],
+        "FacilityName": row[1],
+        "FacilityLatitude": row[2],
+        "FacilityLongitude": row[3],
+        "GEOJSON": row[4],
+        "FacilityAdaAccess": row[5],
+        "AddressStateCode": row[6],
+        "Reservable": row[7],
+    }
+
+async def refresh_spatial_index():
+    """Checks for PostGIS and, without it, rebuilds the in-memory grid index from the facility coordinates."""
+    version = await read_data_version()  # read first: a reload during the rebuild is picked up by the next check
+    async with get_db_connection() as conn:
+        cur = await conn.execute("""SELECT 1 FROM pg_extension WHERE extname = 'postgis'""")
+        use_postgis = await cur.fetchone() is not None
+        if not use_postgis:
+            cur = await conn.execute("""
+                SELECT "FacilityID", "FacilityLatitude", "FacilityLongitude" FROM "Facilities"
+                WHERE NOT ("FacilityLatitude" = 0 AND "FacilityLongitude" = 0)
+            """)
+            facility_index.build(await cur.fetchall())
+    app.state.use_postgis = use_postgis
+    app.state.spatial_loaded = True
+    app.state.spatial_version = version
+    app.state.spatial_version_checked_at = time.monotonic()
+
+async def ensure_spatial_index():
+    """Loads the spatial index on the first spatial query, and rebuilds it when "DataVersion" changed since.
+
+    The version is read at most every CACHE_VERSION_CHECK seconds, as for the response cache, so every worker sees a
+    reload even when POST /cache/invalidate reached only one of them.
+    """
+    if app.state.spatial_loaded:
+        if time.monotonic() - app.state.spatial_version_checked_at < CACHE_VERSION_CHECK:
+            return
+        app.state.spatial_version_checked_at = time.monotonic()
+        version = await read_data_version()
+        if version is None or version == app.state.spatial_version:
+            return
+    await refresh_spatial_index()
+
+async def read_facilities_by_id(facility_ids):
+    """Reads the facilities with the given IDs, returned as a dictionary of FacilityID -> facility."""
+    async with get_db_connection() as conn:
+        cur = await conn.execute(f"""SELECT {FACILITY_COLUMNS} FROM "Facilities" AS f WHERE f."FacilityID" = ANY(%s)""",
+                                 [facility_ids])
+        rows = await cur.fetchall()
+    return {row[0]: facility_from_row(row) for row in rows}
+
+@app.get("/facilities/nearby", response_model=List[Dict], summary="Read Facilities within radius_km of a point, nearest first")
+async def read_facilities_nearby(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(25, gt=0, le=MAX_NEARBY_RADIUS_KM),
+    limit: int = Query(DEFAULT_NEARBY_LIMIT, ge=1, le=MAX_PAGE_SIZE),
+):
+    await ensure_spatial_index()
+
+    if app.state.use_postgis:
+        query = f"""
+            SELECT {FACILITY_COLUMNS}, ST_Distance({FACILITY_POINT}, search.point) / 1000 AS "DistanceKm"
+            FROM "Facilities" AS f,
+                 (SELECT ST_SetSRID(ST_MakePoint(%(lon)s, %(lat)s), 4326)::geography AS point) AS search
+            WHERE ST_DWithin({FACILITY_POINT}, search.point, %(radius_m)s)
+              AND NOT (f."FacilityLatitude" = 0 AND f."FacilityLongitude" = 0)
+            ORDER BY "DistanceKm"
+            LIMIT %(limit)s
+        """
+        params = {"lat": lat, "lon": lon, "radius_m": radius_km * 1000, "limit": limit}
+        async with get_db_connection() as conn:
+            cur = await conn.execute(query, params)
+            rows = await cur.fetchall()
+        return [{**facility_from_row(row), "DistanceKm": round(row[8], 3)} for row in rows]
+
+    found = facility_index.nearby(lat, lon, radius_km, limit)
+    facilities = await read_facilities_by_id([facility_id for facility_id, _ in found])
+    return [{**facilities[facility_id], "DistanceKm": round(distance, 3)}
+            for facility_id, distance in found if facility_id in facilities]
+
+@app.get("/facilities/bbox", response_model=List[Dict], summary="Read Facilities inside a latitude/longitude bounding box")
+async def read_facilities_bbox(
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lon: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lon: float = Query(..., ge=-180, le=180),
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    if min_lat > max_lat or min_lon > max_lon:
+        raise HTTPException(status_code=400, detail="min_lat/min_lon must not be greater than max_lat/max_lon")
+    await ensure_spatial_index()
+
+    if app.state.use_postgis:
+        # && narrows the search with the GiST index, the BETWEENs keep exactly the points inside the box
+        query = f"""
+            SELECT {FACILITY_COLUMNS}
+            FROM "Facilities" AS f
+            WHERE {FACILITY_POINT} && ST_MakeEnvelope(%(min_lon)s, %(min_lat)s, %(max_lon)s, %(max_lat)s, 4326)::geography
+              AND f."FacilityLatitude" BETWEEN %(min_lat)s AND %(max_lat)s
+              AND f."FacilityLongitude" BETWEEN %(min_lon)s AND %(max_lon)s
+              AND NOT (f."FacilityLatitude" = 0 AND f."FacilityLongitude" = 0)
+            ORDER BY f."FacilityID"
+            LIMIT %(limit)s
+        """
+        params = {"min_lat": min_lat, "min_lon": min_lon, "max_lat": max_lat, "max_lon": max_lon, "limit": limit}
+        async with get_db_connection() as conn:
+            cur = await conn.execute(query, params)
+            rows = await cur.fetchall()
+        return [facility_from_row(row) for row in rows]
+
+    facility_ids = sorted(facility_index.within_bbox(min_lat, min_lon, max_lat, max_lon))[:limit]
+    facilities = await read_facilities_by_id(facility_ids)
+    return [facilities[facility_id] for facility_id in facility_ids if facility_id in facilities]
+
+@app.get("/facilities/clusters", response_model=List[Dict], summary="Read Facilities grouped into clusters for a map viewport (bounding box and zoom level)")
+async def read_facility_clusters(
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lon: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lon: float = Query(..., ge=-180, le=180),
+    zoom: int = Query(..., ge=0, le=MAX_MAP_ZOOM),
+    state: str = None,
+    ada_accessible: bool = None,
+):
+    """Groups the facilities in the box into grid cells sized for the zoom level, so a map draws one marker per cell.
+
+    Each cluster has its centroid, its count and its bounds (to zoom into it on click); a cluster of one facility
+    carries the facility itself.  The box is grown to whole cells, so clusters do not change as the map is panned.
+    """
+    if min_lat > max_lat or min_lon > max_lon:
+        raise HTTPException(status_code=400, detail="min_lat/min_lon must not be greater than max_lat/max_lon")
+    cell = cluster_cell_degrees(zoom)
+    min_lat, min_lon, max_lat, max_lon = snap_bbox(min_lat, min_lon, max_lat, max_lon, cell)
+
+    query = """
+        SELECT
+            count(*),
+            avg(f."FacilityLatitude"),
+            avg(f."FacilityLongitude"),
+            min(f."FacilityLatitude"),
+            min(f."FacilityLongitude"),
+            max(f."FacilityLatitude"),
+            max(f."FacilityLongitude"),
+            min(f."FacilityID")
+        FROM "Facilities" AS f
+        WHERE f."FacilityLatitude" BETWEEN %(min_lat)s AND %(max_lat)s
+          AND f."FacilityLongitude" BETWEEN %(min_lon)s AND %(max_lon)s
+          AND NOT (f."FacilityLatitude" = 0 AND f."FacilityLongitude" = 0)
+    """
+    params = {"min_lat": min_lat, "min_lon": min_lon, "max_lat": max_lat, "max_lon": max_lon, "cell": cell}
+    if state:
+        query += """ AND EXISTS (SELECT 1 FROM "FacilityAddresses" AS a WHERE a."FacilityID" = f."FacilityID" AND a."AddressStateCode" = %(state)s)"""
+        params["state"] = state
+    if ada_accessible is not None:
+        query += """ AND f."AdaAccessible" """ if ada_accessible else """ AND NOT f."AdaAccessible" """
+    query += """ GROUP BY floor(f."FacilityLatitude" / %(cell)s), floor(f."FacilityLongitude" / %(cell)s)"""
+
+    async with get_db_connection() as conn:
+        cur = await conn.execute(query, params)
+        rows = await cur.fetchall()
+
+    facilities = await read_facilities_by_id([row[7] for row in rows if row[0] == 1])
+    return [
+        {
+            "Count": row[0],
+            "Latitude": row[1],
+            "Longitude": row[2],
+            "Bounds": [[row[3], row[4]], [row[5], row[6]]],
+            "Facility": facilities.get(row[7]) if row[0] == 1 else None,
+        }
+        for row in rows
+    ]
+
+# Campsite columns a client may pick with the fields parameter of /campsites?nested=true
+CAMPSITE_FIELDS = [
+    "CampsiteID", "CampsiteName", "CampsiteLatitude", "CampsiteLongitude", "CampsiteReservable", "CampsiteAccessible",
+    "CampsiteType", "FacilityID", "Loop", "TypeOfUse", "LastUpdatedDate",
+]
+DEFAULT_CAMPSITE_FIELDS = ["CampsiteID", "CampsiteName", "CampsiteLatitude", "CampsiteLongitude", "CampsiteReservable", "FacilityID", "TypeOfUse"]
+
+# Correlated subqueries that aggregate a campsite's attributes and equipment, keeping it to one row per campsite
+CAMPSITE_ATTRIBUTES_COLUMN = """COALESCE((SELECT jsonb_object_agg(a."AttributeName", a."AttributeValue")
+                  FROM "CampSiteAttribute" AS a WHERE a."CampsiteID" = c."CampsiteID"), '{}'::jsonb) AS "ATTRIBUTES" """
+CAMPSITE_EQUIPMENT_COLUMN = """COALESCE((SELECT jsonb_agg(to_jsonb(e) - 'CampsiteID')
+                  FROM "PermittedEquipment" AS e WHERE e."CampsiteID" = c."CampsiteID"), '[]'::jsonb) AS "PERMITTEDEQUIPMENT" """
+
+def select_campsite_fields(fields):
+    """Parses the fields parameter into the campsite columns to return (CampsiteID is always included).
+
+    Raises:
+        HTTPException: 400 when a field is not one of CAMPSITE_FIELDS.
+    """
+    if not fields:
+        return DEFAULT_CAMPSITE_FIELDS
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in CAMPSITE_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown campsite fields {unknown}, choose from {CAMPSITE_FIELDS}")
+    if "CampsiteID" not in selected:
+        selected.insert(0, "CampsiteID")
+    return selected
+
+async def read_campsites_nested(state=None, fields=None, include_equipment=False):
+    """Reads one row per campsite with its attributes (and optionally permitted equipment) aggregated by Postgres.
+
+    Args:
+        state: Optional state code to filter on.
+        fields: Optional comma separated list of campsite columns to return (CampsiteID is always included).
+        include_equipment: Also return a PERMITTEDEQUIPMENT list per campsite.
+
+    Returns:
+        A list of campsite dictionaries with an ATTRIBUTES object of AttributeName -> AttributeValue.
+    """
+    columns = [f'c."{field}"' for field in select_campsite_fields(fields)]
+    columns.append('fa."AddressStateCode"')
+    columns.append(CAMPSITE_ATTRIBUTES_COLUMN)
+    if include_equipment:
+        columns.append(CAMPSITE_EQUIPMENT_COLUMN)
+
+    # A facility has one row per address in "FacilitiesWithState": the lateral subquery picks one of them (one in the
+    # requested state when filtering), so a facility with several addresses does not repeat its campsites
+    state_condition = """AND fa."AddressStateCode" = %s""" if state else ""
+    query = f"""
+        SELECT {", ".join(columns)}
+        FROM "Campsites" AS c
+          {"JOIN" if state else "LEFT JOIN"} LATERAL (
+              SELECT fa."AddressStateCode" FROM "FacilitiesWithState" AS fa
+              WHERE fa."FacilityID" = c."FacilityID" {state_condition}
+              ORDER BY fa."FacilityAddressID"
+              LIMIT 1
+          ) AS fa ON true
+    """
+    params = [state] if state else []
+
+    async with get_db_connection() as conn:
+        cur = await conn.execute(query, params)
+        rows = await cur.fetchall()
+    column_names = [desc[0] for desc in cur.description]
+    return [dict(zip(column_names, row)) for row in rows]
+
+@app.get("/campsites", response_model=List[Dict], summary="Read Campsites (optional filters by state, nested=true for one row per campsite)")
+async def read_campsites(state:str = None, nested: bool = False, fields: str = None, include_equipment: bool = False):
+    if nested:
+        return ORJSONResponse(await read_campsites_nested(state, fields, include_equipment))
+
     query = """
           SELECT
                 c."CampsiteID",
@@ -153,20 +518,21 @@ async def read_campsites(state:str = None):
                 fa."AddressStateCode"
         FROM "Campsites" AS c
           LEFT JOIN "CampSiteAttribute" AS a ON c."CampsiteID" = a."CampsiteID"
-          LEFT JOIN "Facilities" AS f on c."FacilityID" = f."FacilityID"
-          LEFT JOIN "FacilityAddresses" AS fa ON f."FacilityID" = fa."FacilityID"
+          LEFT JOIN "FacilitiesWithState" AS fa ON c."FacilityID" = fa."FacilityID"
     """
     conditions = []
+    params = []
 
     if state:
-        conditions.append(f""" fa."AddressStateCode" = '{state}'""")
+        conditions.append(""" fa."AddressStateCode" = %s""")
+        params.append(state)
 
     if conditions:
         query += " WHERE " + " AND ".join(conditions)
 
-    cur.execute(query)
-    rows = cur.fetchall()
-    conn.close()
+    async with get_db_connection() as conn:
+        cur = await conn.execute(query, params)
+        rows = await cur.fetchall()
     campsites = []
     for row in rows:
         campsite = {
@@ -182,32 +548,183 @@ async def read_campsites(state:str = None):
             "AddressStateCode": row[9]
         }
         campsites.append(campsite)
-    return campsites
+    return ORJSONResponse(campsites)
+
+def parse_attribute_filter(attribute):
+    """Splits an attribute filter such as "Pets Allowed:Yes" into (name, value); a bare name matches any value.
+
+    Raises:
+        HTTPException: 400 when the name is empty.
+    """
+    name, separator, value = attribute.partition(":")
+    if not name.strip():
+        raise HTTPException(status_code=400, detail=f'attribute must look like "Name:Value" or "Name", got "{attribute}"')
+    return name.strip(), value.strip() if separator else None
+
+def build_campsite_filters(state=None, facility_ids=None, equipment=None, min_length=None, attributes=None,
+                           type_of_use=None, campsite_type=None, reservable=None, accessible=None):
+    """Compiles the filters of /campsites/query into a WHERE clause over "Campsites" AS c.
+
+    Every filter becomes a condition on the campsite itself or an EXISTS on its addresses, equipment or attributes,
+    so each campsite matches once and Postgres can drive the query from whichever index is most selective.
+
+    Args:
+        state: State code of the campsite's facility.
+        facility_ids: Facilities the campsites belong to.
+        equipment: Permitted equipment name, e.g. 'RV'.
+        min_length: Length in feet the permitted equipment must allow (of the named equipment, if given).
+        attributes: Attribute filters parsed by parse_attribute_filter, all of which must match.
+        type_of_use, campsite_type, reservable, accessible: Values the campsite columns must equal.
+
+    Returns:
+        A tuple of (where clause, or "" without filters, params).
+    """
+    conditions = []
+    params = {}
+    for column, name, value in (("TypeOfUse", "type_of_use", type_of_use), ("CampsiteType", "campsite_type", campsite_type),
+                                ("CampsiteReservable", "reservable", reservable), ("CampsiteAccessible", "accessible", accessible)):
+        if value is not None:
+            conditions.append(f'c."{column}" = %({name})s')
+            params[name] = value
+    if facility_ids:
+        conditions.append('c."FacilityID" = ANY(%(facility_ids)s)')
+        params["facility_ids"] = facility_ids
+    if state:
+        conditions.append("""EXISTS (SELECT 1 FROM "FacilityAddresses" AS fa
+                   WHERE fa."FacilityID" = c."FacilityID" AND fa."AddressStateCode" = %(state)s)""")
+        params["state"] = state
+    if equipment is not None or min_length is not None:
+        equipment_conditions = ['e."CampsiteID" = c."CampsiteID"']
+        if equipment is not None:
+            equipment_conditions.append('e."EquipmentName" = %(equipment)s')
+            params["equipment"] = equipment
+        if min_length is not None:
+            equipment_conditions.append('e."MaxLength " >= %(min_length)s')
+            params["min_length"] = min_length
+        conditions.append(f"""EXISTS (SELECT 1 FROM "PermittedEquipment" AS e WHERE {" AND ".join(equipment_conditions)})""")
+    for number, (name, value) in enumerate(attributes or []):
+        attribute_condition = f'a."CampsiteID" = c."CampsiteID" AND a."AttributeName" = %(attribute_name_{number})s'
+        params[f"attribute_name_{number}"] = name
+        if value is not None:
+            attribute_condition += f' AND a."AttributeValue" = %(attribute_value_{number})s'
+            params[f"attribute_value_{number}"] = value
+        conditions.append(f"""EXISTS (SELECT 1 FROM "CampSiteAttribute" AS a WHERE {attribute_condition})""")
+    return ("WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+def build_campsite_query(where, params, fields=None, include_attributes=False, include_equipment=False,
+                         limit=DEFAULT_QUERY_LIMIT, after=None):
+    """Builds the SELECT of /campsites/query around the filters of build_campsite_filters.
+
+    The matching campsites are counted and paged in CTEs first, so attributes and equipment are only aggregated
+    for the page that is returned.
+
+    Args:
+        where: The WHERE clause from build_campsite_filters.
+        params: Its params.
+        fields: Comma separated campsite columns to return.
+        include_attributes: Add an ATTRIBUTES object per campsite.
+        include_equipment: Add a PERMITTEDEQUIPMENT list per campsite.
+        limit: Page size.
+        after: CampsiteID of the last row of the previous page.
+
+    Returns:
+        A tuple of (query, params); the last column of every row is the total number of matches.
+    """
+    params = {**params, "limit": limit}
+    columns = [f'c."{field}"' for field in select_campsite_fields(fields)]
+    if include_attributes:
+        columns.append(CAMPSITE_ATTRIBUTES_COLUMN)
+    if include_equipment:
+        columns.append(CAMPSITE_EQUIPMENT_COLUMN)
+    columns.append('page."Total"')
+
+    # The count is taken over every match before the page is cut, the keyset condition is applied after it
+    query = f"""
+        WITH matches AS (
+            SELECT c."CampsiteID", count(*) OVER () AS "Total"
+            FROM "Campsites" AS c
+            {where}
+        ), page AS (
+            SELECT * FROM matches
+            {'WHERE "CampsiteID" > %(after)s' if after is not None else ""}
+            ORDER BY "CampsiteID"
+            LIMIT %(limit)s
+        )
+        SELECT {", ".join(columns)}
+        FROM page
+          JOIN "Campsites" AS c ON c."CampsiteID" = page."CampsiteID"
+        ORDER BY c."CampsiteID"
+    """
+    if after is not None:
+        params["after"] = after
+    return query, params
+
+@app.get("/campsites/query", response_model=List[Dict], summary="Query Campsites by state, facility, equipment, attributes, type of use, reservable and accessible")
+async def query_campsites(
+    state: str = None,
+    facility_id: List[int] = Query(None, description="Facility to return campsites of, repeat for several"),
+    equipment: str = Query(None, description='Permitted equipment name, e.g. "RV" or "Trailer"'),
+    min_length: int = Query(None, ge=0, description="Length in feet the permitted equipment must allow"),
+    attribute: List[str] = Query(None, description='Attribute the campsite must have, "Name:Value" or "Name", repeat to require several'),
+    type_of_use: str = Query(None, description='e.g. "Overnight" or "Day"'),
+    campsite_type: str = Query(None, description='e.g. "STANDARD ELECTRIC"'),
+    reservable: bool = None,
+    accessible: bool = None,
+    fields: str = None,
+    include_attributes: bool = False,
+    include_equipment: bool = False,
+    limit: int = Query(DEFAULT_QUERY_LIMIT, ge=1, le=MAX_PAGE_SIZE),
+    after: int = None,
+):
+    """Returns the campsites matching every given filter, filtered by Postgres in a single query.
+
+    The number of matches is returned in the X-Total-Count header.  A full page also gets an X-Next-After header,
+    pass it back as after to read the next page.
+    """
+    attributes = [parse_attribute_filter(value) for value in attribute or []]
+    where, params = build_campsite_filters(state, facility_id, equipment, min_length, attributes,
+                                           type_of_use, campsite_type, reservable, accessible)
+    query, query_params = build_campsite_query(where, params, fields, include_attributes, include_equipment, limit, after)
+    async with get_db_connection() as conn:
+        cur = await conn.execute(query, query_params)
+        rows = await cur.fetchall()
+        column_names = [desc[0] for desc in cur.description][:-1]  # without the Total column
+        if rows:
+            total = rows[0][-1]
+        elif after is None:
+            total = 0
+        else:  # past the last page there is no row to read the count from
+            cur = await conn.execute(f'SELECT count(*) FROM "Campsites" AS c {where}', params)
+            total = (await cur.fetchone())[0]
+
+    headers = {"X-Total-Count": str(total)}
+    if len(rows) == limit:
+        headers["X-Next-After"] = str(rows[-1][column_names.index("CampsiteID")])  # fields may put it anywhere
+    return ORJSONResponse([dict(zip(column_names, row)) for row in rows], headers=headers)
 
 @app.get("/activities", response_model=List[Dict], summary="Read Activities (optional filters by state)")
 async def read_activities(state: str = None):
-    conn = get_db_connection()
-    cur = conn.cursor()
     query = """
         SELECT
           a."ActivityID",
           a."ActivityName",
           a."FacilityActivityDescription",
-          f."FacilityID",
+          fa."FacilityID",
           fa."AddressStateCode"
         FROM "Activities" AS a
-          LEFT JOIN "Facilities" AS f ON a."FacilityID" = f."FacilityID"
-          LEFT JOIN "FacilityAddresses" AS fa ON f."FacilityID" = fa."FacilityID"
+          LEFT JOIN "FacilitiesWithState" AS fa ON a."FacilityID" = fa."FacilityID"
     """
     conditions = []
+    params = []
     if state:
-        conditions.append(f""" fa."AddressStateCode" = '{state}'""")
+        conditions.append(""" fa."AddressStateCode" = %s""")
+        params.append(state)
     if conditions:
         query += " WHERE " + " AND ".join(conditions)
 
-    cur.execute(query)
-    rows = cur.fetchall()
-    conn.close()
+    async with get_db_connection() as conn:
+        cur = await conn.execute(query, params)
+        rows = await cur.fetchall()
 
     activities = []
     for row in rows:
@@ -219,89 +736,170 @@ async def read_activities(state: str = None):
              "AddressStateCode": row[4]
         }
         activities.append(activity)
-    return activities
-
-@app.get("/all_facilities", response_model=List[Dict], summary="Read all Facilities")
-async def read_all_facilities():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    query = """ SELECT * FROM "Facilities" """
-    cur.execute(query)
-    rows = cur.fetchall()
-    conn.close()
-    facilities = []
-    column_names = [desc[0] for desc in cur.description]
-    for row in rows:
-      facilities.append(dict(zip(column_names, row)))
-
-    return facilities
-
-@app.get("/all_campsites", response_model=List[Dict], summary="Read all Campsites")
-async def read_all_campsites():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    query = """ SELECT * FROM "Campsites" """
-    cur.execute(query)
-    rows = cur.fetchall()
-    conn.close()
-    campsites = []
-    column_names = [desc[0] for desc in cur.description]
-    for row in rows:
-      campsites.append(dict(zip(column_names, row)))
-    return campsites
-
-@app.get("/all_activities", response_model=List[Dict], summary="Read all Activities")
-async def read_all_activities():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    query = """ SELECT * FROM "Activities" """
-    cur.execute(query)
-    rows = cur.fetchall()
-    conn.close()
-    activities = []
-    column_names = [desc[0] for desc in cur.description]
-    for row in rows:
-       activities.append(dict(zip(column_names, row)))
-    return activities
-
-@app.get("/all_campsite_attributes", response_model=List[Dict], summary="Read all Camp Site Attributes")
-async def read_all_campsite_attributes():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    query = """ SELECT * FROM "CampSiteAttribute" """
-    cur.execute(query)
-    rows = cur.fetchall()
-    conn.close()
-    campsite_attributes = []
-    column_names = [desc[0] for desc in cur.description]
-    for row in rows:
-      campsite_attributes.append(dict(zip(column_names, row)))
-    return campsite_attributes
-
-@app.get("/all_permitted_equipment", response_model=List[Dict], summary="Read all Permitted Equipment")
-async def read_all_permitted_equipment():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    query = """ SELECT * FROM "PermittedEquipment" """
-    cur.execute(query)
-    rows = cur.fetchall()
-    conn.close()
-    permitted_equipment = []
-    column_names = [desc[0] for desc in cur.description]
-    for row in rows:
-      permitted_equipment.append(dict(zip(column_names, row)))
-    return permitted_equipment
-
-@app.get("/all_facility_addresses", response_model=List[Dict], summary="Read all Facility Addresses")
-async def read_all_facility_addresses():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    query = """ SELECT * FROM "FacilityAddresses" """
-    cur.execute(query)
-    rows = cur.fetchall()
-    conn.close()
-    facility_addresses = []
+    return ORJSONResponse(activities)
+
+@app.get("/search", response_model=List[Dict], summary="Search Facilities by name, keywords, description and activities, best matches first")
+async def search_facilities(
+    q: str = Query(..., min_length=1, max_length=200, description='Words to look for, e.g. "lake fishing" or "hiking -horse"'),
+    state: str = None,
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+    offset: int = Query(0, ge=0),
+):
+    """Ranks the facilities matching q (web search syntax: quoted phrases, OR, -word) with the GIN-indexed tsvector.
+
+    Each result adds its Rank, the names of the activities that matched and a Snippet of the description around the
+    match.  The number of matches is returned in the X-Total-Count header, page through them with offset.
+    """
+    matches = f"""
+        FROM "FacilitySearch" AS s, (SELECT websearch_to_tsquery('{SEARCH_CONFIG}', %(q)s) AS query) AS search
+        WHERE s."SearchVector" @@ search.query
+    """
+    if state:
+        matches += """ AND EXISTS (SELECT 1 FROM "FacilityAddresses" AS a WHERE a."FacilityID" = s."FacilityID" AND a."AddressStateCode" = %(state)s)"""
+
+    # The page is picked first, so snippets and matched activities are only worked out for the rows returned
+    query = f"""
+        WITH page AS (
+            SELECT s."FacilityID", search.query, ts_rank_cd(s."SearchVector", search.query) AS "Rank", count(*) OVER () AS "Total"
+            {matches}
+            ORDER BY "Rank" DESC, s."FacilityID"
+            LIMIT %(limit)s OFFSET %(offset)s
+        )
+        SELECT
+            {FACILITY_COLUMNS},
+            page."Rank",
+            page."Total",
+            ARRAY(
+                SELECT a."ActivityName" FROM "Activities" AS a
+                WHERE a."FacilityID" = f."FacilityID"
+                  AND to_tsvector('{SEARCH_CONFIG}', coalesce(a."ActivityName", '') || ' ' || coalesce(a."FacilityActivityDescription", '')) @@ page.query
+                ORDER BY a."ActivityName"
+            ) AS "MatchedActivities",
+            btrim(ts_headline('{SEARCH_CONFIG}', regexp_replace(coalesce(f."FacilityDescription", ''), '<[^>]+>', ' ', 'g'), page.query,
+                        'MaxFragments=1, MaxWords=30, MinWords=10')) AS "Snippet"
+        FROM page
+          JOIN "Facilities" AS f ON f."FacilityID" = page."FacilityID"
+        ORDER BY page."Rank" DESC, f."FacilityID"
+    """
+    params = {"q": q, "state": state, "limit": limit, "offset": offset}
+    async with get_db_connection() as conn:
+        cur = await conn.execute(query, params)
+        rows = await cur.fetchall()
+        if rows:
+            total = rows[0][9]
+        else:  # past the last page there is no row to read the count from
+            cur = await conn.execute(f"SELECT count(*) {matches}", params)
+            total = (await cur.fetchone())[0]
+
+    results = [
+        {**facility_from_row(row), "Rank": round(row[8], 4), "MatchedActivities": row[10], "Snippet": row[11]}
+        for row in rows
+    ]
+    return ORJSONResponse(results, headers={"X-Total-Count": str(total)})
+
+def parse_after(after, key_columns):
+    """Turns the after query parameter into one value per key column.
+
+    Single column keys take the raw value (e.g. after=233957), composite keys take the JSON array
+    returned in the X-Next-After header of the previous page (e.g. after=["233957", 32]).
+    """
+    if len(key_columns) == 1:
+        return [after]
+    try:
+        values = json.loads(after)
+    except json.JSONDecodeError:
+        values = None
+    if not isinstance(values, list) or len(values) != len(key_columns):
+        raise HTTPException(status_code=400, detail=f"after must be a JSON array of {key_columns}")
+    return values
+
+def build_table_query(table, limit=None, after=None):
+    """Builds the SELECT for one of the /all_* tables, adding keyset paging when limit or after is given.
+
+    Returns:
+        A tuple of (query, params).
+    """
+    key_columns = TABLE_KEYS[table]
+    key_list = ", ".join(f'"{column}"' for column in key_columns)
+    query = f""" SELECT * FROM "{table}" """
+    params = []
+    if after is not None:
+        query += f" WHERE ({key_list}) > ({', '.join(['%s'] * len(key_columns))})"
+        params.extend(parse_after(after, key_columns))
+    if limit is not None or after is not None:
+        query += f" ORDER BY {key_list}"
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(limit)
+    return query, params
+
+async def stream_table(table, query, params):
+    """Yields the rows of a table query as NDJSON, reading them through a server-side cursor so memory stays flat."""
+    async with get_db_connection() as conn:
+        async with conn.cursor(name=f"stream_{table.lower()}") as cur:
+            await cur.execute(query, params)
+            column_names = [desc[0] for desc in cur.description]
+            while True:
+                rows = await cur.fetchmany(STREAM_BATCH_SIZE)
+                if not rows:
+                    break
+                yield b"".join(dumps(dict(zip(column_names, row))) + b"\n" for row in rows)
+
+async def read_table(table, request, limit=None, after=None, stream=False):
+    """Shared body of the /all_* endpoints.
+
+    Args:
+        table: The table to read.
+        request: The request, whose Accept header picks JSON, MessagePack or Arrow.
+        limit: Page size, when paging.
+        after: Key of the last row of the previous page.
+        stream: Stream every row (after the key, if given) as NDJSON instead of returning a list.
+
+    Returns:
+        The encoded rows (with an X-Next-After header when there may be more), or a StreamingResponse when stream is set.
+    """
+    if stream:
+        query, params = build_table_query(table, after=after)  # built up front so a bad after value is a 400, not a broken stream
+        return StreamingResponse(stream_table(table, query, params), media_type="application/x-ndjson")
+
+    query, params = build_table_query(table, limit, after)
+    async with get_db_connection() as conn:
+        cur = await conn.execute(query, params)
+        rows = await cur.fetchall()
     column_names = [desc[0] for desc in cur.description]
-    for row in rows:
-        facility_addresses.append(dict(zip(column_names, row)))
-    return facility_addresses
\ No newline at end of file
+
+    # A full page means there may be more rows; hand back the key to continue from
+    headers = {}
+    if limit is not None and len(rows) == limit:
+        key_columns = TABLE_KEYS[table]
+        last = dict(zip(column_names, rows[-1]))
+        if len(key_columns) == 1:
+            headers["X-Next-After"] = str(last[key_columns[0]])
+        else:
+            headers["X-Next-After"] = json.dumps([last[column] for column in key_columns], default=str)
+    # Encoded straight from the rows: no dictionaries validated against List[Dict] and re-encoded by FastAPI
+    return rows_response(column_names, rows, request.headers.get("accept"), headers)
+
+@app.get("/all_facilities", response_model=List[Dict], summary="Read all Facilities (optional paging by limit/after, stream=true for NDJSON, Accept for MessagePack/Arrow)")
+async def read_all_facilities(request: Request, limit: int = Query(None, ge=1, le=MAX_PAGE_SIZE), after: str = None, stream: bool = False):
+    return await read_table("Facilities", request, limit, after, stream)
+
+@app.get("/all_campsites", response_model=List[Dict], summary="Read all Campsites (optional paging by limit/after, stream=true for NDJSON, Accept for MessagePack/Arrow)")
+async def read_all_campsites(request: Request, limit: int = Query(None, ge=1, le=MAX_PAGE_SIZE), after: str = None, stream: bool = False):
+    return await read_table("Campsites", request, limit, after, stream)
+
+@app.get("/all_activities", response_model=List[Dict], summary="Read all Activities (optional paging by limit/after, stream=true for NDJSON, Accept for MessagePack/Arrow)")
+async def read_all_activities(request: Request, limit: int = Query(None, ge=1, le=MAX_PAGE_SIZE), after: str = None, stream: bool = False):
+    return await read_table("Activities", request, limit, after, stream)
+
+@app.get("/all_campsite_attributes", response_model=List[Dict], summary="Read all Camp Site Attributes (optional paging by limit/after, stream=true for NDJSON, Accept for MessagePack/Arrow)")
+async def read_all_campsite_attributes(request: Request, limit: int = Query(None, ge=1, le=MAX_PAGE_SIZE), after: str = None, stream: bool = False):
+    return await read_table("CampSiteAttribute", request, limit, after, stream)
+
+@app.get("/all_permitted_equipment", response_model=List[Dict], summary="Read all Permitted Equipment (optional paging by limit/after, stream=true for NDJSON, Accept for MessagePack/Arrow)")
+async def read_all_permitted_equipment(request: Request, limit: int = Query(None, ge=1, le=MAX_PAGE_SIZE), after: str = None, stream: bool = False):
+    return await read_table("PermittedEquipment", request, limit, after, stream)
+
+@app.get("/all_facility_addresses", response_model=List[Dict], summary="Read all Facility Addresses (optional paging by limit/after, stream=true for NDJSON, Accept for MessagePack/Arrow)")
+async def read_all_facility_addresses(request: Request, limit: int = Query(None, ge=1, le=MAX_PAGE_SIZE), after: str = None, stream: bool = False):
+    return await read_table("FacilityAddresses", request, limit, after, stream)
@@ -0,0 +1,16 @@
+-- Converts "Facilities"."GEOJSON" from TEXT to JSONB for databases loaded before the ETL wrote real JSON.
+-- Old rows hold Python dict reprs (single quotes, None); rows without coordinates become NULL.
+-- Databases created from the current schema already have JSONB and are left alone.
+DO $$
+BEGIN
+    IF (SELECT data_type FROM information_schema.columns
+        WHERE table_name = 'Facilities' AND column_name = 'GEOJSON') = 'text' THEN
+        ALTER TABLE "Facilities"
+        ALTER COLUMN "GEOJSON" TYPE JSONB
+        USING CASE
+            WHEN "GEOJSON" LIKE '{%' AND "GEOJSON" NOT LIKE '%None%' THEN replace("GEOJSON", '''', '"')::JSONB
+            ELSE NULL
+        END;
+    END IF;
+END
+$$;
@@ -0,0 +1,13 @@
+-- Spatial index for /facilities/nearby and /facilities/bbox.
+-- When PostGIS is installed on the server, index each facility's point as a geography with GiST. The API uses the
+-- same expression in its queries. Without PostGIS nothing changes here, and the API falls back to its in-memory
+-- grid index (spatial_index.py).
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'postgis') THEN
+        CREATE EXTENSION IF NOT EXISTS postgis;
+        EXECUTE 'CREATE INDEX IF NOT EXISTS "ix_Facilities_location" ON "Facilities" USING GIST ((
+            ST_SetSRID(ST_MakePoint("FacilityLongitude", "FacilityLatitude"), 4326)::geography))';
+    END IF;
+END
+$$;
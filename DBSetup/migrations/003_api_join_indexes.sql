@@ -0,0 +1,7 @@
+-- Indexes on the columns the API joins and filters on; the schema only had primary keys.
+CREATE INDEX IF NOT EXISTS "ix_FacilityAddresses_FacilityID" ON "FacilityAddresses" ("FacilityID");
+CREATE INDEX IF NOT EXISTS "ix_FacilityAddresses_AddressStateCode" ON "FacilityAddresses" ("AddressStateCode");
+CREATE INDEX IF NOT EXISTS "ix_Campsites_FacilityID" ON "Campsites" ("FacilityID");
+CREATE INDEX IF NOT EXISTS "ix_Activities_FacilityID" ON "Activities" ("FacilityID");
+CREATE INDEX IF NOT EXISTS "ix_CampSiteAttribute_CampsiteID" ON "CampSiteAttribute" ("CampsiteID");
+CREATE INDEX IF NOT EXISTS "ix_PermittedEquipment_CampsiteID" ON "PermittedEquipment" ("CampsiteID");
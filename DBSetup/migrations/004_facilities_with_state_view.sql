@@ -0,0 +1,21 @@
+-- Facilities pre-joined with the state of their address, read by /facilities, /campsites and /activities instead of
+-- joining "FacilityAddresses" on every request.  Like the LEFT JOIN it replaces, a facility has one row per address
+-- (or one row with a NULL state when it has none).
+-- load_to_postgres.py rebuilds it with the tables and incremental_sync.py refreshes it after every sync.
+CREATE MATERIALIZED VIEW IF NOT EXISTS "FacilitiesWithState" AS
+SELECT
+    f."FacilityID",
+    f."FacilityName",
+    f."FacilityLatitude",
+    f."FacilityLongitude",
+    f."GEOJSON",
+    f."FacilityAdaAccess",
+    f."Reservable",
+    a."FacilityAddressID",
+    a."AddressStateCode"
+FROM "Facilities" AS f
+LEFT JOIN "FacilityAddresses" AS a ON f."FacilityID" = a."FacilityID";
+
+-- A unique index lets the view be refreshed CONCURRENTLY, without blocking readers
+CREATE UNIQUE INDEX IF NOT EXISTS "ux_FacilitiesWithState_Facility_Address" ON "FacilitiesWithState" ("FacilityID", "FacilityAddressID");
+CREATE INDEX IF NOT EXISTS "ix_FacilitiesWithState_AddressStateCode" ON "FacilitiesWithState" ("AddressStateCode");
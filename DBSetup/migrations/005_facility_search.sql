@@ -0,0 +1,24 @@
+-- Full-text search document of every facility, read by /search.  Name, keywords, description and the facility's
+-- activities are combined into one weighted tsvector (A = name, B = keywords and activity names, C = description,
+-- D = activity descriptions), so matches in the name rank above matches deep in a description.
+-- load_to_postgres.py rebuilds it with the tables and incremental_sync.py refreshes it after every sync.
+CREATE MATERIALIZED VIEW IF NOT EXISTS "FacilitySearch" AS
+SELECT
+    f."FacilityID",
+    setweight(to_tsvector('english', coalesce(f."FacilityName", '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(f."Keywords", '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(act."ActivityNames", '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(f."FacilityDescription", '')), 'C') ||
+    setweight(to_tsvector('english', coalesce(act."ActivityDescriptions", '')), 'D') AS "SearchVector"
+FROM "Facilities" AS f
+LEFT JOIN LATERAL (
+    SELECT
+        string_agg(a."ActivityName", ' ') AS "ActivityNames",
+        string_agg(a."FacilityActivityDescription", ' ') AS "ActivityDescriptions"
+    FROM "Activities" AS a
+    WHERE a."FacilityID" = f."FacilityID"
+) AS act ON true;
+
+-- The unique index lets the view be refreshed CONCURRENTLY, the GIN index serves the @@ matches
+CREATE UNIQUE INDEX IF NOT EXISTS "ux_FacilitySearch_FacilityID" ON "FacilitySearch" ("FacilityID");
+CREATE INDEX IF NOT EXISTS "ix_FacilitySearch_SearchVector" ON "FacilitySearch" USING GIN ("SearchVector");
@@ -0,0 +1,106 @@
+-- Proper types for the columns DBSetup/QuickDBD-recGov.sql left as TEXT:
+--   IDs become integers (BIGINT where RIDB IDs outgrow INTEGER: campsites and addresses), so rows and indexes are
+--   narrower and joins compare integers instead of strings; LastUpdatedDate becomes DATE; AddressStateCode CHAR(2).
+--   "AdaAccessible" is a boolean kept by Postgres from the free text "FacilityAdaAccess" (values like 'Y', 'N', 'Yes',
+--   'No accessible facilities.'), with the same rule /facilities always used (contains 'Y'), so the filter can use
+--   an index.  "StayLimit", "LegacyFacilityID" and "OrgFacilityID" hold free text or mixed IDs and stay TEXT.
+-- Empty strings become NULL.  The views and foreign keys on these columns are dropped and recreated around the change.
+-- Databases created from the current schema already have these types and only get the views recreated.
+-- BREAKING: the API returns these IDs as JSON numbers ("FacilityID": 232299) where it used to return strings
+-- ("FacilityID": "232299"); clients comparing IDs as strings have to convert them.
+
+DROP MATERIALIZED VIEW IF EXISTS "FacilitySearch";
+DROP MATERIALIZED VIEW IF EXISTS "FacilitiesWithState";
+
+DO $$
+BEGIN
+    IF (SELECT data_type FROM information_schema.columns
+        WHERE table_name = 'Facilities' AND column_name = 'FacilityID') = 'text' THEN
+        ALTER TABLE "Campsites" DROP CONSTRAINT IF EXISTS "fk_Campsites_FacilityID";
+        ALTER TABLE "Activities" DROP CONSTRAINT IF EXISTS "fk_Activities_FacilityID";
+        ALTER TABLE "CampSiteAttribute" DROP CONSTRAINT IF EXISTS "fk_CampSiteAttribute_CampsiteID";
+        ALTER TABLE "PermittedEquipment" DROP CONSTRAINT IF EXISTS "fk_PermittedEquipment_PermittedEquipment";
+        ALTER TABLE "FacilityAddresses" DROP CONSTRAINT IF EXISTS "fk_FacilityAddresses_FacilityID";
+
+        ALTER TABLE "Facilities"
+            ALTER COLUMN "FacilityID" TYPE INTEGER USING NULLIF(btrim("FacilityID"), '')::integer,
+            ALTER COLUMN "LastUpdatedDate" TYPE DATE USING NULLIF(btrim("LastUpdatedDate"), '')::date,
+            ALTER COLUMN "ParentOrgID" TYPE INTEGER USING NULLIF(btrim("ParentOrgID"), '')::integer,
+            ALTER COLUMN "ParentRecAreaID" TYPE INTEGER USING NULLIF(btrim("ParentRecAreaID"), '')::integer,
+            ADD COLUMN "AdaAccessible" BOOLEAN GENERATED ALWAYS AS ("FacilityAdaAccess" LIKE '%Y%') STORED;
+
+        ALTER TABLE "Campsites"
+            ALTER COLUMN "CampsiteID" TYPE BIGINT USING NULLIF(btrim("CampsiteID"), '')::bigint,
+            ALTER COLUMN "FacilityID" TYPE INTEGER USING NULLIF(btrim("FacilityID"), '')::integer,
+            ALTER COLUMN "LastUpdatedDate" TYPE DATE USING NULLIF(btrim("LastUpdatedDate"), '')::date;
+
+        ALTER TABLE "Activities"
+            ALTER COLUMN "FacilityID" TYPE INTEGER USING NULLIF(btrim("FacilityID"), '')::integer;
+
+        ALTER TABLE "CampSiteAttribute"
+            ALTER COLUMN "CampsiteID" TYPE BIGINT USING NULLIF(btrim("CampsiteID"), '')::bigint;
+
+        ALTER TABLE "PermittedEquipment"
+            ALTER COLUMN "CampsiteID" TYPE BIGINT USING NULLIF(btrim("CampsiteID"), '')::bigint;
+
+        ALTER TABLE "FacilityAddresses"
+            ALTER COLUMN "AddressStateCode" TYPE CHAR(2) USING NULLIF(btrim("AddressStateCode"), ''),
+            ALTER COLUMN "FacilityAddressID" TYPE BIGINT USING NULLIF(btrim("FacilityAddressID"), '')::bigint,
+            ALTER COLUMN "FacilityID" TYPE INTEGER USING NULLIF(btrim("FacilityID"), '')::integer,
+            ALTER COLUMN "LastUpdatedDate" TYPE DATE USING NULLIF(btrim("LastUpdatedDate"), '')::date;
+
+        ALTER TABLE "Campsites" ADD CONSTRAINT "fk_Campsites_FacilityID" FOREIGN KEY("FacilityID")
+        REFERENCES "Facilities" ("FacilityID");
+        ALTER TABLE "Activities" ADD CONSTRAINT "fk_Activities_FacilityID" FOREIGN KEY("FacilityID")
+        REFERENCES "Facilities" ("FacilityID");
+        ALTER TABLE "CampSiteAttribute" ADD CONSTRAINT "fk_CampSiteAttribute_CampsiteID" FOREIGN KEY("CampsiteID")
+        REFERENCES "Campsites" ("CampsiteID");
+        ALTER TABLE "PermittedEquipment" ADD CONSTRAINT "fk_PermittedEquipment_PermittedEquipment" FOREIGN KEY("CampsiteID")
+        REFERENCES "Campsites" ("CampsiteID");
+        ALTER TABLE "FacilityAddresses" ADD CONSTRAINT "fk_FacilityAddresses_FacilityID" FOREIGN KEY("FacilityID")
+        REFERENCES "Facilities" ("FacilityID");
+    END IF;
+END
+$$;
+
+-- 004, with "AdaAccessible" added and indexed together with the state for /facilities?state=..&ada_accessible=..
+CREATE MATERIALIZED VIEW "FacilitiesWithState" AS
+SELECT
+    f."FacilityID",
+    f."FacilityName",
+    f."FacilityLatitude",
+    f."FacilityLongitude",
+    f."GEOJSON",
+    f."FacilityAdaAccess",
+    f."AdaAccessible",
+    f."Reservable",
+    a."FacilityAddressID",
+    a."AddressStateCode"
+FROM "Facilities" AS f
+LEFT JOIN "FacilityAddresses" AS a ON f."FacilityID" = a."FacilityID";
+
+CREATE UNIQUE INDEX "ux_FacilitiesWithState_Facility_Address" ON "FacilitiesWithState" ("FacilityID", "FacilityAddressID");
+CREATE INDEX "ix_FacilitiesWithState_AddressStateCode" ON "FacilitiesWithState" ("AddressStateCode", "AdaAccessible");
+
+-- 005, unchanged
+CREATE MATERIALIZED VIEW "FacilitySearch" AS
+SELECT
+    f."FacilityID",
+    setweight(to_tsvector('english', coalesce(f."FacilityName", '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(f."Keywords", '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(act."ActivityNames", '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(f."FacilityDescription", '')), 'C') ||
+    setweight(to_tsvector('english', coalesce(act."ActivityDescriptions", '')), 'D') AS "SearchVector"
+FROM "Facilities" AS f
+LEFT JOIN LATERAL (
+    SELECT
+        string_agg(a."ActivityName", ' ') AS "ActivityNames",
+        string_agg(a."FacilityActivityDescription", ' ') AS "ActivityDescriptions"
+    FROM "Activities" AS a
+    WHERE a."FacilityID" = f."FacilityID"
+) AS act ON true;
+
+CREATE UNIQUE INDEX "ux_FacilitySearch_FacilityID" ON "FacilitySearch" ("FacilityID");
+CREATE INDEX "ix_FacilitySearch_SearchVector" ON "FacilitySearch" USING GIN ("SearchVector");
+
+ANALYZE "Facilities", "Campsites", "Activities", "CampSiteAttribute", "PermittedEquipment", "FacilityAddresses";
@@ -0,0 +1,5 @@
+-- Indexes for the EXISTS filters of /campsites/query on equipment and attributes.  The CampsiteID is part of each key
+-- so a filter like "RV with MaxLength >= 35" or "Pets Allowed = Yes" is answered from the index alone.
+-- The boolean and type columns of "Campsites" hold a few values each and are filtered while scanning, without indexes.
+CREATE INDEX IF NOT EXISTS "ix_PermittedEquipment_EquipmentName_MaxLength" ON "PermittedEquipment" ("EquipmentName", "MaxLength ", "CampsiteID");
+CREATE INDEX IF NOT EXISTS "ix_CampSiteAttribute_AttributeName_AttributeValue" ON "CampSiteAttribute" ("AttributeName", "AttributeValue", "CampsiteID");
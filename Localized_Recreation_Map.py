@@ -1,29 +1,115 @@
-# import the necessary libraries  Streamlit "pip install streamlit" 
+# import the necessary libraries  Streamlit "pip install streamlit" and "pip install streamlit-folium"
 # How to run the dashboard:  Run the dashboard by executing the following command in the terminal: "streamlit run Localized_Recreation_Map.py"
+# The map only loads what is in view: the API groups the facilities of the visible box into clusters sized for the zoom
+# level (/facilities/clusters), and panning or zooming fetches the clusters of the new viewport.
 import streamlit as st
 import requests
 import folium
+from folium.plugins import MarkerCluster
 from streamlit_folium import st_folium
-import json
+from spatial_index import cluster_cell_degrees, snap_bbox, TILE_SIZE_PIXELS
 
 API_URL = "http://127.0.0.1:8000"  # Replace if your API is running elsewhere
 
+# Map configuration
+MAP_KEY = "facilities_map"  # Streamlit keeps the map's last bounds and zoom in st.session_state under this key
+MAP_WIDTH = 725
+MAP_HEIGHT = 500
+DEFAULT_CENTER = [38.5, -114.0]  # between Arizona, Utah and Oregon
+DEFAULT_ZOOM = 5
+MAX_ZOOM = 18  # deepest zoom the API clusters for
+
+# Client-side cache: the same viewport and filters are answered without calling the API again
+CACHE_TTL = 10 * 60  # seconds before a cached response is fetched again, so a data reload shows up
+CACHE_MAX_ENTRIES = 256  # viewport + filter combinations kept per server
+REQUEST_TIMEOUT = 30  # seconds
+
 st.title("Recreational Facilities Map")
 
-def get_facilities(state=None, ada_accessible=None):
-    params = {}
+@st.cache_resource
+def get_session():
+    """One requests.Session shared by every rerun and browser session, so requests reuse the keep-alive connection."""
+    return requests.Session()
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, show_spinner=False)
+def fetch_facility_clusters(bounds, zoom, state=None, ada_accessible=None):
+    """Downloads the clusters of one viewport and filter combination; failed requests raise and are not cached."""
+    min_lat, min_lon, max_lat, max_lon = bounds
+    params = {"min_lat": min_lat, "min_lon": min_lon, "max_lat": max_lat, "max_lon": max_lon, "zoom": zoom}
     if state:
         params["state"] = state
     if ada_accessible is not None and ada_accessible != "":
         params["ada_accessible"] = ada_accessible
-    response = requests.get(f"{API_URL}/facilities", params=params)
-    if response.status_code == 200:
-        data = response.json()
-        return data
-    else:
-        st.error(f"Error fetching facilities: {response.status_code}")
-        # st.write(response.text)
-        return []
+    response = get_session().get(f"{API_URL}/facilities/clusters", params=params, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+def get_map_view():
+    """Returns (center, zoom, bounds) of the map as the user last left it, or the default view on the first run."""
+    last_view = st.session_state.get(MAP_KEY) or {}
+    bounds = last_view.get("bounds") or {}
+    south_west, north_east = bounds.get("_southWest") or {}, bounds.get("_northEast") or {}
+    if last_view.get("zoom") is not None and south_west.get("lat") is not None and north_east.get("lat") is not None:
+        center = [last_view["center"]["lat"], last_view["center"]["lng"]]
+        return center, last_view["zoom"], (south_west["lat"], south_west["lng"], north_east["lat"], north_east["lng"])
+    # Not drawn yet: estimate the box the map shows around the default center
+    degrees_per_pixel = 360.0 / (TILE_SIZE_PIXELS * 2 ** DEFAULT_ZOOM)
+    half_height, half_width = MAP_HEIGHT / 2 * degrees_per_pixel, MAP_WIDTH / 2 * degrees_per_pixel
+    bounds = (DEFAULT_CENTER[0] - half_height, DEFAULT_CENTER[1] - half_width,
+              DEFAULT_CENTER[0] + half_height, DEFAULT_CENTER[1] + half_width)
+    return DEFAULT_CENTER, DEFAULT_ZOOM, bounds
+
+def viewport_request(bounds, zoom):
+    """Clamps the box to valid coordinates (the map can be panned past them) and snaps it to the cluster cells,
+    so small pans at the same zoom repeat the same request and the API answers from its cache."""
+    zoom = max(0, min(MAX_ZOOM, int(zoom)))
+    min_lat, min_lon, max_lat, max_lon = bounds
+    min_lat, max_lat = max(-90.0, min(min_lat, 90.0)), max(-90.0, min(max_lat, 90.0))
+    min_lon, max_lon = max(-180.0, min(min_lon, 180.0)), max(-180.0, min(max_lon, 180.0))
+    snapped = snap_bbox(min_lat, min_lon, max_lat, max_lon, cluster_cell_degrees(zoom))
+    return tuple(round(value, 6) for value in snapped), zoom
+
+def facility_popup(facility):
+    return f"<b>Facility:</b> {facility.get('FacilityName', 'N/A')}<br><b>State:</b> {facility.get('AddressStateCode', 'N/A')}<br><b>Reservable:</b> {facility.get('Reservable', 'N/A')}<br><b>ADA:</b> {facility.get('FacilityAdaAccess', 'N/A')}"
+
+@st.cache_resource(ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES)
+def build_cluster_layer(bounds, zoom, state=None, ada_accessible=None):
+    """Returns a layer with one count marker per cluster, and the single facilities in a MarkerCluster so the ones
+    sitting close together on either side of a cell edge still group instead of overlapping.
+
+    Cached per viewport and filters like the data, so toggling back to a previous view neither calls the API nor
+    rebuilds the markers.  A failed request raises, so nothing is cached for it.
+
+    Returns:
+        A tuple of (the layer, the number of facilities in it).
+    """
+    clusters = fetch_facility_clusters(bounds, zoom, state, ada_accessible)
+    layer = folium.FeatureGroup(name="Facilities")
+    single_facilities = MarkerCluster().add_to(layer)
+    for cluster in clusters:
+        facility = cluster["Facility"]
+        if facility:
+            folium.Marker(
+                location=[facility["FacilityLatitude"], facility["FacilityLongitude"]],
+                popup=facility_popup(facility),
+            ).add_to(single_facilities)
+        else:
+            size = 30 if cluster["Count"] < 100 else 40
+            folium.Marker(
+                location=[cluster["Latitude"], cluster["Longitude"]],
+                icon=folium.DivIcon(
+                    html=f'<div style="width:{size}px;height:{size}px;line-height:{size}px;border-radius:50%;background:rgba(49,136,189,0.8);color:white;text-align:center;font-weight:bold;">{cluster["Count"]}</div>',
+                    icon_size=(size, size),
+                    icon_anchor=(size // 2, size // 2),
+                ),
+                tooltip=f"{cluster['Count']} facilities, zoom in to see them",
+            ).add_to(layer)
+    return layer, sum(cluster["Count"] for cluster in clusters)
+
+@st.cache_resource
+def build_base_map():
+    """The map without markers, built once; the viewport and the markers are passed to st_folium separately."""
+    return folium.Map(location=DEFAULT_CENTER, zoom_start=DEFAULT_ZOOM)
 
 #Sidebar with filtering options
 with st.sidebar:
@@ -31,40 +117,32 @@ with st.sidebar:
   selected_state = st.selectbox("Select State", ["", "AZ", "UT", "OR"])
   ada_access_filter = st.selectbox("ADA Accessible", ["", True, False])
 
-# Fetch Data from API
-facilities = get_facilities(selected_state, ada_access_filter)
+# Build (or reuse) the cluster markers of the current viewport
+center, zoom, bounds = get_map_view()
+bounds, zoom = viewport_request(bounds, zoom)
+try:
+    layer, facility_count = build_cluster_layer(bounds, zoom, selected_state, ada_access_filter)
+except requests.RequestException as e:
+    st.error(f"Error fetching facilities: {e}")
+    layer, facility_count = folium.FeatureGroup(name="Facilities"), 0
 
 # Facility Map
 st.header("Facilities Map")
 
-if facilities:
-    # st.write("Parameters for /facilities API:", {"state": selected_state, "ada_accessible": ada_access_filter})
-    # st.write("Response from /facilities API:", facilities)
-    if facilities and facilities[0] and "FacilityLatitude" in facilities[0] and "FacilityLongitude" in facilities[0]:
-        m = folium.Map(location=[facilities[0]["FacilityLatitude"], facilities[0]["FacilityLongitude"]], zoom_start=6)
-
-        for facility in facilities:
-            if facility.get("GEOJSON") and isinstance(facility.get("GEOJSON"), dict) and facility["GEOJSON"].get("TYPE") == "Point" and facility["GEOJSON"].get("COORDINATES") and len(facility["GEOJSON"]["COORDINATES"])==2:
-              try:
-                geo_data = facility["GEOJSON"]
-                # st.write(f"Processing GeoJSON data for {facility.get('FacilityID', 'N/A')}: {geo_data}")
-                folium.GeoJson(geo_data,
-                          popup=f"<b>Facility:</b> {facility.get('FacilityName', 'N/A')}<br><b>State:</b> {facility.get('AddressStateCode', 'N/A')}<br><b>Reservable:</b> {facility.get('Reservable', 'N/A')}<br><b>ADA:</b> {facility.get('FacilityAdaAccess', 'N/A')}",
-                            ).add_to(m)
-
-              except Exception as e:
-                    st.write(f"Error {e} processing facility {facility.get('FacilityID', 'N/A')}")
-
-            elif  facility.get("FacilityLatitude") != None and facility.get("FacilityLongitude") !=None:
-                # st.write(f"Processing Marker for {facility.get('FacilityID', 'N/A')}, using FacilityLatitude: {facility.get('FacilityLatitude')} and FacilityLongitude: {facility.get('FacilityLongitude')}")
-                folium.Marker(
-                    location=[facility["FacilityLatitude"], facility["FacilityLongitude"]],
-                    popup=f"<b>Facility:</b> {facility.get('FacilityName', 'N/A')}<br><b>State:</b> {facility.get('AddressStateCode', 'N/A')}<br><b>Reservable:</b> {facility.get('Reservable', 'N/A')}<br><b>ADA:</b> {facility.get('FacilityAdaAccess', 'N/A')}",
-                ).add_to(m)
-            else:
-              st.write(f"Skipping record with id: {facility.get('FacilityID', 'N/A')} it does not have valid GEOJSON or coordinates")
-        st_folium(m, width=725)
-    else:
-      st.write("No facilities found based on the filters")
+# The map itself is built once with the default view; the viewport and the cluster layer are passed to st_folium
+# separately, so panning only swaps the markers instead of redrawing the whole map.
+st_folium(
+    build_base_map(),
+    key=MAP_KEY,
+    center=center,
+    zoom=zoom,
+    feature_group_to_add=layer,
+    width=MAP_WIDTH,
+    height=MAP_HEIGHT,
+    returned_objects=["bounds", "zoom", "center"],  # rerun on pan/zoom only, not on every click
+)
+
+if facility_count:
+    st.write(f"{facility_count} facilities in view")
 else:
-    st.write("No facilities found based on the filters")
\ No newline at end of file
+    st.write("No facilities found based on the filters")
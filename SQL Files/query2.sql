@@ -16,7 +16,7 @@ CREATE TABLE "Facilities" (
     "FacilityDescription" TEXT   NULL,
     "FacilityDirections" TEXT   NULL,
     "FacilityEmail" TEXT   NULL,
-    "FacilityID" TEXT   NOT NULL,
+    "FacilityID" INTEGER   NOT NULL,
     "FacilityLatitude" FLOAT  NULL,
     "FacilityLongitude" FLOAT NULL,
     "FacilityMapURL" TEXT   NULL,
@@ -25,15 +25,16 @@ CREATE TABLE "Facilities" (
     "FacilityReservationURL" TEXT NULL,
     "FacilityTypeDescription" TEXT NULL,
     "FacilityUseFeeDescription" TEXT NULL,
-    "GEOJSON" TEXT   NULL,
+    "GEOJSON" JSONB   NULL,
     "Keywords" TEXT  NULL,
-    "LastUpdatedDate" TEXT   NULL,
+    "LastUpdatedDate" DATE   NULL,
     "LegacyFacilityID" TEXT  NULL,
     "OrgFacilityID" TEXT   NULL,
-    "ParentOrgID" TEXT   NULL,
-    "ParentRecAreaID" TEXT   NULL,
+    "ParentOrgID" INTEGER   NULL,
+    "ParentRecAreaID" INTEGER   NULL,
     "Reservable" BOOLEAN   NULL,
     "StayLimit" TEXT   NULL,
+    "AdaAccessible" BOOLEAN GENERATED ALWAYS AS ("FacilityAdaAccess" LIKE '%Y%') STORED,
     
     CONSTRAINT "pk_Facilities" PRIMARY KEY (
         "FacilityID"
@@ -42,14 +43,14 @@ CREATE TABLE "Facilities" (
 
 CREATE TABLE "Campsites" (
     "CampsiteAccessible" BOOLEAN   NULL,
-    "CampsiteID" TEXT   NOT NULL,
+    "CampsiteID" BIGINT   NOT NULL,
     "CampsiteLatitude" FLOAT   NULL,
     "CampsiteLongitude" FLOAT   NULL,
     "CampsiteName" TEXT   NULL,
     "CampsiteReservable" BOOLEAN   NULL,
     "CampsiteType" TEXT   NULL,
-    "FacilityID" TEXT   NULL,
-    "LastUpdatedDate" TEXT   NULL,
+    "FacilityID" INTEGER   NULL,
+    "LastUpdatedDate" DATE   NULL,
     "Loop" TEXT   NULL,
     "TypeOfUse" TEXT   NULL,
     CONSTRAINT "pk_Campsites" PRIMARY KEY (
@@ -61,31 +62,31 @@ CREATE TABLE "Activities" (
     "ActivityID" INT   NOT NULL,
     "ActivityName" TEXT  NOT NULL,
     "FacilityActivityDescription" TEXT   NULL,
-    "FacilityID" TEXT   NOT NULL
+    "FacilityID" INTEGER   NOT NULL
 );
 
 CREATE TABLE "CampSiteAttribute" (
     "AttributeName" TEXT   NOT NULL,
     "AttributeValue" TEXT   NULL,
-    "CampsiteID" TEXT   NOT NULL
+    "CampsiteID" BIGINT   NOT NULL
 );
 
 CREATE TABLE "PermittedEquipment" (
     "EquipmentName" TEXT   NOT NULL,
     "MaxLength " INT   Not NULL,
-    "CampsiteID" TEXT   NOT NULL
+    "CampsiteID" BIGINT   NOT NULL
 );
 
 CREATE TABLE "FacilityAddresses" (
     "AddressCountryCode" TEXT    NULL,
-    "AddressStateCode" TEXT   NULL,
+    "AddressStateCode" CHAR(2)   NULL,
     "City" TEXT   NULL,
-    "FacilityAddressID" TEXT   NULL,
-    "FacilityID" TEXT   NULL,
+    "FacilityAddressID" BIGINT   NULL,
+    "FacilityID" INTEGER   NULL,
     "FacilityStreetAddress1" TEXT    NULL,
     "FacilityStreetAddress2" TEXT    NULL,
     "FacilityStreetAddress3" TEXT    NULL,
-    "LastUpdatedDate" Text  NULL,
+    "LastUpdatedDate" DATE  NULL,
     "PostalCode" TEXT   NULL
 );
 
@@ -162,9 +163,6 @@ SELECT
           LEFT JOIN "Facilities" AS f on c."FacilityID" = f."FacilityID"
           LEFT JOIN "FacilityAddresses" AS fa ON f."FacilityID" = fa."FacilityID"
 
-UPDATE "Facilities"
-SET "GEOJSON" = replace("GEOJSON", '''', '"');
-
 SELECT
             f."FacilityID",
             f."FacilityName",
@@ -0,0 +1,188 @@
+# Request metrics and slow-query log for the LORD API, served in the Prometheus text format by GET /metrics.
+# MetricsMiddleware times every request by route; TimedCursor, the cursor class of the API's connection pool, adds up
+# the time spent in Postgres and the rows fetched, and logs queries slower than a threshold together with their
+# EXPLAIN plan; ORJSONResponse and rows_response report the time spent encoding the body.
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import psycopg
+from starlette.routing import Match
+
+from metrics import ROW_BUCKETS, Registry
+
+METRICS_MEDIA_TYPE = "text/plain; version=0.0.4"
+SLOW_QUERY_SECONDS = 0.5  # default threshold, the API sets its own with configure_slow_query_log
+EXPLAINED_STATEMENTS = ("select", "with")  # slow statements that are safe to run EXPLAIN on
+
+slow_query_log = logging.getLogger("lord.slow_queries")
+
+registry = Registry()
+REQUEST_SECONDS = registry.histogram("lord_api_request_duration_seconds", "Time to answer a request, from the first byte in to the last byte out",
+                                     ("method", "route", "status"))
+DB_SECONDS = registry.histogram("lord_api_db_duration_seconds", "Time per request spent running queries and fetching their rows", ("route",))
+SERIALIZE_SECONDS = registry.histogram("lord_api_serialize_duration_seconds", "Time per request spent encoding the response body", ("route",))
+ROWS = registry.histogram("lord_api_rows_fetched", "Rows fetched from Postgres per request", ("route",), ROW_BUCKETS)
+QUERIES = registry.counter("lord_api_db_queries_total", "Queries run", ("route",))
+SLOW_QUERIES = registry.counter("lord_api_slow_queries_total", "Queries slower than the slow-query threshold", ("route",))
+POOL_CONNECTIONS = registry.gauge("lord_api_db_pool_connections", "Connections open in the pool, lent out or idle", ("state",))
+POOL_MAX = registry.gauge("lord_api_db_pool_max_connections", "Largest number of connections the pool may open")
+POOL_WAITING = registry.gauge("lord_api_db_pool_requests_waiting", "Requests waiting for a free connection")
+POOL_REQUESTS = registry.counter("lord_api_db_pool_requests_total", "Connections requested from the pool")
+POOL_WAIT_SECONDS = registry.counter("lord_api_db_pool_wait_seconds_total", "Time requests spent waiting for a connection")
+POOL_USAGE_SECONDS = registry.counter("lord_api_db_pool_usage_seconds_total", "Time connections spent lent out")
+POOL_ERRORS = registry.counter("lord_api_db_pool_errors_total", "Requests for a connection that failed or timed out")
+
+class RequestTimings:
+    """What one request spent in the database and in encoding, added up by TimedCursor and serialization_timer."""
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.db_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.rows = 0
+        self.queries = 0
+
+# The timings of the request being handled; BaseHTTPMiddleware and worker threads copy the context, so they share it
+current_timings = ContextVar("lord_request_timings", default=None)
+
+def route_template(scope):
+    """Returns the path template of the route that handles scope (e.g. /campsites/query), to label metrics with.
+
+    Requests answered before routing, such as response cache hits, are matched against the app's routes here.
+    """
+    route = scope.get("route")
+    if route is None and "app" in scope:
+        for candidate in scope["app"].router.routes:
+            if candidate.matches(scope)[0] == Match.FULL:
+                route = candidate
+                break
+    return getattr(route, "path", "unmatched")
+
+@contextmanager
+def serialization_timer():
+    """Adds the time spent in the block to the current request's encoding time."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = current_timings.get()
+        if timings is not None:
+            timings.serialize_seconds += time.perf_counter() - start
+
+def add_db_time(seconds, rows=0, queries=0):
+    timings = current_timings.get()
+    if timings is not None:
+        timings.db_seconds += seconds
+        timings.rows += rows
+        timings.queries += queries
+
+class TimedCursor(psycopg.AsyncCursor):
+    """AsyncCursor that records its query and fetch times, and logs queries slower than slow_query_seconds with their plan."""
+
+    slow_query_seconds = SLOW_QUERY_SECONDS
+
+    async def execute(self, query, params=None, **kwargs):
+        start = time.perf_counter()
+        await super().execute(query, params, **kwargs)
+        elapsed = time.perf_counter() - start
+        add_db_time(elapsed, queries=1)
+        if elapsed >= self.slow_query_seconds:
+            await self.log_slow_query(query, params, elapsed)
+        return self
+
+    async def fetchone(self):
+        start = time.perf_counter()
+        row = await super().fetchone()
+        add_db_time(time.perf_counter() - start, rows=0 if row is None else 1)
+        return row
+
+    async def fetchmany(self, size=0):
+        start = time.perf_counter()
+        rows = await super().fetchmany(size)
+        add_db_time(time.perf_counter() - start, rows=len(rows))
+        return rows
+
+    async def fetchall(self):
+        start = time.perf_counter()
+        rows = await super().fetchall()
+        add_db_time(time.perf_counter() - start, rows=len(rows))
+        return rows
+
+    async def log_slow_query(self, query, params, seconds):
+        """Logs a slow query with its parameters and, for a SELECT, the plan Postgres picked for it (EXPLAIN, not run again)."""
+        timings = current_timings.get()
+        route = route_template(timings.scope) if timings is not None else "outside a request"
+        SLOW_QUERIES.inc((route,))
+        text = query if isinstance(query, str) else query.as_string(self.connection)
+        plan = "(no plan for this statement)"
+        if text.lstrip().lower().startswith(EXPLAINED_STATEMENTS):
+            try:
+                # A savepoint, so a failing EXPLAIN does not abort the transaction the request is still using
+                async with self.connection.transaction():
+                    cur = psycopg.AsyncCursor(self.connection)
+                    await cur.execute("EXPLAIN " + text, params)
+                    plan = "\n".join(row[0] for row in await cur.fetchall())
+            except psycopg.Error as e:
+                plan = f"EXPLAIN failed: {e}"
+        slow_query_log.warning("Slow query (%.1f ms) on %s:\n%s\nParams: %r\n%s", seconds * 1000, route, text.strip(), params, plan)
+
+def configure_slow_query_log(threshold_seconds, path=None):
+    """Sets the slow-query threshold of TimedCursor and, when path is given, appends the slow-query log to that file."""
+    TimedCursor.slow_query_seconds = threshold_seconds
+    if path and not any(isinstance(handler, logging.FileHandler) for handler in slow_query_log.handlers):
+        handler = logging.FileHandler(path)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        slow_query_log.addHandler(handler)
+
+class MetricsMiddleware:
+    """ASGI middleware recording the latency, database time, encoding time and rows of every request by route.
+
+    Add it last so it is the outermost middleware: the time it records includes the response cache and compression.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings = RequestTimings(scope)
+        token = current_timings.set(timings)
+        status = 500  # if the app fails before starting a response
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_timings.reset(token)
+            route = route_template(scope)
+            REQUEST_SECONDS.observe((scope["method"], route, str(status)), elapsed)
+            DB_SECONDS.observe((route,), timings.db_seconds)
+            SERIALIZE_SECONDS.observe((route,), timings.serialize_seconds)
+            ROWS.observe((route,), timings.rows)
+            if timings.queries:
+                QUERIES.inc((route,), timings.queries)
+
+def render_metrics(pool_stats):
+    """Returns every API metric in the Prometheus text format, with the pool statistics from pool.get_stats()."""
+    in_use = pool_stats.get("pool_size", 0) - pool_stats.get("pool_available", 0)
+    POOL_CONNECTIONS.set(("in_use",), in_use)
+    POOL_CONNECTIONS.set(("idle",), pool_stats.get("pool_available", 0))
+    POOL_MAX.set((), pool_stats.get("pool_max", 0))
+    POOL_WAITING.set((), pool_stats.get("requests_waiting", 0))
+    # The pool keeps these as running totals itself, they are copied rather than incremented
+    POOL_REQUESTS.set((), pool_stats.get("requests_num", 0))
+    POOL_WAIT_SECONDS.set((), pool_stats.get("requests_wait_ms", 0) / 1000)
+    POOL_USAGE_SECONDS.set((), pool_stats.get("usage_ms", 0) / 1000)
+    POOL_ERRORS.set((), pool_stats.get("requests_errors", 0))
+    return registry.render()
@@ -0,0 +1,83 @@
+# Load test for the LORD API: keeps many concurrent clients busy against a running API and reports latency per endpoint.
+# How to run:  start the API ("uvicorn API_LORD_PGDB:app") against a local Postgres, then run
+# "python benchmarks/api_load_test.py --clients 150 --duration 30".  Requires "pip install httpx".
+# A slow endpoint (/campsites) is mixed in with fast ones so a blocked event loop shows up as high latency on every path.
+import argparse
+import asyncio
+import time
+from collections import defaultdict
+
+import httpx
+
+DEFAULT_PATHS = [
+    "/facilities?state=AZ",
+    "/activities?state=UT",
+    "/campsites",
+]
+
+def percentile(sorted_values, fraction):
+    """Returns the value at the given fraction (0-1) of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+async def client_loop(client, paths, client_number, deadline, latencies, errors):
+    """Sends requests back to back until the deadline, rotating through the paths."""
+    request_number = client_number
+    while time.perf_counter() < deadline:
+        path = paths[request_number % len(paths)]
+        request_number += 1
+        start = time.perf_counter()
+        try:
+            response = await client.get(path)
+            if response.status_code != 200:
+                errors[path] += 1
+                continue
+        except httpx.HTTPError:
+            errors[path] += 1
+            continue
+        latencies[path].append(time.perf_counter() - start)
+
+async def run_load_test(base_url, paths, clients, duration):
+    """Runs the load test and returns a dictionary of per-path results.
+
+    Args:
+        base_url: Where the API is running.
+        paths: The endpoint paths (with query strings) to request.
+        clients: How many concurrent clients to simulate.
+        duration: How many seconds to keep the load running.
+
+    Returns:
+        A dictionary keyed on path with request counts, errors and p50/p95/p99 latency in milliseconds.
+    """
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(client_loop(client, paths, n, deadline, latencies, errors) for n in range(clients)))
+
+    report = {}
+    for path in paths:
+        values = sorted(latencies[path])
+        report[path] = {
+            "requests": len(values),
+            "errors": errors[path],
+            "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+        }
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent-client load test for the LORD API")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--clients", type=int, default=150)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--path", action="append", dest="paths", help="Endpoint to include (repeatable)")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_load_test(args.base_url, args.paths or DEFAULT_PATHS, args.clients, args.duration))
+    print(f"{args.clients} clients for {args.duration}s against {args.base_url}")
+    for path, result in report.items():
+        print(f"{path}: {result}")
@@ -0,0 +1,69 @@
+# Benchmark for the LORD API: fires concurrent GET requests at a running API and reports requests per second.
+# How to run:  start the API ("uvicorn API_LORD_PGDB:app") against a local Postgres, then run
+# "python benchmarks/api_throughput.py --path /facilities?state=AZ".  Run it once on the old build and once on the new
+# build with the same arguments to compare before and after.
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+thread_data = threading.local()
+
+def get_session():
+    """Returns a requests.Session owned by the current worker thread so each worker keeps its own keep-alive connection."""
+    if not hasattr(thread_data, "session"):
+        thread_data.session = requests.Session()
+    return thread_data.session
+
+def timed_request(url):
+    """Sends one GET request and returns a tuple of (status_code, elapsed_seconds)."""
+    start = time.perf_counter()
+    response = get_session().get(url, timeout=60)
+    response.content  # make sure the whole body is downloaded
+    return response.status_code, time.perf_counter() - start
+
+def run_benchmark(url, total_requests, concurrency):
+    """Runs total_requests GET requests against url using concurrency worker threads.
+
+    Args:
+        url: The full URL to request.
+        total_requests: How many requests to send in total.
+        concurrency: How many requests are in flight at the same time.
+
+    Returns:
+        A dictionary with the throughput, latency percentiles and error count.
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(timed_request, [url] * total_requests))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for _, latency in results)
+    errors = sum(1 for status, _ in results if status != 200)
+    return {
+        "url": url,
+        "requests": total_requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(total_requests / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure requests/sec for a LORD API endpoint")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--path", default="/facilities?state=AZ")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    # Warm up the server (and its connection pool) before measuring
+    run_benchmark(f"{args.base_url}{args.path}", args.concurrency, args.concurrency)
+    report = run_benchmark(f"{args.base_url}{args.path}", args.requests, args.concurrency)
+    for key, value in report.items():
+        print(f"{key}: {value}")
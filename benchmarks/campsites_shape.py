@@ -0,0 +1,33 @@
+# Benchmark comparing the flat /campsites response (one row per attribute) with the nested one (one row per campsite).
+# How to run:  start the API against a local Postgres, then run "python benchmarks/campsites_shape.py --state AZ".
+import argparse
+
+import requests
+
+from api_throughput import run_benchmark
+
+def payload_size(url):
+    """Returns a tuple of (row_count, bytes) for one response from url."""
+    response = requests.get(url, timeout=120)
+    response.raise_for_status()
+    return len(response.json()), len(response.content)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare flat and nested /campsites responses")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--state", default="AZ")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=5)
+    args = parser.parse_args()
+
+    shapes = {
+        "flat": f"/campsites?state={args.state}",
+        "nested": f"/campsites?state={args.state}&nested=true",
+        "nested+equipment": f"/campsites?state={args.state}&nested=true&include_equipment=true",
+    }
+    for shape, path in shapes.items():
+        url = f"{args.base_url}{path}"
+        rows, size = payload_size(url)
+        report = run_benchmark(url, args.requests, args.concurrency)
+        print(f"{shape}: rows={rows} bytes={size} requests_per_s={report['requests_per_s']} "
+              f"p50_ms={report['p50_ms']} p99_ms={report['p99_ms']}")
@@ -0,0 +1,96 @@
+# Query plans of the API endpoints: runs each endpoint in-process, captures the SQL it sends to Postgres and prints
+# EXPLAIN (ANALYZE, BUFFERS) for every query, flagging sequential scans of large tables.  Use it to check that the
+# indexes and the "FacilitiesWithState"/"FacilitySearch" views from DBSetup/migrations are picked up, before and
+# after "python migrate.py".
+# How to run:  "python benchmarks/explain_endpoints.py --state AZ"  (add --plans to print the full plans as well)
+# Requires "pip install httpx" for FastAPI's TestClient.
+import argparse
+import json
+import os
+import sys
+
+import psycopg
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import API_LORD_PGDB as api
+
+SEQ_SCAN_MIN_ROWS = 1000  # sequential scans reading fewer rows than this are cheaper than an index and not flagged
+
+def endpoint_paths(state):
+    return [
+        "/facilities",
+        f"/facilities?state={state}",
+        f"/facilities?state={state}&ada_accessible=true",
+        f"/campsites?state={state}",
+        f"/campsites?state={state}&nested=true&include_equipment=true",
+        f"/activities?state={state}",
+        "/facilities/nearby?lat=34.0&lon=-111.0&radius_km=100",
+        "/facilities/bbox?min_lat=31&min_lon=-115&max_lat=37&max_lon=-109",
+        f"/search?q=campground&state={state}",
+        f"/campsites/query?state={state}&equipment=RV&min_length=35&reservable=true",
+        "/campsites/query?attribute=Pets Allowed:Yes&type_of_use=Overnight",
+        "/all_campsites?limit=1000",
+        "/all_campsite_attributes?limit=1000",
+    ]
+
+captured = []  # (path, query, params) sent while the current path was being requested
+current_path = ["startup"]
+
+class RecordingCursor(psycopg.AsyncCursor):
+    """Cursor used by the API's pool while the endpoints run, remembers every query before executing it."""
+
+    async def execute(self, query, params=None, **kwargs):
+        if str(query).strip():  # the pool's health check sends an empty query
+            captured.append((current_path[0], query, params))
+        return await super().execute(query, params, **kwargs)
+
+def capture_queries(paths):
+    """Requests each path through the API (response cache bypassed) and returns the queries each one ran."""
+    api.pool.kwargs["cursor_factory"] = RecordingCursor
+    with TestClient(api.app) as client:
+        for path in paths:
+            current_path[0] = path
+            api.response_cache.clear()
+            response = client.get(path)
+            if response.status_code != 200:
+                print(f"{path}: HTTP {response.status_code} {response.text[:200]}")
+    return captured
+
+def walk_plan(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from walk_plan(child)
+
+def explain(conn, query, params):
+    """Returns the JSON plan of EXPLAIN ANALYZE for one query, rolled back so nothing it does is kept."""
+    try:
+        return conn.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}", params).fetchone()[0][0]
+    finally:
+        conn.rollback()
+
+def report(queries, show_plans=False):
+    with psycopg.connect(**{key: value for key, value in api.pool.kwargs.items()
+                                if key not in ("cursor_factory", "prepare_threshold")}) as conn:
+        for path, query, params in queries:
+            plan = explain(conn, query, params)
+            nodes = list(walk_plan(plan["Plan"]))
+            seq_scans = [f'{node["Relation Name"]} ({node["Actual Rows"] * node["Actual Loops"]} rows)'
+                         for node in nodes if node["Node Type"] == "Seq Scan"
+                         and node["Actual Rows"] * node["Actual Loops"] >= SEQ_SCAN_MIN_ROWS]
+            indexes = sorted({node["Index Name"] for node in nodes if "Index Name" in node})
+            print(f"\n{path}")
+            print(f"  planning {plan['Planning Time']:.2f} ms, execution {plan['Execution Time']:.2f} ms, "
+                  f"{plan['Plan']['Actual Rows']} rows")
+            print(f"  indexes used: {', '.join(indexes) or 'none'}")
+            if seq_scans:
+                print(f"  SEQ SCAN: {', '.join(seq_scans)}")
+            if show_plans:
+                print(json.dumps(plan["Plan"], indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EXPLAIN ANALYZE the queries run by the API endpoints")
+    parser.add_argument("--state", default="AZ", help="State code used by the filtered endpoints")
+    parser.add_argument("--plans", action="store_true", help="Also print the full JSON plans")
+    args = parser.parse_args()
+    report(capture_queries(endpoint_paths(args.state)), args.plans)
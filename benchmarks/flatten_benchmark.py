@@ -0,0 +1,166 @@
+# Benchmark for process_facilities_data: the column-at-a-time flattening, orjson GEOJSON and Arrow ID casts against the
+# nested Python loops, json.dumps and pd.to_numeric casts they replaced.  Both are run on the same synthetic input and
+# their six DataFrames are checked to be identical.  The numbers of the last run are in the README.
+# How to run:  "python benchmarks/flatten_benchmark.py --facilities 100000 --campsites 3"
+import argparse
+import copy
+import gc
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # the repo root, for create_dataframes
+import create_dataframes
+from columnar_io import TABLE_ORDER
+from create_dataframes import cast_dtypes, create_dataframe, process_facilities_data
+from metrics import StageTimer
+from synthetic_data import make_facilities
+
+def geojson_to_json_loop(geojson):
+    """The previous json.dumps serialization of a facility GEOJSON dictionary."""
+    if isinstance(geojson, dict) and geojson.get('COORDINATES'):
+        return json.dumps(geojson)
+    return None
+
+def process_facilities_data_loop(facilities_data):
+    """The previous nested-loop implementation of process_facilities_data, kept as the baseline.  Its ID columns are
+    parsed by pd.to_numeric, as they were before to_integers.
+
+    Args:
+        facilities_data: The list of dictionaries representing the facilities from the API.
+
+    Returns:
+        A tuple containing the facilities_df, activities_df, campsites_df, permitted_equipment_df, campsite_attributes_df and facility_address_df.
+    """
+    start = time.perf_counter()
+    facilities_df = create_dataframe(facilities_data)
+    facility_address_data = []
+    activities_data = []
+    campsites_data = []
+    # events_data = []
+    
+    permitted_equipment_data = []  # Initialize permitted equipment data
+    campsite_attribute_db = []
+
+    for facility in facilities_data:
+        facility_id = facility.get('FacilityID')
+        if facility_id:
+            if 'ACTIVITY' in facility and facility["ACTIVITY"] : #Check if there is data
+                for act in facility["ACTIVITY"]:
+                    act['FacilityID'] = facility_id
+                    activities_data.append(act)
+
+            if 'CAMPSITE' in facility and facility["CAMPSITE"]: #Check if there is data
+              for camp in facility["CAMPSITE"]:
+                    camp_id = camp.get('CampsiteID')
+                    if camp_id:
+                        camp['FacilityID'] = facility_id #assign the facility id as a foreign key to be used in tables
+                        # Flatten Permitted Equipment data
+                        for equipment in camp.get('PERMITTEDEQUIPMENT', []):
+                             equipment['CampsiteID'] = camp_id
+                             permitted_equipment_data.append(equipment) # adds permitted equipment data into the list
+                        for attribute in camp.get('ATTRIBUTES', []):
+                            attribute['CampsiteID'] = camp_id
+                            campsite_attribute_db.append(attribute) #add the campsite attributes to the list
+                        campsites_data.append(camp)
+            # if 'EVENT' in facility and facility["EVENT"]: #Check if there is data
+            #   for event in facility["EVENT"]:
+            #     event['FacilityID'] = facility_id
+            #     events_data.append(event)
+            if facility.get('FACILITYADDRESS'):  #check that list is not empty
+              for address in facility.get('FACILITYADDRESS'):
+                address['FacilityID'] = facility_id
+                facility_address_data.append(address)
+    
+    facilities_df = facilities_df.drop(columns = ["ACTIVITY", "CAMPSITE", "EVENT"], errors = 'ignore') #Drop the columns that have blank data
+    if not facilities_df.empty:
+        facilities_df['GEOJSON'] = facilities_df['GEOJSON'].map(geojson_to_json_loop) #Serialize GEOJSON as real JSON for the JSONB column
+    activities_df = create_dataframe(activities_data)
+    campsites_df = create_dataframe(campsites_data)
+    # events_df = create_dataframe(events_data)
+    permitted_equipment_df = create_dataframe(permitted_equipment_data) # Creates a DF for the permitted equipment
+    campsite_attributes_df = create_dataframe(campsite_attribute_db) # Creates a DF for the campsite attributes
+    facility_address_df = create_dataframe(facility_address_data)
+
+    # Merge Permitted Equipment Back to the Campsite Table (using a left join)
+    #campsites_df = pd.merge(campsites_df, permitted_equipment_df, on="CampsiteID", how='left', suffixes=('', '_permit'))
+    #campsites_df = pd.merge(campsites_df, campsite_attributes_df, on="CampsiteID", how='left', suffixes = ('', '_attrib'))
+    # facilities_df = pd.merge(facilities_df, facility_address_df, on="FacilityID", how='left', suffixes = ('', '_address'))
+     # Drop nested columns from campsites table
+    campsites_df = campsites_df.drop(columns = ['ENTITYMEDIA', 'PERMITTEDEQUIPMENT', 'ATTRIBUTES','CreatedDate'], errors ='ignore')
+    facilities_df = facilities_df.drop(columns = ['FacilityAccessibilityText', 'Enabled', 'LINK', 'MEDIA', 'ORGANIZATION', 'PERMITENTRANCE', 'RECAREA', 'TOUR', 'FacilityAddressType', 'LastUpdatedDate_address'], errors ='ignore')
+    activities_df = activities_df.drop(columns = ['FacilityActivityFeeDescription'], errors ='ignore')
+    facility_address_df = facility_address_df.drop(columns = ['FacilityAddressType'], errors ='ignore')
+    frames = (facilities_df, activities_df, campsites_df, permitted_equipment_df, campsite_attributes_df, facility_address_df)
+    create_dataframes.stage_timer.add("flatten", time.perf_counter() - start, len(facilities_data))
+    start = time.perf_counter()
+    arrow, create_dataframes.pa = create_dataframes.pa, None  # to_integers falls back to pd.to_numeric without pyarrow
+    try:
+        return tuple(cast_dtypes(df, table) for df, table in zip(frames, TABLE_ORDER))
+    finally:
+        create_dataframes.pa = arrow
+        create_dataframes.stage_timer.add("cast_dtypes", time.perf_counter() - start)
+
+def edge_cases():
+    """A few records the loop handled specially: no ID, empty or missing lists, campsites without an ID, and IDs
+    that Arrow does not parse."""
+    facilities = make_facilities(["AZ"], 5, campsites_per_facility=2)
+    facilities[0]["FacilityID"] = ""
+    facilities[1]["ACTIVITY"] = []
+    del facilities[1]["FACILITYADDRESS"]
+    facilities[2]["CAMPSITE"][0]["CampsiteID"] = ""
+    facilities[2]["CAMPSITE"][1]["PERMITTEDEQUIPMENT"] = []
+    facilities[3]["CAMPSITE"] = []
+    facilities[4]["CAMPSITE"][0]["CampsiteID"] = " 12 "
+    facilities[4]["FACILITYADDRESS"][0]["FacilityAddressID"] = ""
+    del facilities[4]["GEOJSON"]
+    return facilities
+
+def check_identical(facilities_data):
+    """Raises an AssertionError when the two versions build different DataFrames from facilities_data.  GEOJSON is
+    compared as parsed JSON, orjson leaving out the spaces json.dumps puts after separators."""
+    expected = process_facilities_data_loop(copy.deepcopy(facilities_data))
+    actual = process_facilities_data(facilities_data)
+    for df in (expected[0], actual[0]):
+        df['GEOJSON'] = df['GEOJSON'].map(json.loads, na_action='ignore')
+    for expected_df, actual_df in zip(expected, actual):
+        pd.testing.assert_frame_equal(expected_df.reset_index(drop=True), actual_df.reset_index(drop=True))
+
+def time_call(function, facilities_data):
+    """Runs function on a copy of facilities_data and returns its flatten, cast_dtypes and total seconds, and the rows
+    per DataFrame.  The DataFrames are not kept, so that every run starts from the same heap."""
+    timer = create_dataframes.stage_timer = StageTimer("create_dataframes")  # only this run is counted
+    facilities_data = copy.deepcopy(facilities_data)  # the loop writes the parent IDs into the dictionaries
+    gc.collect()
+    start = time.perf_counter()
+    frames = function(facilities_data)
+    seconds = time.perf_counter() - start
+    stages = [timer.seconds.values.get((timer.job, stage), 0) for stage in ("flatten", "cast_dtypes")]
+    return (*stages, seconds), [len(df) for df in frames]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the column-wise and loop flattening of facilities")
+    parser.add_argument("--facilities", type=int, default=100000, help="Total synthetic facilities")
+    parser.add_argument("--campsites", type=int, default=3, help="Campsites per facility")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of each version, taking turns; the fastest is kept")
+    args = parser.parse_args()
+
+    check_identical(edge_cases())
+    states = ["AZ", "UT", "OR"]
+    facilities_data = make_facilities(states, args.facilities // len(states), args.campsites)
+    check_identical(facilities_data[:2000])
+    print("Column-wise output is identical to the loop output")
+
+    best = {}
+    for _ in range(args.repeat):
+        for name, function in (("loop", process_facilities_data_loop), ("column-wise", process_facilities_data)):
+            seconds, rows = time_call(function, facilities_data)
+            best[name] = min(best.get(name, seconds), seconds, key=lambda timing: timing[-1])
+    print(f"{len(facilities_data)} facilities -> rows per frame: {rows}")
+    print(f"{'':<14}{'flatten':>10}{'cast_dtypes':>14}{'total':>10}")
+    for name, (flatten, cast, total) in best.items():
+        print(f"{name:<14}{flatten:>9.2f}s{cast:>13.2f}s{total:>9.2f}s")
+    print(f"speedup:      {best['loop'][-1] / best['column-wise'][-1]:.1f}x")
@@ -0,0 +1,136 @@
+# A local stand-in for the RIDB API (https://ridb.recreation.gov/api/v1/) serving synthetic facilities and campsites,
+# so the fetcher can be exercised and timed without an API key or the real rate limit.
+# How to run:  "python benchmarks/mock_ridb_server.py --port 8081 --facilities-per-state 500"  and then
+# "python fetch_and_save_data.py --base-url http://127.0.0.1:8081/api/v1/"
+import argparse
+import datetime
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from synthetic_data import make_campsite, make_facility
+
+class MockRIDB:
+    """The synthetic dataset plus an optional per-minute rate limit, shared by all request handler threads."""
+
+    def __init__(self, states, facilities_per_state, campsites_per_facility, rate_limit=None, latency=0.0, error_rate=0.0):
+        self.facilities = {state: [make_facility(state, index) for index in range(facilities_per_state)] for state in states}
+        self.by_id = {facility["FacilityID"]: facility for facilities in self.facilities.values() for facility in facilities}
+        self.campsites_per_facility = campsites_per_facility
+        self.rate_limit = rate_limit
+        self.latency = latency
+        self.error_rate = error_rate  # fraction of requests answered with a 503, to exercise retries and --resume
+        self.request_times = deque()
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.throttled_count = 0
+
+    def retry_after(self):
+        """Records a request and returns 0 if it is allowed, else the seconds until the sliding window frees up."""
+        with self.lock:
+            self.request_count += 1
+            if not self.rate_limit:
+                return 0
+            now = time.monotonic()
+            while self.request_times and now - self.request_times[0] >= 60:
+                self.request_times.popleft()
+            if len(self.request_times) >= self.rate_limit:
+                self.throttled_count += 1
+                return 60 - (now - self.request_times[0])
+            self.request_times.append(now)
+            return 0
+
+    def facilities_page(self, query):
+        state = query.get("state", [None])[0]
+        limit = int(query.get("limit", ["50"])[0])
+        offset = int(query.get("offset", ["0"])[0])
+        records = self.facilities.get(state, []) if state else [f for facilities in self.facilities.values() for f in facilities]
+        if query.get("lastupdated"):
+            # RIDB takes MM-DD-YYYY and returns records updated on or after that day
+            since = datetime.datetime.strptime(query["lastupdated"][0], "%m-%d-%Y").date().isoformat()
+            records = [record for record in records if record["LastUpdatedDate"] >= since]
+        page = records[offset:offset + limit]
+        return {"RECDATA": page, "METADATA": {"RESULTS": {"CURRENT_COUNT": len(page), "TOTAL_COUNT": len(records)}}}
+
+    def related(self, facility_id, endpoint):
+        facility = self.by_id.get(facility_id)
+        if facility is None:
+            return None
+        if endpoint == "campsites":
+            rng = random.Random(f"campsites-{facility_id}")
+            records = [make_campsite(facility, index, rng) for index in range(self.campsites_per_facility)]
+        elif endpoint == "activities":
+            records = facility.get("ACTIVITY", [])
+        else:
+            records = []
+        return {"RECDATA": records, "METADATA": {"RESULTS": {"CURRENT_COUNT": len(records), "TOTAL_COUNT": len(records)}}}
+
+def make_handler(ridb):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.headers.get("apikey") is None:
+                return self.send_json(401, {"error": "missing apikey header"})
+            wait = ridb.retry_after()
+            if wait:
+                return self.send_json(429, {"error": "rate limit exceeded"}, {"Retry-After": str(max(1, round(wait)))})
+            if ridb.latency:
+                time.sleep(ridb.latency)
+            if ridb.error_rate and random.random() < ridb.error_rate:
+                return self.send_json(503, {"error": "simulated outage"})
+
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            if re.fullmatch(r"/api/v1/facilities/?", url.path):
+                return self.send_json(200, ridb.facilities_page(query))
+            match = re.fullmatch(r"/api/v1/facilities/([^/]+)/(\w+)/?", url.path)
+            if match:
+                body = ridb.related(match.group(1), match.group(2))
+                if body is not None:
+                    return self.send_json(200, body)
+            self.send_json(404, {"error": f"not found: {url.path}"})
+
+        def send_json(self, status, body, headers=None):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass  # keep the console quiet, thousands of requests are expected
+
+    return Handler
+
+def start_server(ridb, port=0):
+    """Starts the mock server on a background thread and returns (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(ridb))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/api/v1/"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve synthetic RIDB data locally")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--states", nargs="+", default=["AZ", "UT", "OR"])
+    parser.add_argument("--facilities-per-state", type=int, default=500)
+    parser.add_argument("--campsites-per-facility", type=int, default=20)
+    parser.add_argument("--rate-limit", type=int, default=None, help="Requests per minute before answering 429")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds of simulated latency per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    args = parser.parse_args()
+
+    ridb = MockRIDB(args.states, args.facilities_per_state, args.campsites_per_facility, args.rate_limit, args.latency,
+                    args.error_rate)
+    server, url = start_server(ridb, args.port)
+    print(f"Mock RIDB serving {len(ridb.by_id)} facilities at {url} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
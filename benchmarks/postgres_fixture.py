@@ -0,0 +1,125 @@
+# Throwaway LORD databases for the benchmarks.  PostgresFixture creates a fresh database on a Postgres server from
+# DBSetup/QuickDBD-recGov.sql plus every migration in DBSetup/migrations, and drops it again when the benchmark is done;
+# TemporaryCluster starts a private Postgres server (initdb + pg_ctl, listening on a Unix socket only) for machines
+# without one.  The real "LORD" database is never touched.
+# How to run:  used by "python benchmarks/run_suite.py"; "python benchmarks/postgres_fixture.py" only creates the
+# benchmark database and leaves it in place (add --temp-cluster to start a private server and keep it running).
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+
+import psycopg
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # the repo root, for migrate
+import migrate
+from load_to_postgres import DB_HOST, DB_PASSWORD, DB_USER
+
+BENCHMARK_DB_NAME = "LORD_benchmark"
+SCHEMA_FILE = os.path.join(os.path.dirname(migrate.MIGRATIONS_DIR), "QuickDBD-recGov.sql")
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class TemporaryCluster:
+    """A private Postgres server in a temporary directory, reachable through a Unix socket in that directory.
+
+    Postgres refuses to run as root, so run the benchmarks as a regular user when using this.
+
+    Args:
+        bin_dir: Directory holding initdb and pg_ctl; found on PATH when not given.
+        port: Port number the socket is named after (nothing listens on TCP).
+    """
+
+    def __init__(self, bin_dir=None, port=None):
+        self.bin_dir = bin_dir
+        self.port = port or free_port()
+        self.directory = None
+
+    def command(self, name):
+        path = os.path.join(self.bin_dir, name) if self.bin_dir else shutil.which(name)
+        if not path or not os.path.exists(path):
+            raise RuntimeError(f"{name} not found, pass the directory of the Postgres binaries with --pg-bin")
+        return path
+
+    def connection_kwargs(self):
+        return {"host": self.directory, "port": self.port, "user": "postgres"}
+
+    def __enter__(self):
+        self.directory = tempfile.mkdtemp(prefix="lord_pg_")
+        data_dir = os.path.join(self.directory, "data")
+        subprocess.run([self.command("initdb"), "-D", data_dir, "-U", "postgres", "-A", "trust", "--no-sync"],
+                       check=True, stdout=subprocess.DEVNULL)
+        subprocess.run([self.command("pg_ctl"), "-D", data_dir, "-l", os.path.join(self.directory, "postgres.log"), "-w",
+                        "-o", f"-k {self.directory} -p {self.port} -c listen_addresses='' -c fsync=off", "start"],
+                       check=True, stdout=subprocess.DEVNULL)
+        return self
+
+    def __exit__(self, *exc_info):
+        subprocess.run([self.command("pg_ctl"), "-D", os.path.join(self.directory, "data"), "-m", "fast", "-w", "stop"],
+                       stdout=subprocess.DEVNULL)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+class PostgresFixture:
+    """A fresh LORD database with the current schema and migrations, dropped on exit unless keep is set.
+
+    Args:
+        server_kwargs: psycopg.connect arguments of the server (host, port, user, password), without dbname.
+        dbname: Name of the database to create; an existing database of that name is dropped first.
+        keep: Leave the database in place on exit, e.g. to look at it after a run.
+    """
+
+    def __init__(self, server_kwargs=None, dbname=BENCHMARK_DB_NAME, keep=False):
+        if dbname == migrate.DB_NAME:
+            raise ValueError(f"Refusing to use the {dbname} database for benchmarks")
+        self.server_kwargs = server_kwargs or {"host": DB_HOST, "user": DB_USER, "password": DB_PASSWORD}
+        self.dbname = dbname
+        self.keep = keep
+
+    def connection_kwargs(self):
+        return {**self.server_kwargs, "dbname": self.dbname}
+
+    def drop_database(self):
+        with psycopg.connect(**self.server_kwargs, dbname="postgres", autocommit=True) as conn:
+            conn.execute("""SELECT pg_terminate_backend(pid) FROM pg_stat_activity WHERE datname = %s AND pid <> pg_backend_pid()""",
+                         [self.dbname])
+            conn.execute(f'DROP DATABASE IF EXISTS "{self.dbname}"')
+
+    def __enter__(self):
+        self.drop_database()
+        with psycopg.connect(**self.server_kwargs, dbname="postgres", autocommit=True) as conn:
+            conn.execute(f'CREATE DATABASE "{self.dbname}"')
+        with open(SCHEMA_FILE, encoding="utf-8-sig") as infile:  # the QuickDBD export starts with a byte order mark
+            schema = infile.read()
+        with psycopg.connect(**self.connection_kwargs()) as conn:
+            conn.execute(schema)
+            conn.commit()
+            migrate.migrate(conn)
+        return self
+
+    def __exit__(self, *exc_info):
+        if not self.keep:
+            self.drop_database()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create the LORD benchmark database")
+    parser.add_argument("--pg-host", default=DB_HOST, help="Server host or Unix socket directory")
+    parser.add_argument("--pg-port", type=int, default=5432)
+    parser.add_argument("--dbname", default=BENCHMARK_DB_NAME)
+    parser.add_argument("--temp-cluster", action="store_true", help="Start a private server in a temporary directory")
+    parser.add_argument("--pg-bin", help="Directory of initdb and pg_ctl for --temp-cluster")
+    args = parser.parse_args()
+
+    if args.temp_cluster:
+        cluster = TemporaryCluster(args.pg_bin).__enter__()  # left running, stop it with pg_ctl
+        server_kwargs = cluster.connection_kwargs()
+        print(f"Postgres running in {cluster.directory} (stop it with: pg_ctl -D {cluster.directory}/data stop)")
+    else:
+        server_kwargs = {"host": args.pg_host, "port": args.pg_port, "user": DB_USER, "password": DB_PASSWORD}
+    fixture = PostgresFixture(server_kwargs, args.dbname, keep=True).__enter__()
+    print(f"Created database {fixture.dbname}: {fixture.connection_kwargs()}")
@@ -0,0 +1,81 @@
+# Benchmark of the response encodings of the LORD API on /all_permitted_equipment (the largest table).
+# Reads the rows the endpoint returns straight from Postgres, then times each way of turning them into a response body:
+# the old FastAPI path (validate against List[Dict], jsonable_encoder, json.dumps), orjson, MessagePack and Arrow IPC,
+# and reports the bytes of each body raw, gzipped and Brotli-compressed.
+# How to run:  "python benchmarks/response_formats.py --repeat 5"  (needs orjson; msgpack, pyarrow and brotli are optional)
+import argparse
+import gzip
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+import psycopg
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import API_LORD_PGDB as api
+from api_responses import ARROW_MEDIA_TYPE, JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPES, available_media_types, brotli, encode_rows
+
+TABLE = "PermittedEquipment"
+
+def fetch_rows(table=TABLE):
+    """Returns (column names, rows) of the query /all_* runs for table, without paging."""
+    query, params = api.build_table_query(table)
+    with psycopg.connect(**{key: value for key, value in api.pool.kwargs.items()
+                            if key not in ("cursor_factory", "prepare_threshold")}) as conn:
+        cur = conn.execute(query, params)
+        rows = cur.fetchall()
+    return [desc[0] for desc in cur.description], rows
+
+def fastapi_default(column_names, rows):
+    """What the endpoint did before: build dictionaries, validate them against List[Dict] and encode with json."""
+    records = TypeAdapter(List[Dict]).validate_python([dict(zip(column_names, row)) for row in rows])
+    return json.dumps(jsonable_encoder(records), ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+def time_call(function, repeat):
+    """Returns (median seconds, result) of calling function repeat times."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+def run_benchmark(column_names, rows, repeat=5):
+    encoders = [("FastAPI default JSON", lambda: fastapi_default(column_names, rows)),
+                ("orjson", lambda: encode_rows(column_names, rows, JSON_MEDIA_TYPE))]
+    available = available_media_types()
+    if MSGPACK_MEDIA_TYPES[0] in available:
+        encoders.append(("MessagePack (columnar)", lambda: encode_rows(column_names, rows, MSGPACK_MEDIA_TYPES[0])))
+    if ARROW_MEDIA_TYPE in available:
+        encoders.append(("Arrow IPC", lambda: encode_rows(column_names, rows, ARROW_MEDIA_TYPE)))
+
+    results = []
+    for name, encode in encoders:
+        seconds, body = time_call(encode, repeat)
+        result = {"format": name, "serialize_ms": seconds * 1000, "bytes": len(body)}
+        gzip_seconds, compressed = time_call(lambda: gzip.compress(body, compresslevel=api.GZIP_LEVEL), repeat)
+        result.update(gzip_ms=gzip_seconds * 1000, gzip_bytes=len(compressed))
+        if brotli is not None:
+            brotli_seconds, compressed = time_call(lambda: brotli.compress(body, quality=api.BROTLI_QUALITY), repeat)
+            result.update(brotli_ms=brotli_seconds * 1000, brotli_bytes=len(compressed))
+        results.append(result)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time and size the response encodings of /all_permitted_equipment")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement, the median is reported")
+    args = parser.parse_args()
+
+    column_names, rows = fetch_rows()
+    print(f"{len(rows)} rows of {TABLE}, median of {args.repeat} runs\n")
+    print(f"{'format':<24}{'serialize ms':>14}{'bytes':>12}{'gzip ms':>10}{'gzip bytes':>12}{'br ms':>10}{'br bytes':>12}")
+    for result in run_benchmark(column_names, rows, args.repeat):
+        print(f"{result['format']:<24}{result['serialize_ms']:>14.1f}{result['bytes']:>12}"
+              f"{result['gzip_ms']:>10.1f}{result['gzip_bytes']:>12}"
+              f"{result.get('brotli_ms', float('nan')):>10.1f}{result.get('brotli_bytes', '-'):>12}")
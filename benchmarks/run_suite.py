@@ -0,0 +1,443 @@
+# Reproducible benchmark suite for the whole pipeline: generates a synthetic dataset, then times the fetcher against the
+# mock RIDB server, the flattening (process_facilities_data), the CSV output (output_to_csv), the COPY load into a
+# throwaway Postgres database and the API under concurrent load, and writes one JSON report with the throughput,
+# p50/p99 latency and peak RSS of every stage.  Each stage runs in its own Python process so its peak RSS is its own.
+# Reports from two commits can be compared with --compare, e.g. in CI with --fail-on-regression.
+# How to run:  "python benchmarks/run_suite.py --scale current --output before.json", check out the other commit, then
+# "python benchmarks/run_suite.py --scale current --output after.json --compare before.json".
+# --scale large generates 1M campsites; use --skip-postgres (or --stages) on machines without a Postgres server.
+# Requires "pip install httpx uvicorn" for the api stage.
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+
+import httpx
+import psycopg
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # the repo root, for the ETL modules
+import fetch_and_save_data as fetcher
+from api_load_test import percentile, run_load_test
+from create_dataframes import CHUNK_SIZE, OUTPUT_FILES, output_to_csv, process_facilities_data, read_facilities_in_chunks
+from jsonl_io import JsonlWriter
+from load_to_postgres import DB_HOST, DB_PASSWORD, DB_USER, load_facilities
+from mock_ridb_server import MockRIDB, start_server
+from postgres_fixture import PostgresFixture, TemporaryCluster, free_port
+from rate_limiter import TokenBucket
+from synthetic_data import iter_facilities
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAGES = ["generate", "fetch", "flatten", "csv", "load", "api"]
+DB_STAGES = ("load", "api")
+STATES = ["AZ", "UT", "OR"]
+
+# "current" is about the size of the real RIDB pull for AZ, UT and OR; "large" is 1M campsites.  The fetcher is timed
+# on a smaller slice, its throughput does not depend on the size of the dataset.
+SCALES = {
+    "small": {"facilities_per_state": 300, "campsites_per_facility": 3, "fetch_facilities_per_state": 100},
+    "current": {"facilities_per_state": 3000, "campsites_per_facility": 3, "fetch_facilities_per_state": 1000},
+    "large": {"facilities_per_state": 33334, "campsites_per_facility": 10, "fetch_facilities_per_state": 3000},
+}
+
+# Endpoints the api stage loads one at a time, all valid on the synthetic data
+API_PATHS = [
+    "/facilities?state=AZ",
+    "/facilities/nearby?lat=34.2&lon=-111.6&radius_km=50",
+    "/campsites/query?state=UT&equipment=RV&min_length=35&limit=100",
+    "/activities?state=OR",
+    "/search?q=synthetic+campground&limit=20",
+    "/all_campsites?limit=1000",
+]
+
+# Metrics compared between reports: +1 when higher is better, -1 when lower is better
+COMPARED_METRICS = {"throughput_per_s": 1, "p50_ms": -1, "p99_ms": -1, "peak_rss_mb": -1}
+
+# Stages, run in a child process by --run-stage.  Each returns the items it handled and the duration of every
+# chunk (or request) in seconds, from which the parent computes throughput and latency percentiles.
+
+def stage_generate(config):
+    """Streams the synthetic dataset to the JSONL file the later stages read, a chunk of facilities at a time."""
+    durations = []
+    facilities = iter_facilities(STATES, config["facilities_per_state"], config["campsites_per_facility"])
+    with JsonlWriter(config["input"]) as writer:
+        while True:
+            start = time.perf_counter()
+            count = 0
+            for facility in facilities:
+                writer.write(facility)
+                count += 1
+                if count == config["chunk_size"]:
+                    break
+            if not count:
+                break
+            durations.append(time.perf_counter() - start)
+        total = writer.count
+    return {"items": total, "unit": "facilities", "durations": durations,
+            "counts": {"campsites": total * config["campsites_per_facility"]}}
+
+def stage_fetch(config):
+    """Fetches every facility and its campsites from the mock RIDB server the parent started, timing each request."""
+    durations = []
+    session = fetcher.create_session(config["workers"])
+    send = session.request
+
+    def timed_request(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return send(*args, **kwargs)
+        finally:
+            durations.append(time.perf_counter() - start)
+
+    session.request = timed_request
+    fetcher.session = session
+    fetcher.base_url = config["mock_url"]
+    fetcher.rate_limiter = TokenBucket(1000000, per=60)  # the mock server has no rate limit, so neither has the client
+    start = time.perf_counter()
+    facilities = fetcher.fetch_states_concurrently("benchmark", "facilities", states=STATES, max_workers=config["workers"])
+    with JsonlWriter(os.path.join(config["workdir"], "fetched.jsonl")) as writer:
+        fetcher.fetch_related_data_concurrently("benchmark", facilities, max_workers=config["workers"], raise_errors=True,
+                                                on_complete=writer.write)
+    return {"items": len(durations), "unit": "requests", "seconds": time.perf_counter() - start, "durations": durations,
+            "counts": {"facilities": len(facilities)}}
+
+def stage_flatten(config):
+    """Times process_facilities_data on every chunk of the dataset, without the time spent reading it."""
+    durations = []
+    items = rows = 0
+    for chunk in read_facilities_in_chunks(config["input"], config["chunk_size"]):
+        start = time.perf_counter()
+        frames = process_facilities_data(chunk)
+        durations.append(time.perf_counter() - start)
+        items += len(chunk)
+        rows += sum(len(df) for df in frames)
+    return {"items": items, "unit": "facilities", "durations": durations, "counts": {"rows": rows}}
+
+def stage_csv(config):
+    """Times output_to_csv writing the six DataFrames of every chunk, appending after the first chunk like create_dataframes.py."""
+    durations = []
+    written = set()
+    rows = 0
+    output_dir = os.path.join(config["workdir"], "csv_output")
+    for chunk in read_facilities_in_chunks(config["input"], config["chunk_size"]):
+        frames = process_facilities_data(chunk)
+        start = time.perf_counter()
+        for (_, filename), df in zip(OUTPUT_FILES, frames):
+            output_to_csv(df, filename, append=filename in written, output_dir=output_dir)
+            if not df.empty:
+                written.add(filename)
+                rows += len(df)
+        durations.append(time.perf_counter() - start)
+    return {"items": rows, "unit": "rows", "durations": durations}
+
+def stage_load(config):
+    """Loads the dataset into the benchmark database with load_facilities; a chunk's time covers reading, flattening and COPY."""
+    durations = []
+
+    def timed_chunks():
+        start = time.perf_counter()
+        for chunk in read_facilities_in_chunks(config["input"], config["chunk_size"]):
+            yield chunk  # load_facilities flattens and copies the chunk before asking for the next one
+            durations.append(time.perf_counter() - start)
+            start = time.perf_counter()
+
+    start = time.perf_counter()
+    with psycopg.connect(**config["db"]) as conn:
+        loaded = load_facilities(conn, timed_chunks())
+        conn.commit()
+    return {"items": loaded["Facilities"], "unit": "facilities", "seconds": time.perf_counter() - start,
+            "durations": durations, "counts": {"rows": sum(loaded.values())}}
+
+def stage_api(config):
+    """Serves the API on config['port'] against the benchmark database until the parent stops it."""
+    import uvicorn  # only needed here
+    import API_LORD_PGDB as api
+
+    api.pool.kwargs.update(config["db"])
+    api.SLOW_QUERY_LOG_FILE = os.path.join(config["workdir"], "slow_queries.log")  # next to the stage logs
+    if not config["api_cache"]:
+        api.CACHED_PATHS.clear()  # read when the middleware stack is built on the first request: nothing is cached
+    uvicorn.run(api.app, host="127.0.0.1", port=config["port"], log_level="warning")
+
+STAGE_FUNCTIONS = {"generate": stage_generate, "fetch": stage_fetch, "flatten": stage_flatten, "csv": stage_csv,
+                   "load": stage_load, "api": stage_api}
+
+def run_stage(stage, config_file):
+    """Entry point of the child process: runs one stage and writes its result next to the config file."""
+    with open(config_file) as infile:
+        config = json.load(infile)
+    result = STAGE_FUNCTIONS[stage](config)
+    if result is not None:
+        result.setdefault("seconds", sum(result["durations"]))
+        with open(os.path.join(config["workdir"], f"{stage}.result.json"), "w") as outfile:
+            json.dump(result, outfile)
+
+# The parent process
+
+def peak_rss_mb(usage):
+    """Converts ru_maxrss to MB: it is in kilobytes on Linux and in bytes on macOS."""
+    return round(usage.ru_maxrss / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+def start_stage(stage, config_file, workdir):
+    log = open(os.path.join(workdir, f"{stage}.log"), "w")
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--run-stage", stage, "--stage-config", config_file],
+                               cwd=workdir, stdout=log, stderr=subprocess.STDOUT)
+    log.close()  # the child has its own copy
+    return process
+
+def wait_stage(process):
+    """Waits for a stage process and returns its peak RSS in MB (None where os.wait4 is missing, e.g. on Windows)."""
+    if not hasattr(os, "wait4"):
+        process.wait()
+        return None
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return peak_rss_mb(usage)
+
+def check_stage(stage, process, workdir):
+    if process.returncode:
+        with open(os.path.join(workdir, f"{stage}.log")) as infile:
+            tail = infile.read()[-3000:]
+        raise RuntimeError(f"The {stage} stage failed with exit code {process.returncode}:\n{tail}")
+
+def summarize(items, unit, seconds, durations, rss_mb, counts=None):
+    durations = sorted(durations)
+    entry = {
+        "items": items,
+        "unit": unit,
+        "seconds": round(seconds, 3),
+        "throughput_per_s": round(items / seconds, 1) if seconds else None,
+        "p50_ms": round(percentile(durations, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(durations, 0.99) * 1000, 2),
+        "samples": len(durations),
+        "peak_rss_mb": rss_mb,
+    }
+    if counts:
+        entry["counts"] = counts
+    return entry
+
+def run_etl_stage(stage, config_file, workdir):
+    process = start_stage(stage, config_file, workdir)
+    rss_mb = wait_stage(process)
+    check_stage(stage, process, workdir)
+    with open(os.path.join(workdir, f"{stage}.result.json")) as infile:
+        result = json.load(infile)
+    return summarize(result["items"], result["unit"], result["seconds"], result["durations"], rss_mb, result.get("counts"))
+
+def wait_for_api(base_url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            if httpx.get(f"{base_url}/metrics", timeout=1).status_code == 200:
+                return True
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    return False
+
+def run_api_stage(config, config_file, workdir, paths, clients, duration, warmup):
+    """Starts the API in a child process and loads each path in turn; the server's peak RSS is shared by all of them.
+
+    Returns:
+        A dictionary of 'api <path>' -> stage entry, with one sample per request.
+    """
+    base_url = f"http://127.0.0.1:{config['port']}"
+    process = start_stage("api", config_file, workdir)
+    try:
+        if not wait_for_api(base_url, process):
+            process.kill()
+            wait_stage(process)
+            check_stage("api", process, workdir)
+            raise RuntimeError(f"The API did not start, see {os.path.join(workdir, 'api.log')}")
+        asyncio.run(run_load_test(base_url, paths, clients, warmup))  # opens the pool's connections and warms the caches
+        results = {path: asyncio.run(run_load_test(base_url, [path], clients, duration))[path] for path in paths}
+    finally:
+        if process.poll() is None:
+            process.terminate()  # uvicorn shuts down gracefully on SIGTERM
+    rss_mb = wait_stage(process)
+
+    entries = {}
+    for path, report in results.items():
+        entries[f"api {path}"] = {
+            "items": report["requests"],
+            "unit": "requests",
+            "seconds": duration,
+            "throughput_per_s": round(report["requests"] / duration, 1),
+            "p50_ms": report["p50_ms"],
+            "p99_ms": report["p99_ms"],
+            "samples": report["requests"],
+            "peak_rss_mb": rss_mb,
+            "counts": {"errors": report["errors"], "clients": clients},
+        }
+    return entries
+
+def git_state():
+    """Returns the commit the suite ran on and whether the working tree had uncommitted changes."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_DIR, capture_output=True,
+                                text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": bool(status.strip())}
+
+def compare_reports(baseline, current, threshold=None):
+    """Compares the stages two reports have in common.
+
+    Args:
+        baseline: The report to compare against, e.g. from the previous commit.
+        current: The report of this run.
+        threshold: Percentage by which a metric may get worse before it counts as a regression.
+
+    Returns:
+        A tuple of (lines of the comparison table, list of regressions as 'stage metric' strings).
+    """
+    lines = [f"{'stage':<58}{'metric':<18}{'baseline':>12}{'current':>12}{'change':>10}"]
+    regressions = []
+    for stage, entry in current["stages"].items():
+        old = baseline.get("stages", {}).get(stage)
+        if old is None:
+            continue
+        for metric, direction in COMPARED_METRICS.items():
+            before, after = old.get(metric), entry.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before * 100
+            worse = -change * direction  # positive when the metric got worse
+            flag = ""
+            if threshold is not None and worse > threshold:
+                regressions.append(f"{stage} {metric}")
+                flag = "  REGRESSION"
+            lines.append(f"{stage:<58}{metric:<18}{before:>12}{after:>12}{change:>+9.1f}%{flag}")
+    return lines, regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the fetcher, ETL stages and API on synthetic data")
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--facilities-per-state", type=int, help="Override the facilities per state of --scale")
+    parser.add_argument("--campsites-per-facility", type=int, help="Override the campsites per facility of --scale")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES, help="Stages to run, in suite order")
+    parser.add_argument("--skip-postgres", action="store_true", help="Leave out the load and api stages")
+    parser.add_argument("--input", help="Benchmark this JSONL file (e.g. a real fetch) instead of generating data")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Facilities per chunk")
+    parser.add_argument("--workers", type=int, default=fetcher.MAX_WORKERS, help="Fetcher threads")
+    parser.add_argument("--fetch-latency", type=float, default=0.0, help="Seconds the mock server waits per request")
+    parser.add_argument("--pg-host", default=DB_HOST, help="Postgres host or Unix socket directory to create the benchmark database on")
+    parser.add_argument("--pg-port", type=int, default=5432)
+    parser.add_argument("--pg-user", default=DB_USER)
+    parser.add_argument("--temp-cluster", action="store_true", help="Start a private Postgres server instead (initdb and pg_ctl)")
+    parser.add_argument("--pg-bin", help="Directory of initdb and pg_ctl for --temp-cluster")
+    parser.add_argument("--keep-database", action="store_true", help="Leave the benchmark database in place afterwards")
+    parser.add_argument("--clients", type=int, default=20, help="Concurrent API clients")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of load per API endpoint")
+    parser.add_argument("--warmup", type=float, default=2, help="Seconds of load on all endpoints before measuring")
+    parser.add_argument("--path", action="append", dest="paths", help="API endpoint to load (repeatable)")
+    parser.add_argument("--api-cache", action="store_true", help="Keep the response cache on (measures cache hits)")
+    parser.add_argument("--workdir", help="Where the generated data and stage logs go (default: a temporary directory)")
+    parser.add_argument("--output", default="benchmark_report.json", help="JSON report to write")
+    parser.add_argument("--compare", help="Report of an earlier run to compare this run with")
+    parser.add_argument("--fail-on-regression", type=float, metavar="PERCENT",
+                        help="Exit with status 1 when a compared metric got worse by more than PERCENT")
+    parser.add_argument("--run-stage", choices=STAGES, help=argparse.SUPPRESS)
+    parser.add_argument("--stage-config", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_stage:
+        run_stage(args.run_stage, args.stage_config)
+        sys.exit(0)
+
+    scale = dict(SCALES[args.scale])
+    if args.facilities_per_state:
+        scale["facilities_per_state"] = args.facilities_per_state
+    if args.campsites_per_facility is not None:
+        scale["campsites_per_facility"] = args.campsites_per_facility
+    stages = [stage for stage in STAGES if stage in args.stages and not (args.skip_postgres and stage in DB_STAGES)]
+    if args.input:
+        stages = [stage for stage in stages if stage != "generate"]
+    elif "generate" not in stages and any(stage in stages for stage in ("flatten", "csv", "load")):
+        parser.error("the flatten, csv and load stages need the generate stage or --input")
+    if "api" in stages and "load" not in stages:
+        parser.error("the api stage needs the load stage to fill the benchmark database")
+
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix="lord_benchmark_")
+    os.makedirs(workdir, exist_ok=True)
+    config = {
+        "workdir": workdir,
+        "input": os.path.abspath(args.input) if args.input else os.path.join(workdir, "facilities.jsonl"),
+        "chunk_size": args.chunk_size,
+        "workers": args.workers,
+        "api_cache": args.api_cache,
+        "port": free_port(),
+        **scale,
+    }
+    paths = args.paths or API_PATHS
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        **git_state(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "scale": args.scale,
+        "config": {**scale, "states": STATES, "input": args.input, "chunk_size": args.chunk_size, "workers": args.workers,
+                   "fetch_latency": args.fetch_latency, "clients": args.clients, "duration": args.duration,
+                   "api_cache": args.api_cache, "paths": paths if "api" in stages else []},
+        "stages": {},
+    }
+
+    try:
+        with ExitStack() as stack:
+            if any(stage in DB_STAGES for stage in stages):
+                if args.temp_cluster:
+                    server_kwargs = stack.enter_context(TemporaryCluster(args.pg_bin)).connection_kwargs()
+                else:
+                    server_kwargs = {"host": args.pg_host, "port": args.pg_port, "user": args.pg_user, "password": DB_PASSWORD}
+                fixture = stack.enter_context(PostgresFixture(server_kwargs, keep=args.keep_database))
+                config["db"] = fixture.connection_kwargs()
+                with psycopg.connect(**config["db"]) as conn:
+                    report["postgres"] = conn.execute("SHOW server_version").fetchone()[0]
+            if "fetch" in stages:
+                ridb = MockRIDB(STATES, scale["fetch_facilities_per_state"], scale["campsites_per_facility"], latency=args.fetch_latency)
+                server, config["mock_url"] = start_server(ridb)
+                stack.callback(server.shutdown)
+
+            config_file = os.path.join(workdir, "suite_config.json")
+            with open(config_file, "w") as outfile:
+                json.dump(config, outfile)
+            for stage in stages:
+                print(f"Running {stage}...", flush=True)
+                if stage == "api":
+                    entries = run_api_stage(config, config_file, workdir, paths, args.clients, args.duration, args.warmup)
+                else:
+                    entries = {stage: run_etl_stage(stage, config_file, workdir)}
+                report["stages"].update(entries)
+                for name, entry in entries.items():
+                    print(f"  {name}: {entry['throughput_per_s']} {entry['unit']}/s, p50 {entry['p50_ms']} ms, "
+                          f"p99 {entry['p99_ms']} ms, peak RSS {entry['peak_rss_mb']} MB")
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, "w") as outfile:
+        json.dump(report, outfile, indent=2)
+    print(f"Report written to: {args.output}")
+
+    if args.compare:
+        with open(args.compare) as infile:
+            baseline = json.load(infile)
+        if baseline.get("config", {}).get("facilities_per_state") != scale["facilities_per_state"]:
+            print("Warning: the baseline was run at a different scale, the numbers are not comparable")
+        lines, regressions = compare_reports(baseline, report, args.fail_on_regression)
+        print(f"\nCompared with {args.compare} (commit {baseline.get('commit')}):")
+        print("\n".join(lines))
+        if regressions:
+            print(f"{len(regressions)} regression(s) above {args.fail_on_regression}%: {', '.join(regressions)}")
+            sys.exit(1)
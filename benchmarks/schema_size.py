@@ -0,0 +1,91 @@
+# Size and scan speed of the LORD tables, to compare the schema before and after a migration.
+# Reports the heap, index and total size of every table and view, then the median time of a few scans and joins that
+# run on either schema, and the EXPLAIN ANALYZE execution time of the queries behind the API endpoints.
+# How to run:  "python benchmarks/schema_size.py > before.txt", then "python migrate.py",
+# then "python benchmarks/schema_size.py > after.txt" and compare the two.
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import psycopg
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import explain_endpoints
+from explain_endpoints import api
+
+RELATIONS = ["Facilities", "Activities", "Campsites", "PermittedEquipment", "CampSiteAttribute", "FacilityAddresses",
+             "FacilitiesWithState", "FacilitySearch"]
+
+# Queries valid on the TEXT and on the typed schema: full scans, joins on the ID columns and key lookups
+SCAN_QUERIES = [
+    ("scan CampSiteAttribute", """SELECT count(*), max("AttributeName") FROM "CampSiteAttribute" """),
+    ("scan Facilities", """SELECT count(*), max("LastUpdatedDate") FROM "Facilities" """),
+    ("join Campsites-CampSiteAttribute", """
+        SELECT count(*) FROM "Campsites" AS c JOIN "CampSiteAttribute" AS a ON a."CampsiteID" = c."CampsiteID" """),
+    ("join Facilities-Campsites-Equipment", """
+        SELECT count(*) FROM "Facilities" AS f JOIN "Campsites" AS c ON c."FacilityID" = f."FacilityID"
+        JOIN "PermittedEquipment" AS e ON e."CampsiteID" = c."CampsiteID" """),
+    ("group Activities by name", """SELECT "ActivityName", count(*) FROM "Activities" GROUP BY "ActivityName" """),
+    ("updated since 2023", """SELECT count(*) FROM "Campsites" WHERE "LastUpdatedDate" >= '2023-01-01' """),
+]
+
+def get_connection():
+    return psycopg.connect(**{key: value for key, value in api.pool.kwargs.items()
+                              if key not in ("cursor_factory", "prepare_threshold")})
+
+def relation_sizes(conn):
+    """Returns (relation, heap bytes, index bytes, total bytes) of the relations that exist."""
+    sizes = []
+    for relation in RELATIONS:
+        row = conn.execute("""
+            SELECT pg_relation_size(c.oid), pg_indexes_size(c.oid), pg_total_relation_size(c.oid)
+            FROM pg_class AS c WHERE c.oid = to_regclass(%s)
+        """, [f'"{relation}"']).fetchone()
+        if row:
+            sizes.append((relation, *row))
+    return sizes
+
+def time_query(conn, query, repeat):
+    """Returns the median seconds of running query repeat times (after one warm-up run)."""
+    conn.execute(query).fetchall()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(query).fetchall()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def endpoint_times(conn, state, repeat):
+    """Returns (path, median execution ms) of the EXPLAIN ANALYZE of each query the endpoints run."""
+    results = []
+    for path, query, params in explain_endpoints.capture_queries(explain_endpoints.endpoint_paths(state)):
+        if path == "startup":
+            continue
+        timings = [explain_endpoints.explain(conn, query, params)["Execution Time"] for _ in range(repeat)]
+        results.append((path, statistics.median(timings)))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report table sizes and query times of the LORD database")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per query, the median is reported")
+    parser.add_argument("--state", default="AZ", help="State code used by the filtered endpoints")
+    args = parser.parse_args()
+
+    with get_connection() as conn:
+        print(f"{'relation':<24}{'heap kB':>10}{'index kB':>10}{'total kB':>10}")
+        total = 0
+        for relation, heap, indexes, relation_total in relation_sizes(conn):
+            print(f"{relation:<24}{heap // 1024:>10}{indexes // 1024:>10}{relation_total // 1024:>10}")
+            total += relation_total
+        print(f"{'all':<24}{'':>10}{'':>10}{total // 1024:>10}")
+
+        print(f"\n{'query':<40}{'median ms':>10}")
+        for name, query in SCAN_QUERIES:
+            print(f"{name:<40}{time_query(conn, query, args.repeat) * 1000:>10.2f}")
+        conn.rollback()
+
+        print(f"\n{'endpoint (EXPLAIN ANALYZE)':<72}{'median ms':>10}")
+        for path, milliseconds in endpoint_times(conn, args.state, args.repeat):
+            print(f"{path:<72}{milliseconds:>10.2f}")
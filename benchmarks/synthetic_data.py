@@ -0,0 +1,98 @@
+# Synthetic RIDB-shaped records for benchmarks and the mock RIDB server.  The records mirror the fields the
+# fetcher and create_dataframes.py rely on, and are deterministic for a given (state, index) so runs are comparable.
+import random
+
+STATE_CENTERS = {"AZ": (34.2, -111.6), "UT": (39.3, -111.7), "OR": (43.9, -120.6)}
+ATTRIBUTE_NAMES = ["Campfire Allowed", "Driveway Entry", "Max Num of People", "Shade", "Site Access", "Pets Allowed"]
+EQUIPMENT_NAMES = ["Tent", "RV", "Trailer", "Pickup Camper", "Caravan/Camper Van"]
+
+def facility_id(state, index):
+    """Returns a unique numeric facility ID string for a state and position."""
+    return str(100000 + list(STATE_CENTERS).index(state) * 1000000 + index) if state in STATE_CENTERS else f"{state}{index}"
+
+def make_campsite(facility, index, rng):
+    """Builds one campsite record (with ATTRIBUTES and PERMITTEDEQUIPMENT) for a facility."""
+    return {
+        "CampsiteAccessible": rng.random() < 0.2,
+        "CampsiteID": f"{facility['FacilityID']}{index:04d}",
+        "CampsiteLatitude": facility["FacilityLatitude"] + rng.uniform(-0.01, 0.01),
+        "CampsiteLongitude": facility["FacilityLongitude"] + rng.uniform(-0.01, 0.01),
+        "CampsiteName": f"{index:03d}",
+        "CampsiteReservable": rng.random() < 0.7,
+        "CampsiteType": rng.choice(["STANDARD NONELECTRIC", "STANDARD ELECTRIC", "TENT ONLY NONELECTRIC"]),
+        "CreatedDate": "2014-05-01",
+        "FacilityID": facility["FacilityID"],
+        "LastUpdatedDate": "2024-11-26",
+        "Loop": f"Loop {rng.choice('ABCDE')}",
+        "TypeOfUse": rng.choice(["Overnight", "Day"]),
+        "ENTITYMEDIA": [],
+        "ATTRIBUTES": [{"AttributeName": name, "AttributeValue": rng.choice(["Yes", "No", "6", "Full"])}
+                       for name in rng.sample(ATTRIBUTE_NAMES, rng.randint(2, len(ATTRIBUTE_NAMES)))],
+        "PERMITTEDEQUIPMENT": [{"EquipmentName": name, "MaxLength": rng.choice([0, 20, 35, 40])}
+                               for name in rng.sample(EQUIPMENT_NAMES, rng.randint(1, 3))],
+    }
+
+def make_facility(state, index, campsites_per_facility=0):
+    """Builds one facility record shaped like a RIDB 'full' facility response.
+
+    Args:
+        state: Two letter state code.
+        index: Position of the facility within the state, used to derive IDs and coordinates.
+        campsites_per_facility: How many nested CAMPSITE records to include (0 leaves CAMPSITE out).
+
+    Returns:
+        A facility dictionary.
+    """
+    rng = random.Random(f"{state}-{index}")
+    latitude, longitude = STATE_CENTERS.get(state, (40.0, -100.0))
+    latitude += rng.uniform(-2, 2)
+    longitude += rng.uniform(-2, 2)
+    fid = facility_id(state, index)
+    facility = {
+        "FacilityID": fid,
+        "FacilityName": f"{state} SYNTHETIC CAMPGROUND {index}",
+        "FacilityDescription": "<h2>Overview</h2>Synthetic facility used for benchmarks.",
+        "FacilityTypeDescription": "Campground",
+        "FacilityAdaAccess": rng.choice(["Y", "N", ""]),
+        "FacilityLatitude": latitude,
+        "FacilityLongitude": longitude,
+        "GEOJSON": {"COORDINATES": [longitude, latitude], "TYPE": "Point"},
+        "Keywords": "camping,synthetic",
+        "LastUpdatedDate": "2024-11-26",
+        "Reservable": rng.random() < 0.6,
+        "StayLimit": "14 days",
+        "Enabled": True,
+        "LINK": [],
+        "MEDIA": [],
+        "ORGANIZATION": [],
+        "RECAREA": [],
+        "FACILITYADDRESS": [{
+            "AddressCountryCode": "USA",
+            "AddressStateCode": state,
+            "City": "SYNTHETIC",
+            "FacilityAddressID": f"9{fid}",
+            "FacilityAddressType": "Default",
+            "FacilityID": fid,
+            "FacilityStreetAddress1": "",
+            "FacilityStreetAddress2": "",
+            "FacilityStreetAddress3": "",
+            "LastUpdatedDate": "2024-11-26",
+            "PostalCode": "00000",
+        }],
+        "ACTIVITY": [{"ActivityID": 9, "ActivityName": "CAMPING", "FacilityActivityDescription": "Camping",
+                      "FacilityActivityFeeDescription": ""}],
+    }
+    if campsites_per_facility:
+        facility["CAMPSITE"] = [make_campsite(facility, n, rng) for n in range(campsites_per_facility)]
+    return facility
+
+def iter_facilities(states, facilities_per_state, campsites_per_facility=0):
+    """Yields synthetic facilities one at a time, facilities_per_state for each state, so that datasets too large to
+    hold in memory (e.g. 1M campsites for benchmarks/run_suite.py) can be streamed to a file."""
+    for state in states:
+        for index in range(facilities_per_state):
+            yield make_facility(state, index, campsites_per_facility)
+
+def make_facilities(states, facilities_per_state, campsites_per_facility=0):
+    """Returns a list of synthetic facilities, facilities_per_state for each state."""
+    return list(iter_facilities(states, facilities_per_state, campsites_per_facility))
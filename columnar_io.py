@@ -0,0 +1,206 @@
+# Columnar (Parquet or Arrow IPC) copies of the six DataFrames from create_dataframes.py.  Each table is written with
+# an explicit schema matching DBSetup/QuickDBD-recGov.sql and partitioned by state (AddressStateCode=AZ/ ...), so a
+# reload or an analysis reads typed columns straight from disk instead of parsing CSV text, and can skip the columns
+# and states it does not need.  Needs "pip install pyarrow".
+import os
+import shutil
+
+COLUMNAR_DIR = "columnar_output"
+PARTITION_COLUMN = "AddressStateCode"
+FILE_EXTENSIONS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+# Columns of each table with their SQL types, as in DBSetup/QuickDBD-recGov.sql after DBSetup/migrations/006 ("MaxLength "
+# without its trailing space, matching the DataFrame column).  create_dataframes.py casts the DataFrames to these types.
+TABLE_COLUMNS = {
+    "Facilities": [
+        ("FACILITYADDRESS", "TEXT"), ("FacilityAdaAccess", "TEXT"),
+        ("FacilityDescription", "TEXT"), ("FacilityDirections", "TEXT"),
+        ("FacilityEmail", "TEXT"), ("FacilityID", "INT"), ("FacilityLatitude", "FLOAT"),
+        ("FacilityLongitude", "FLOAT"), ("FacilityMapURL", "TEXT"), ("FacilityName", "TEXT"),
+        ("FacilityPhone", "TEXT"), ("FacilityReservationURL", "TEXT"),
+        ("FacilityTypeDescription", "TEXT"), ("FacilityUseFeeDescription", "TEXT"),
+        ("GEOJSON", "JSONB"), ("Keywords", "TEXT"), ("LastUpdatedDate", "DATE"),
+        ("LegacyFacilityID", "TEXT"), ("OrgFacilityID", "TEXT"), ("ParentOrgID", "INT"),
+        ("ParentRecAreaID", "INT"), ("Reservable", "BOOLEAN"), ("StayLimit", "TEXT"),
+    ],
+    "Activities": [
+        ("ActivityID", "INT"), ("ActivityName", "TEXT"), ("FacilityActivityDescription", "TEXT"),
+        ("FacilityID", "INT"),
+    ],
+    "Campsites": [
+        ("CampsiteAccessible", "BOOLEAN"), ("CampsiteID", "BIGINT"), ("CampsiteLatitude", "FLOAT"),
+        ("CampsiteLongitude", "FLOAT"), ("CampsiteName", "TEXT"),
+        ("CampsiteReservable", "BOOLEAN"), ("CampsiteType", "TEXT"), ("FacilityID", "INT"),
+        ("LastUpdatedDate", "DATE"), ("Loop", "TEXT"), ("TypeOfUse", "TEXT"),
+    ],
+    "PermittedEquipment": [
+        ("EquipmentName", "TEXT"), ("MaxLength", "INT"), ("CampsiteID", "BIGINT"),
+    ],
+    "CampSiteAttribute": [
+        ("AttributeName", "TEXT"), ("AttributeValue", "TEXT"), ("CampsiteID", "BIGINT"),
+    ],
+    "FacilityAddresses": [
+        ("AddressCountryCode", "TEXT"), ("AddressStateCode", "CHAR(2)"), ("City", "TEXT"),
+        ("FacilityAddressID", "BIGINT"), ("FacilityID", "INT"), ("FacilityStreetAddress1", "TEXT"),
+        ("FacilityStreetAddress2", "TEXT"), ("FacilityStreetAddress3", "TEXT"),
+        ("LastUpdatedDate", "DATE"), ("PostalCode", "TEXT"),
+    ],
+}
+# Table written from each DataFrame returned by process_facilities_data, in the same order
+TABLE_ORDER = ["Facilities", "Activities", "Campsites", "PermittedEquipment", "CampSiteAttribute", "FacilityAddresses"]
+ARROW_TYPES = {"TEXT": "string", "CHAR(2)": "string", "JSONB": "string", "FLOAT": "float64", "INT": "int32",
+               "BIGINT": "int64", "BOOLEAN": "bool", "DATE": "date32"}
+
+def import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("Parquet and Arrow output requires the pyarrow package: pip install pyarrow")
+    return pyarrow
+
+def table_schema(table):
+    """Returns the pyarrow schema of table, without the partition column (it is stored in the directory names).
+
+    Every field is nullable: a missing NOT NULL value is left for the database to reject, as it is with the CSV files.
+    """
+    pa = import_pyarrow()
+    return pa.schema([pa.field(name, pa.type_for_alias(ARROW_TYPES[sql_type]))
+                      for name, sql_type in TABLE_COLUMNS[table] if name != PARTITION_COLUMN])
+
+def to_text(value):
+    """Stores nested lists/dicts left in a TEXT column the same way the CSV files and the COPY loader do."""
+    return str(value) if isinstance(value, (list, dict)) else value
+
+def partition_path(output_dir, table, state, file_format, part_name="part-0"):
+    state_dir = f"{PARTITION_COLUMN}={state if state else '__HIVE_DEFAULT_PARTITION__'}"
+    return os.path.join(output_dir, table, state_dir, part_name + FILE_EXTENSIONS[file_format])
+
+def clear_tables(output_dir=COLUMNAR_DIR):
+    """Deletes the files of every table, they are rewritten from scratch as the CSV files are."""
+    for table in TABLE_ORDER:
+        shutil.rmtree(os.path.join(output_dir, table), ignore_errors=True)
+
+class ColumnarWriter:
+    """Appends the DataFrames of each chunk to one Parquet or Arrow IPC file per table and state.
+
+    Rows are placed by the state of their facility (the first address of the facility; addresses use their own), so
+    every table can be read for a single state.  Files are only complete once the writer is closed.
+
+    Args:
+        output_dir: The directory the tables are written under.
+        file_format: 'parquet' or 'arrow'.
+        part_name: File name (without extension) inside each partition; writers sharing output_dir need distinct names.
+        clear: Delete the existing files of the tables first.
+    """
+
+    def __init__(self, output_dir=COLUMNAR_DIR, file_format="parquet", part_name="part-0", clear=True):
+        if file_format not in FILE_EXTENSIONS:
+            raise ValueError(f"Unknown columnar format {file_format!r}, expected one of {list(FILE_EXTENSIONS)}")
+        self.output_dir = output_dir
+        self.file_format = file_format
+        self.part_name = part_name
+        self.writers = {}  # (table, state) -> open pyarrow writer
+        self.schemas = {table: table_schema(table) for table in TABLE_ORDER}
+        if clear:
+            clear_tables(output_dir)
+
+    def open_writer(self, table, state):
+        pa = import_pyarrow()
+        path = partition_path(self.output_dir, table, state, self.file_format, self.part_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if self.file_format == "parquet":
+            import pyarrow.parquet as pq
+            return pq.ParquetWriter(path, self.schemas[table], compression="zstd")
+        return pa.ipc.new_file(path, self.schemas[table])
+
+    def to_arrow(self, df, table):
+        """Converts df to the table's schema: missing columns become nulls and columns the table lacks are dropped."""
+        pa = import_pyarrow()
+        schema = self.schemas[table]
+        df = df.reindex(columns=schema.names)
+        for field in schema:
+            if pa.types.is_string(field.type) and df[field.name].dtype == object:
+                df[field.name] = df[field.name].map(to_text)
+        return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+    def write(self, frames):
+        """Writes the six DataFrames returned by process_facilities_data for one chunk of facilities.
+
+        Returns:
+            A dictionary of table -> rows written.
+        """
+        frames = dict(zip(TABLE_ORDER, frames))
+        addresses = frames["FacilityAddresses"]
+        facility_states = {}
+        campsite_states = {}
+        if not addresses.empty:
+            facility_states = addresses.drop_duplicates("FacilityID").set_index("FacilityID")[PARTITION_COLUMN]
+        if not frames["Campsites"].empty:
+            campsite_states = frames["Campsites"].set_index("CampsiteID")["FacilityID"].map(facility_states)
+
+        written = {}
+        for table, df in frames.items():
+            written[table] = len(df)
+            if df.empty:
+                continue
+            if table == "FacilityAddresses":
+                states = df[PARTITION_COLUMN]
+            elif "FacilityID" in df.columns:
+                states = df["FacilityID"].map(facility_states)
+            else:
+                states = df["CampsiteID"].map(campsite_states)
+            for state, part in df.groupby(states.to_numpy(), dropna=False, sort=False):
+                state = None if state != state else state  # groupby keeps missing states as NaN
+                if (table, state) not in self.writers:
+                    self.writers[(table, state)] = self.open_writer(table, state)
+                self.writers[(table, state)].write_table(self.to_arrow(part, table))
+        return written
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def open_dataset(table, input_dir=COLUMNAR_DIR, file_format="parquet"):
+    """Opens the files of one table as a pyarrow dataset; Arrow IPC files are memory-mapped rather than read."""
+    import_pyarrow()
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+    return ds.dataset(os.path.join(input_dir, table), format="ipc" if file_format == "arrow" else "parquet",
+                      partitioning="hive", filesystem=fs.LocalFileSystem(use_mmap=file_format == "arrow"))
+
+def read_table(table, columns=None, states=None, input_dir=COLUMNAR_DIR, file_format="parquet"):
+    """Reads a table back into a DataFrame, loading only the requested columns and states.
+
+    Args:
+        table: The table name, e.g. 'Campsites'.
+        columns: The columns to load (default all the columns of the table's schema).
+        states: Optional list of state codes, only their partitions are read.
+        input_dir: The directory the ColumnarWriter wrote to.
+        file_format: 'parquet' or 'arrow'.
+
+    Returns:
+        A pandas DataFrame.
+    """
+    import pyarrow.dataset as ds
+    dataset = open_dataset(table, input_dir, file_format)
+    if columns is None:
+        columns = [name for name, _ in TABLE_COLUMNS[table]]
+    row_filter = ds.field(PARTITION_COLUMN).isin(states) if states else None
+    return dataset.to_table(columns=columns, filter=row_filter).to_pandas()
+
+def iter_table_batches(table, input_dir=COLUMNAR_DIR, file_format="parquet", batch_size=50000):
+    """Yields a table as DataFrames of up to batch_size rows, in the columns of its schema (nothing if it has no rows)."""
+    if not os.path.isdir(os.path.join(input_dir, table)):
+        return
+    dataset = open_dataset(table, input_dir, file_format)
+    columns = [name for name, _ in TABLE_COLUMNS[table]]
+    for batch in dataset.to_batches(columns=columns, batch_size=batch_size):
+        if batch.num_rows:
+            yield batch.to_pandas()
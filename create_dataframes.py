@@ -1,6 +1,52 @@
 import pandas as pd
 import json
 import os
+import argparse
+import orjson
+from itertools import chain, compress, repeat
+from operator import methodcaller
+from jsonl_io import read_jsonl
+from columnar_io import COLUMNAR_DIR, TABLE_COLUMNS, TABLE_ORDER, ColumnarWriter
+from metrics import StageTimer
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # the ID columns are then parsed by pd.to_numeric alone
+    pa = None
+
+CHUNK_SIZE = 1000  # facilities flattened at a time when reading the fetch output
+
+stage_timer = StageTimer("create_dataframes")  # time spent reading, flattening, casting and writing, per stage
+
+# pandas dtype for each SQL type of TABLE_COLUMNS; the nullable dtypes keep missing IDs and flags as <NA>, not floats
+PANDAS_DTYPES = {"INT": "Int32", "BIGINT": "Int64", "FLOAT": "float64", "BOOLEAN": "boolean"}
+# Text columns with a handful of distinct values, stored once per chunk as categoricals instead of a string per row
+CATEGORY_COLUMNS = {
+    "Facilities": ["FacilityTypeDescription", "FacilityAdaAccess"],
+    "Activities": ["ActivityName"],
+    "Campsites": ["CampsiteType", "Loop", "TypeOfUse"],
+    "PermittedEquipment": ["EquipmentName"],
+    "CampSiteAttribute": ["AttributeName", "AttributeValue"],
+    "FacilityAddresses": ["AddressCountryCode", "AddressStateCode", "City"],
+}
+
+# Columns of the API records that are not kept, per DataFrame; they are skipped when the columns are built
+FACILITY_DROP_COLUMNS = {"ACTIVITY", "CAMPSITE", "EVENT", "FacilityAccessibilityText", "Enabled", "LINK", "MEDIA",
+                         "ORGANIZATION", "PERMITENTRANCE", "RECAREA", "TOUR", "FacilityAddressType", "LastUpdatedDate_address"}
+CAMPSITE_DROP_COLUMNS = {"ENTITYMEDIA", "PERMITTEDEQUIPMENT", "ATTRIBUTES", "CreatedDate"}
+ACTIVITY_DROP_COLUMNS = {"FacilityActivityFeeDescription"}
+ADDRESS_DROP_COLUMNS = {"FacilityAddressType"}
+
+# Label and CSV file for each DataFrame returned by process_facilities_data, in the same order
+OUTPUT_FILES = [
+    ("Facilities", "facilities.csv"),
+    ("Activities", "activities.csv"),
+    ("Campsites", "campsites.csv"),
+    ("Permitted Equipment", "permitted_equipment.csv"),
+    ("Campsite Attributes", "campsite_attributes.csv"),
+    ("Facility Addresses", "facility_address.csv"),
+]
 
 def create_dataframe(data, data_key="RECDATA"):
     """Creates a pandas DataFrame from the extracted API data.
@@ -18,6 +64,119 @@ def create_dataframe(data, data_key="RECDATA"):
     else:
         return pd.DataFrame()
     
+def geojson_to_json(geojson):
+    """Serializes a facility GEOJSON dictionary to a JSON string for the JSONB column.
+
+    Args:
+        geojson: The GEOJSON value from the API, e.g. {'TYPE': 'Point', 'COORDINATES': [-112.15, 35.28]}.
+
+    Returns:
+        The JSON string, or None when there are no coordinates.
+    """
+    if isinstance(geojson, dict) and geojson.get('COORDINATES'):
+        return orjson.dumps(geojson).decode()  # compact, Postgres normalizes the JSONB value anyway
+    return None
+
+def explode_records(parents, list_key, key_column, child_key=None):
+    """Collects the dictionaries nested in a list field of every parent, with the ID of the parent each belongs to.
+
+    Parents without an ID or with an empty list are skipped, as are children without child_key when it is given.
+    The dictionaries are not modified: the IDs are returned alongside and become a column in records_to_dataframe.
+
+    Args:
+        parents: The list of parent dictionaries, e.g. the facilities.
+        list_key: The field holding the nested list, e.g. 'CAMPSITE'.
+        key_column: The ID field of the parents, e.g. 'FacilityID'.
+        child_key: Optional ID field the children must have, e.g. 'CampsiteID'.
+
+    Returns:
+        A tuple of the list of children and the list of their parents' IDs.
+    """
+    children, parent_keys = [], []
+    for parent in parents:
+        records, key = parent.get(list_key), parent.get(key_column)
+        if records and key:
+            children += records
+            parent_keys += repeat(key, len(records))
+    if child_key:
+        keep = list(map(bool, map(methodcaller('get', child_key), children)))
+        children, parent_keys = list(compress(children, keep)), list(compress(parent_keys, keep))
+    return children, parent_keys
+
+def records_to_dataframe(records, drop_columns=(), key_column=None, keys=None):
+    """Builds a DataFrame from a list of dictionaries, leaving out drop_columns.
+
+    The kept columns are passed to pandas up front, so the nested lists in drop_columns (e.g. a campsite's ATTRIBUTES)
+    are never copied into the DataFrame.  Columns come in the same order as with pd.DataFrame(records).
+
+    Args:
+        records: The list of dictionaries, one per row.
+        drop_columns: Keys that are left out of the DataFrame.
+        key_column: Optional column set to keys, e.g. the 'FacilityID' of each campsite from explode_records.  It
+            takes the place it would have if it had been written into every dictionary.
+        keys: The values of key_column, one per record.
+
+    Returns:
+        The DataFrame, or an empty DataFrame when there are no records.
+    """
+    if not records:
+        return pd.DataFrame()
+    columns = dict.fromkeys(records[0])
+    if key_column:
+        columns[key_column] = None
+    columns.update(dict.fromkeys(chain.from_iterable(records)))
+    columns = [column for column in columns if column not in drop_columns]
+    df = pd.DataFrame(records, columns=[column for column in columns if column != key_column])
+    if key_column:
+        df.insert(columns.index(key_column), key_column, keys) #assign the parent id as a foreign key to be used in tables
+    return df
+
+def to_integers(series, dtype):
+    """Casts a column of IDs to a nullable integer dtype; values that do not parse become missing.
+
+    pandas keeps text columns in Arrow when pyarrow is installed, so Arrow parses a column of digit strings in one
+    call without copying it.  Anything Arrow rejects, e.g. '' or '12.0', goes through pd.to_numeric instead.
+    """
+    if pa is not None and series.dtype == "str":
+        try:
+            values = pc.cast(pa.array(series), pa.int64())
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            pass
+        else:
+            return pd.Series(pd.array(values, dtype="Int64"), index=series.index, name=series.name).astype(dtype)
+    return pd.to_numeric(series, errors='coerce').astype(dtype)
+
+def cast_dtypes(df, table):
+    """Casts the columns of a DataFrame to the types of its table in TABLE_COLUMNS (the typed schema of
+    DBSetup/migrations/006): integer IDs, dates, nullable booleans, and categoricals for repeated strings.
+
+    Like the migration, empty strings and values that do not parse become missing.  Columns the table does not have
+    are left as they are.
+
+    Args:
+        df: One of the DataFrames built by process_facilities_data.
+        table: Its table name, e.g. 'Campsites'.
+
+    Returns:
+        The DataFrame with its columns cast.
+    """
+    if df.empty:
+        return df
+    sql_types = dict(TABLE_COLUMNS[table])
+    for column in df.columns:
+        sql_type = sql_types.get(column.strip())
+        if sql_type in ("INT", "BIGINT"):
+            df[column] = to_integers(df[column], PANDAS_DTYPES[sql_type])
+        elif sql_type == "FLOAT":
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype(PANDAS_DTYPES[sql_type])
+        elif sql_type == "BOOLEAN":
+            df[column] = df[column].astype(PANDAS_DTYPES[sql_type])
+        elif sql_type == "DATE":
+            df[column] = pd.to_datetime(df[column], errors='coerce', format='ISO8601')
+        elif column in CATEGORY_COLUMNS.get(table, ()):
+            df[column] = df[column].replace('', None).astype('category')
+    return df
+
 def process_facilities_data(facilities_data):
     """Creates multiple DataFrames from the facilities data and related data.
 
@@ -25,155 +184,150 @@ def process_facilities_data(facilities_data):
         facilities_data: The list of dictionaries representing the facilities from the API.
 
     Returns:
-        A tuple containing the facilities_df, activities_df, campsites_df, and events_df.
+        A tuple containing the facilities_df, activities_df, campsites_df, permitted_equipment_df, campsite_attributes_df and facility_address_df.
     """
     if not facilities_data:
-        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
-    
-    facilities_df = create_dataframe(facilities_data)
-    facility_address_data = []
-    activities_data = []
-    campsites_data = []
-    # events_data = []
+        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
     
-    permitted_equipment_data = []  # Initialize permitted equipment data
-    campsite_attribute_db = []
-
-    for facility in facilities_data:
-        facility_id = facility.get('FacilityID')
-        if facility_id:
-            if 'ACTIVITY' in facility and facility["ACTIVITY"] : #Check if there is data
-                for act in facility["ACTIVITY"]:
-                    act['FacilityID'] = facility_id
-                    activities_data.append(act)
-
-            if 'CAMPSITE' in facility and facility["CAMPSITE"]: #Check if there is data
-              for camp in facility["CAMPSITE"]:
-                    camp_id = camp.get('CampsiteID')
-                    if camp_id:
-                        camp['FacilityID'] = facility_id #assign the facility id as a foreign key to be used in tables
-                        # Flatten Permitted Equipment data
-                        for equipment in camp.get('PERMITTEDEQUIPMENT', []):
-                             equipment['CampsiteID'] = camp_id
-                             permitted_equipment_data.append(equipment) # adds permitted equipment data into the list
-                        for attribute in camp.get('ATTRIBUTES', []):
-                            attribute['CampsiteID'] = camp_id
-                            campsite_attribute_db.append(attribute) #add the campsite attributes to the list
-                        campsites_data.append(camp)
-            # if 'EVENT' in facility and facility["EVENT"]: #Check if there is data
-            #   for event in facility["EVENT"]:
-            #     event['FacilityID'] = facility_id
-            #     events_data.append(event)
-            if facility.get('FACILITYADDRESS'):  #check that list is not empty
-              for address in facility.get('FACILITYADDRESS'):
-                address['FacilityID'] = facility_id
-                facility_address_data.append(address)
-    
-    facilities_df = facilities_df.drop(columns = ["ACTIVITY", "CAMPSITE", "EVENT"], errors = 'ignore') #Drop the columns that have blank data
-    if not facilities_df.empty:
-        facilities_df['GEOJSON'] = facilities_df['GEOJSON'].astype(str).str.replace("'", '"') #Convert the GEOJSON column to string
-    activities_df = create_dataframe(activities_data)
-    campsites_df = create_dataframe(campsites_data)
-    # events_df = create_dataframe(events_data)
-    permitted_equipment_df = create_dataframe(permitted_equipment_data) # Creates a DF for the permitted equipment
-    campsite_attributes_df = create_dataframe(campsite_attribute_db) # Creates a DF for the campsite attributes
-    facility_address_df = create_dataframe(facility_address_data)
-
-    # Merge Permitted Equipment Back to the Campsite Table (using a left join)
-    #campsites_df = pd.merge(campsites_df, permitted_equipment_df, on="CampsiteID", how='left', suffixes=('', '_permit'))
-    #campsites_df = pd.merge(campsites_df, campsite_attributes_df, on="CampsiteID", how='left', suffixes = ('', '_attrib'))
-    # facilities_df = pd.merge(facilities_df, facility_address_df, on="FacilityID", how='left', suffixes = ('', '_address'))
-     # Drop nested columns from campsites table
-    campsites_df = campsites_df.drop(columns = ['ENTITYMEDIA', 'PERMITTEDEQUIPMENT', 'ATTRIBUTES','CreatedDate'], errors ='ignore')
-    facilities_df = facilities_df.drop(columns = ['FacilityAccessibilityText', 'Enabled', 'LINK', 'MEDIA', 'ORGANIZATION', 'PERMITENTRANCE', 'RECAREA', 'TOUR', 'FacilityAddressType', 'LastUpdatedDate_address'], errors ='ignore')
-    activities_df = activities_df.drop(columns = ['FacilityActivityFeeDescription'], errors ='ignore')
-    facility_address_df = facility_address_df.drop(columns = ['FacilityAddressType'], errors ='ignore')
-    return facilities_df, activities_df, campsites_df, permitted_equipment_df, campsite_attributes_df, facility_address_df
-
-
-def output_to_csv(df, filename):
+    with stage_timer.stage("flatten", items=len(facilities_data)):
+        # Each table is built from the nested lists in one pass, campsites first since equipment and attributes
+        # hang off them; the input dictionaries are left as they are
+        facilities_df = records_to_dataframe(facilities_data, FACILITY_DROP_COLUMNS)
+        if 'GEOJSON' in facilities_df.columns:
+            #Serialize GEOJSON as real JSON for the JSONB column
+            facilities_df['GEOJSON'] = [geojson_to_json(geojson) for geojson in facilities_df['GEOJSON'].to_numpy()]
+        activities, facility_ids = explode_records(facilities_data, 'ACTIVITY', 'FacilityID')
+        activities_df = records_to_dataframe(activities, ACTIVITY_DROP_COLUMNS, 'FacilityID', facility_ids)
+        campsites, facility_ids = explode_records(facilities_data, 'CAMPSITE', 'FacilityID', child_key='CampsiteID')
+        campsites_df = records_to_dataframe(campsites, CAMPSITE_DROP_COLUMNS, 'FacilityID', facility_ids)
+        equipment, campsite_ids = explode_records(campsites, 'PERMITTEDEQUIPMENT', 'CampsiteID')
+        permitted_equipment_df = records_to_dataframe(equipment, (), 'CampsiteID', campsite_ids)
+        attributes, campsite_ids = explode_records(campsites, 'ATTRIBUTES', 'CampsiteID')
+        campsite_attributes_df = records_to_dataframe(attributes, (), 'CampsiteID', campsite_ids)
+        addresses, facility_ids = explode_records(facilities_data, 'FACILITYADDRESS', 'FacilityID')
+        facility_address_df = records_to_dataframe(addresses, ADDRESS_DROP_COLUMNS, 'FacilityID', facility_ids)
+        # events, facility_ids = explode_records(facilities_data, 'EVENT', 'FacilityID')
+    frames = (facilities_df, activities_df, campsites_df, permitted_equipment_df, campsite_attributes_df, facility_address_df)
+    with stage_timer.stage("cast_dtypes", items=sum(len(df) for df in frames)):
+        return tuple(cast_dtypes(df, table) for df, table in zip(frames, TABLE_ORDER))
+
+
+def output_to_csv(df, filename, append=False, output_dir='csv_output'):
     """Outputs a Pandas DataFrame to a CSV file.
 
     Args:
         df: The Pandas DataFrame to output.
         filename: The name of the CSV file to create.
+        append: Add the rows to the end of an existing file (without a header) instead of replacing it.
+        output_dir: The folder the CSV file is written to.
     """
     if not df.empty:
       # Create the CSV Output Folder if it doesn't already exist
-      output_dir = 'csv_output'
       if not os.path.exists(output_dir):
           os.makedirs(output_dir) # Creates a new directory
 
       output_file = os.path.join(output_dir, filename) # Create a path to output file
-      df.to_csv(output_file, index=False)
-      print(f"DataFrame successfully output to: {output_file}")
+      df.to_csv(output_file, index=False, mode='a' if append else 'w', header=not append)
+      if not append:
+          print(f"DataFrame successfully output to: {output_file}")
     else:
       print("Dataframe was empty and was not output to file.")
 
+def read_facilities_in_chunks(input_file, chunk_size=CHUNK_SIZE):
+    """Reads facilities from the fetch output a chunk at a time.
+
+    Args:
+        input_file: A JSONL file (optionally .gz or .zst compressed), or a JSON array file from older runs.
+        chunk_size: The number of facilities in each chunk.
+
+    Yields:
+        Lists of up to chunk_size facility dictionaries.
+    """
+    if input_file.endswith(".json"):
+        with open(input_file, 'r') as infile:
+            facilities_data = json.load(infile)
+        for start in range(0, len(facilities_data), chunk_size):
+            yield facilities_data[start:start + chunk_size]
+        return
+
+    chunk = []
+    for facility in read_jsonl(input_file):
+        chunk.append(facility)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def write_output_files(chunks, output_dir='csv_output', columnar_writer=None, verbose=True):
+    """Flattens chunks of facilities and appends them to the six CSV files, so memory stays bounded.
+
+    Args:
+        chunks: An iterable of lists of facility dictionaries, e.g. read_facilities_in_chunks(input_file).
+        output_dir: The folder the CSV files are written to.
+        columnar_writer: An optional ColumnarWriter that every chunk is also written to.
+        verbose: Print the info and head of the first chunk of each DataFrame.
+
+    Returns:
+        A dictionary of CSV filename -> rows written.
+    """
+    columns = {} # columns in the header of each CSV file, taken from the first chunk that has rows for it
+    row_counts = {filename: 0 for _, filename in OUTPUT_FILES}
+    for chunk in stage_timer.timed_iter("read_input", chunks):
+        frames = process_facilities_data(chunk)
+        if columnar_writer:
+            with stage_timer.stage("write_columnar", items=sum(len(df) for df in frames)):
+                columnar_writer.write(frames)
+        for df, (label, filename) in zip(frames, OUTPUT_FILES):
+            if df.empty:
+                continue
+            if filename not in columns:
+                if verbose:
+                    print(f"\n{label} DataFrame (first chunk):")
+                    df.info()
+                    print(df.head())
+                columns[filename] = list(df.columns)
+                with stage_timer.stage("write_csv", items=len(df)):
+                    output_to_csv(df, filename, output_dir=output_dir)
+            else:
+                dropped = [column for column in df.columns if column not in columns[filename]]
+                if dropped:
+                    print(f"Warning: columns {dropped} are not in the header of {filename} and were not written")
+                with stage_timer.stage("write_csv", items=len(df)):
+                    output_to_csv(df.reindex(columns=columns[filename]), filename, append=True, output_dir=output_dir)
+            row_counts[filename] += len(df)
+    return row_counts
+
 
 if __name__ == "__main__":
-    # Load data from file
-    data_dir = 'json_output'
-    input_file = os.path.join(data_dir, "facilities_data.json")
-
-    try:
-      with open(input_file, 'r') as infile:
-        facilities_data = json.load(infile)
-    except FileNotFoundError:
-        print(f"Error: {input_file} not found. Please check that the script {input_file} was already run.")
-        exit()
-        
+    parser = argparse.ArgumentParser(description="Flatten the fetched facilities into CSV files")
+    parser.add_argument("--input", default=os.path.join('json_output', 'facilities_data.jsonl'),
+                        help="Output of fetch_and_save_data.py (.jsonl, .jsonl.gz, .jsonl.zst or a legacy .json)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Facilities processed at a time")
+    parser.add_argument("--columnar", choices=["parquet", "arrow"],
+                        help="Also write typed Parquet or Arrow IPC files, partitioned by state (needs pyarrow)")
+    parser.add_argument("--columnar-dir", default=COLUMNAR_DIR, help="Directory for the --columnar files")
+    parser.add_argument("--metrics-file", help="Also write the stage timings to this file in the Prometheus text format")
+    args = parser.parse_args()
 
-    if facilities_data:
-        facilities_df, activities_df, campsites_df, permitted_equipment_df, campsite_attributes_df, facility_address_df  = process_facilities_data(facilities_data)
+    if not os.path.exists(args.input):
+        print(f"Error: {args.input} not found. Please check that the script fetch_and_save_data.py was already run.")
+        exit()
 
-        if not facilities_df.empty:
-            print("Facilities DataFrame:")
-            facilities_df.info()
-            print(facilities_df.head())
-            output_to_csv(facilities_df, "facilities.csv")
-        else:
-            print("Failed to create the facilities Dataframe")
-        if not activities_df.empty:
-            print("\nActivities DataFrame:")
-            activities_df.info()
-            print(activities_df.head())
-            output_to_csv(activities_df, "activities.csv")
-        else:
-           print("\nFailed to create the activities Dataframe")
-        if not campsites_df.empty:
-            print("\nCampsites DataFrame:")
-            campsites_df.info()
-            print(campsites_df.head())
-            output_to_csv(campsites_df, "campsites.csv")
-        else:
-           print("\nFailed to create the campsites Dataframe")
-        # if not events_df.empty:
-        #    print("\nEvents DataFrame:")
-        #    events_df.info()
-        #    print(events_df.head())
-        #    output_to_csv(events_df, "events.csv")
-        # else:
-        #    print("\nEvents Dataframe empty, CSV not created")
-        if not permitted_equipment_df.empty:
-            print("\nPermitted Equipment DataFrame:")
-            permitted_equipment_df.info()
-            print(permitted_equipment_df.head())
-            output_to_csv(permitted_equipment_df, "permitted_equipment.csv")
+    columnar_writer = ColumnarWriter(args.columnar_dir, args.columnar) if args.columnar else None
+    row_counts = write_output_files(read_facilities_in_chunks(args.input, args.chunk_size), columnar_writer=columnar_writer)
+    for label, filename in OUTPUT_FILES:
+        if row_counts[filename]:
+            print(f"{label}: {row_counts[filename]} rows written to {filename}")
         else:
-           print("\nFailed to create the permitted equipment Dataframe")
-        if not campsite_attributes_df.empty:
-            print("\nCampsite Attributes DataFrame:")
-            campsite_attributes_df.info()
-            print(campsite_attributes_df.head())
-            output_to_csv(campsite_attributes_df, "campsite_attributes.csv")
-        else:
-           print("\nFailed to create the campsite attributes Dataframe")
-        if not facility_address_df.empty:
-            print("\nFacility Addresses DataFrame:")
-            facility_address_df.info()
-            print(facility_address_df.head())
-            output_to_csv(facility_address_df, "facility_address.csv")
-        else:
-             print("\nFailed to create the facility address Dataframe")
+            print(f"Failed to create the {label.lower()} Dataframe")
+
+    if columnar_writer:
+        with stage_timer.stage("write_columnar"):
+            columnar_writer.close()
+        print(f"{args.columnar.capitalize()} files written to: {args.columnar_dir}")
 
+    print(f"\nTime per stage:\n{stage_timer.summary()}")
+    if args.metrics_file:
+        stage_timer.write_textfile(args.metrics_file)
+        print(f"Stage metrics written to: {args.metrics_file}")
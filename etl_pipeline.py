@@ -0,0 +1,150 @@
+# Parallel per-state ETL pipeline.
+# Runs fetch -> flatten -> write for every state as an independent partition on a process pool, then merges the
+# per-state CSV files into csv_output/.  Flattening and writing are CPU bound, so with more states the run scales with
+# the number of cores instead of growing linearly.  RIDB limits requests per API key, so the request budget
+# (--rate-limit) is split evenly between the processes and the fetch never goes faster than one process would.
+# How to run:  "python etl_pipeline.py --states AZ UT OR NM CO --processes 4"
+import argparse
+import datetime
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import fetch_and_save_data
+from columnar_io import COLUMNAR_DIR, ColumnarWriter, clear_tables
+from config import RecGov_API_Key
+from create_dataframes import CHUNK_SIZE, OUTPUT_FILES, read_facilities_in_chunks, write_output_files
+from fetch_and_save_data import CheckpointLog, fetch_related_data_concurrently, fetch_ridb_data
+from jsonl_io import JsonlWriter
+from rate_limiter import TokenBucket
+
+STATE_JSON_DIR = os.path.join('json_output', 'states')  # <state>.jsonl, the fetched facilities of each state
+STATE_CSV_DIR = os.path.join('csv_output', 'states')  # <state>/<table>.csv, merged into csv_output/ at the end
+MERGE_CHUNK_ROWS = 100000  # rows of a state's CSV file read at a time while merging
+
+def init_worker(ridb_base_url, rate_limit, max_workers):
+    """Gives each process its own session and its share of the rate limit."""
+    fetch_and_save_data.base_url = ridb_base_url
+    fetch_and_save_data.session = fetch_and_save_data.create_session(max_workers)
+    fetch_and_save_data.rate_limiter = TokenBucket(rate_limit, per=60)
+
+def run_state(state, max_workers, resume=False, chunk_size=CHUNK_SIZE, columnar=None, columnar_dir=COLUMNAR_DIR):
+    """Fetches, flattens and writes the facilities of one state, in a worker process.
+
+    Args:
+        state: The state code, e.g. 'AZ'.
+        max_workers: Concurrent requests in flight in this process.
+        resume: Continue from this state's checkpoints instead of starting over.
+        chunk_size: Facilities flattened at a time.
+        columnar: Optionally also write 'parquet' or 'arrow' files to columnar_dir.
+        columnar_dir: The directory shared by every state's columnar files.
+
+    Returns:
+        A dictionary with the number of facilities fetched, the rows written per CSV file and whether requests failed.
+    """
+    checkpoint = CheckpointLog(os.path.join(fetch_and_save_data.CHECKPOINT_DIR, state), resume=resume)
+    facilities_data = fetch_ridb_data(RecGov_API_Key, 'facilities', {'lastupdated': '10-01-2018'}, states=[state],
+                                      checkpoint=checkpoint)
+    os.makedirs(STATE_JSON_DIR, exist_ok=True)
+    json_file = os.path.join(STATE_JSON_DIR, f"{state}.jsonl")
+    with JsonlWriter(json_file) as writer:
+        fetch_related_data_concurrently(RecGov_API_Key, facilities_data, endpoints=("campsites",),
+                                        max_workers=max_workers, checkpoint=checkpoint, on_complete=writer.write)
+    if not checkpoint.failed:
+        checkpoint.clear()
+
+    csv_dir = os.path.join(STATE_CSV_DIR, state)
+    shutil.rmtree(csv_dir, ignore_errors=True)  # a table with no rows this time must not keep last run's file
+    columnar_writer = None
+    if columnar:
+        columnar_writer = ColumnarWriter(columnar_dir, columnar, part_name=f"part-{state}", clear=False)
+    try:
+        row_counts = write_output_files(read_facilities_in_chunks(json_file, chunk_size), csv_dir,
+                                        columnar_writer, verbose=False)
+    finally:
+        if columnar_writer:
+            columnar_writer.close()
+    return {"facilities": writer.count, "rows": row_counts, "failed": checkpoint.failed}
+
+def merge_csv_files(states, output_dir='csv_output'):
+    """Concatenates each state's CSV files into one file per table, in the order of states.
+
+    States can end up with different columns, so the merged header is the union of theirs and missing values are
+    left empty.  Values are copied as text, nothing is re-inferred.
+
+    Returns:
+        A dictionary of CSV filename -> rows in the merged file.
+    """
+    merged = {}
+    for _, filename in OUTPUT_FILES:
+        parts = [os.path.join(STATE_CSV_DIR, state, filename) for state in states]
+        parts = [path for path in parts if os.path.exists(path)]
+        output_file = os.path.join(output_dir, filename)
+        if not parts:
+            if os.path.exists(output_file):
+                os.remove(output_file)
+            continue
+        columns = list(dict.fromkeys(column for path in parts for column in pd.read_csv(path, nrows=0).columns))
+        merged[filename] = 0
+        header = True
+        for path in parts:
+            for df in pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=MERGE_CHUNK_ROWS):
+                df.reindex(columns=columns).to_csv(output_file, index=False, mode='w' if header else 'a', header=header)
+                header = False
+                merged[filename] += len(df)
+    return merged
+
+def run_pipeline(states, processes=None, max_workers=fetch_and_save_data.MAX_WORKERS,
+                 rate_limit=fetch_and_save_data.RATE_LIMIT_PER_MINUTE, resume=False, chunk_size=CHUNK_SIZE,
+                 columnar=None, columnar_dir=COLUMNAR_DIR):
+    """Runs every state on a process pool and merges the CSV files of the states that succeeded.
+
+    Returns:
+        A dictionary of state -> result of run_state (or the error message for states that failed).
+    """
+    processes = max(1, min(processes or os.cpu_count() or 1, len(states)))
+    if columnar:
+        clear_tables(columnar_dir)
+    results = {}
+    with ProcessPoolExecutor(max_workers=processes, initializer=init_worker,
+                             initargs=(fetch_and_save_data.base_url, rate_limit / processes, max_workers)) as executor:
+        futures = {state: executor.submit(run_state, state, max_workers, resume, chunk_size, columnar, columnar_dir)
+                   for state in states}
+        for state, future in futures.items():
+            try:
+                results[state] = future.result()
+                print(f"\n{state}: {results[state]['facilities']} facilities")
+            except Exception as e:
+                results[state] = f"failed: {e}"
+                print(f"\n{state}: failed: {e}")
+
+    succeeded = [state for state in states if isinstance(results[state], dict)]
+    for filename, rows in merge_csv_files(succeeded).items():
+        print(f"{rows} rows merged into {os.path.join('csv_output', filename)}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch, flatten and write each state in parallel processes")
+    parser.add_argument("--states", nargs="+", default=["AZ", "UT", "OR"])
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="States processed at the same time")
+    parser.add_argument("--workers", type=int, default=fetch_and_save_data.MAX_WORKERS,
+                        help="Concurrent requests in flight per process")
+    parser.add_argument("--rate-limit", type=int, default=fetch_and_save_data.RATE_LIMIT_PER_MINUTE,
+                        help="Requests per minute allowed by your API key, shared by all processes")
+    parser.add_argument("--base-url", default=fetch_and_save_data.base_url, help="RIDB base URL, e.g. a local mock server")
+    parser.add_argument("--resume", action="store_true", help="Continue interrupted states from their checkpoints")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Facilities flattened at a time")
+    parser.add_argument("--columnar", choices=["parquet", "arrow"],
+                        help="Also write typed Parquet or Arrow IPC files, partitioned by state (needs pyarrow)")
+    parser.add_argument("--columnar-dir", default=COLUMNAR_DIR)
+    args = parser.parse_args()
+    fetch_and_save_data.base_url = args.base_url
+
+    start_time = datetime.datetime.now()
+    results = run_pipeline(args.states, args.processes, args.workers, args.rate_limit, args.resume,
+                           args.chunk_size, args.columnar, args.columnar_dir)
+    if any(not isinstance(result, dict) or result["failed"] for result in results.values()):
+        print("Some states or requests failed, run again with --resume to fetch only the missing data.")
+    print(f"Time taken for the pipeline: {datetime.datetime.now() - start_time}")
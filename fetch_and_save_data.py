@@ -1,13 +1,154 @@
 import requests
 import json
 import os
-from config import RecGov_API_Key  #Config file with API key for Recreation.gov located in the same directory and redacted from GitHub using .gitignore
+import argparse
+import random
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from config import RecGov_API_Key  #Config file with API key for Recreation.gov located in the same directory and redacted from GitHub using .gitignore
+from rate_limiter import TokenBucket, parse_retry_after
+from jsonl_io import JsonlWriter
+from metrics import StageTimer
 import datetime
 
 base_url = 'https://ridb.recreation.gov/api/v1/'
 
-def fetch_ridb_data(api_key, endpoint, params=None, max_records=float('inf'), states = None, full=True):
+RATE_LIMIT_PER_MINUTE = 50  # RIDB allows 50 requests per minute per API key
+MAX_WORKERS = 8  # concurrent requests in flight, the rate limiter still caps the overall request rate
+MAX_RETRIES = 5  # times a request is retried after a 429, 5xx, timeout or connection error before giving up
+RETRY_BACKOFF = 2  # seconds before the first retry of a failed request, doubled on every attempt
+CHECKPOINT_DIR = os.path.join('json_output', 'checkpoints')
+
+# Keys the related data is stored under on each facility, matching the 'full' facility records
+RELATED_DATA_KEYS = {"campsites": "CAMPSITE", "activities": "ACTIVITY", "events": "EVENT"}
+
+def create_session(max_workers=MAX_WORKERS):
+    """Creates a requests.Session whose connection pool keeps a keep-alive connection for each worker thread."""
+    new_session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=max_workers)
+    new_session.mount("https://", adapter)
+    new_session.mount("http://", adapter)
+    return new_session
+
+# One session and one rate limiter shared by every request, from any thread
+session = create_session()
+rate_limiter = TokenBucket(RATE_LIMIT_PER_MINUTE, per=60)
+# Time spent in each stage, added up over all worker threads (so it can be more than the wall clock time)
+stage_timer = StageTimer("fetch_and_save_data")
+
+def rate_limited_get(url, headers, params=None, max_retries=MAX_RETRIES):
+    """Sends a GET request through the shared session once the shared rate limiter allows it.
+
+    On HTTP 429 the limiter backs off (honoring Retry-After) for every thread and the request is retried.
+    Timeouts, connection errors and 5xx responses are retried after an exponential backoff with jitter.
+
+    Args:
+        url: The URL to request.
+        headers: The request headers, including the apikey.
+        params: A dictionary of query parameters.
+        max_retries: How many failed attempts to retry before raising.
+
+    Returns:
+        The successful requests.Response.
+
+    Raises:
+        requests.exceptions.RequestException: On connection errors or a non-2xx response.
+    """
+    for attempt in range(max_retries + 1):
+        with stage_timer.stage("rate_limit_wait"):
+            rate_limiter.acquire() # wait for our turn under the shared rate limit
+        try:
+            with stage_timer.stage("http_request", items=1):
+                response = session.get(url, headers=headers, params=params, timeout = 30)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt == max_retries:
+                raise
+            delay = RETRY_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5)
+            print(f"\nRequest failed ({e}), retrying in {delay:.1f}s")
+            with stage_timer.stage("retry_backoff"):
+                time.sleep(delay)
+            continue
+        if response.status_code == 429 and attempt < max_retries:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            rate_limiter.backoff(retry_after)
+            print(f"\nRate limited (429), retrying in {retry_after or 'a moment'}s at {rate_limiter.rate_per_minute:.0f} requests/min")
+            continue
+        if response.status_code >= 500 and attempt < max_retries:
+            delay = RETRY_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5)
+            print(f"\nServer error ({response.status_code}), retrying in {delay:.1f}s")
+            with stage_timer.stage("retry_backoff"):
+                time.sleep(delay)
+            continue
+        response.raise_for_status()
+        rate_limiter.record_success()
+        return response
+
+class CheckpointLog:
+    """Append-only on-disk log of completed work, so an interrupted fetch can resume where it stopped.
+
+    Every fetched page of facilities and every facility's related data is appended as one JSON line as soon as it
+    arrives.  On resume the logs are replayed: finished states are skipped, unfinished ones continue from their
+    next offset, and facilities whose related data is already logged are not requested again.
+
+    Args:
+        directory: Where the log files are kept.
+        resume: Replay the existing logs instead of starting over.
+    """
+
+    def __init__(self, directory=CHECKPOINT_DIR, resume=False):
+        self.pages_file = os.path.join(directory, "facility_pages.jsonl")
+        self.related_file = os.path.join(directory, "related_data.jsonl")
+        self.lock = threading.Lock()
+        self.failed = False  # set when a request gave up, so the logs are kept for a --resume run
+        os.makedirs(directory, exist_ok=True)
+        if not resume:
+            self.clear()
+
+        self.pages = {}  # page key -> {"records": [...], "next_offset": int, "done": bool}
+        for entry in self._read(self.pages_file):
+            progress = self.pages.setdefault(entry["key"], {"records": [], "next_offset": 0, "done": False})
+            progress["records"].extend(entry["records"])
+            progress["next_offset"] = entry["next_offset"]
+            progress["done"] = entry["done"]
+        self.related = {(entry["FacilityID"], entry["endpoint"]): entry["records"] for entry in self._read(self.related_file)}
+
+    @staticmethod
+    def page_key(endpoint, state, params):
+        return f"{endpoint}|{state}|{json.dumps(params, sort_keys=True)}"
+
+    def _read(self, path):
+        if not os.path.exists(path):
+            return
+        with open(path) as infile:
+            for line in infile:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    break  # a line cut short by a crash, everything after it is redone
+
+    def _append(self, path, entry):
+        with stage_timer.stage("checkpoint_write", items=len(entry["records"])):
+            line = json.dumps(entry) + "\n"
+            with self.lock:
+                with open(path, 'a') as outfile:
+                    outfile.write(line)
+                    outfile.flush()
+                    os.fsync(outfile.fileno())
+
+    def record_page(self, key, records, next_offset, done):
+        self._append(self.pages_file, {"key": key, "records": records, "next_offset": next_offset, "done": done})
+
+    def record_related(self, facility_id, endpoint, records):
+        self._append(self.related_file, {"FacilityID": facility_id, "endpoint": endpoint, "records": records})
+
+    def clear(self):
+        for path in (self.pages_file, self.related_file):
+            if os.path.exists(path):
+                os.remove(path)
+
+def fetch_ridb_data(api_key, endpoint, params=None, max_records=float('inf'), states = None, full=True, raise_errors=False, checkpoint=None):
     """Fetches data from the Recreation.gov API for various endpoints, handling pagination and rate limits.
 
     Args:
@@ -17,6 +158,8 @@ def fetch_ridb_data(api_key, endpoint, params=None, max_records=float('inf'), st
         max_records: The maximum number of records to fetch in total.
         states: A list of states to pull data from.
         full: boolean, if it should pull the full record or not.
+        raise_errors: Re-raise request errors instead of returning the partial data fetched so far.
+        checkpoint: An optional CheckpointLog that pages are logged to and resumed from.
     Returns:
         A list of dictionaries representing the data from the API.
     """
@@ -27,11 +170,18 @@ def fetch_ridb_data(api_key, endpoint, params=None, max_records=float('inf'), st
     }
     all_data = []
     limit = 200
-    rate_limit_delay = 1.1
     if states is None:
         states = ["AZ"]
     for state in states:
       offset = 0
+      page_key = CheckpointLog.page_key(endpoint, state, params)
+      if checkpoint and page_key in checkpoint.pages:
+          progress = checkpoint.pages[page_key]
+          all_data.extend(progress["records"])
+          offset = progress["next_offset"]
+          print(f"Resuming state {state} from checkpoint: {len(progress['records'])} records, offset {offset}")
+          if progress["done"]:
+              continue
       while len(all_data) < max_records:
           current_params = {
             'limit': limit,
@@ -48,9 +198,9 @@ def fetch_ridb_data(api_key, endpoint, params=None, max_records=float('inf'), st
           print(f"Request URL: {url_string}")
 
           try:
-              response = requests.get(full_url, headers=headers, params=current_params, timeout = 30)
-              response.raise_for_status()
-              data = response.json()
+              response = rate_limited_get(full_url, headers, current_params)
+              with stage_timer.stage("parse_json"):
+                  data = response.json()
 
               if not data or "RECDATA" not in data:
                   print(f"No RECDATA found at offset {offset}. Ending for state {state}")
@@ -58,15 +208,21 @@ def fetch_ridb_data(api_key, endpoint, params=None, max_records=float('inf'), st
 
               all_data.extend(data["RECDATA"])
               offset += limit
-              time.sleep(rate_limit_delay) # pause to comply with rate limit
               current_time = datetime.datetime.now().strftime("%H:%M:%S")  # Time Stamp
               print(f"... {current_time}", end="", flush=True) # added print statement
 
-              if data.get("METADATA", {}).get("RESULTS", {}).get("CURRENT_COUNT", 0) < limit:
+              last_page = data.get("METADATA", {}).get("RESULTS", {}).get("CURRENT_COUNT", 0) < limit
+              if checkpoint:
+                  checkpoint.record_page(page_key, data["RECDATA"], offset, last_page)
+              if last_page:
                     print(f"No more records available at offset {offset} for state {state}. Ending.")
                     break
           except requests.exceptions.RequestException as e:
             print(f"Error during API request at offset {offset}: {e}")
+            if checkpoint:
+                checkpoint.failed = True
+            if raise_errors:
+                raise
             break
 
           if len(all_data) >= max_records:
@@ -75,7 +231,7 @@ def fetch_ridb_data(api_key, endpoint, params=None, max_records=float('inf'), st
 
     return all_data
 
-def fetch_ridb_related_data(api_key, endpoint, facility_id, params=None):
+def fetch_ridb_related_data(api_key, endpoint, facility_id, params=None, raise_errors=False):
     """Fetches related data from the Recreation.gov API for a specific facility.
 
     Args:
@@ -83,6 +239,7 @@ def fetch_ridb_related_data(api_key, endpoint, facility_id, params=None):
         endpoint: The API endpoint to hit (e.g., 'activities', 'campsites').
         facility_id: The ID of the facility to fetch data for.
         params: A dictionary of query parameters.
+        raise_errors: Re-raise request errors instead of returning an empty list.
     
     Returns:
         A list of dictionaries representing the data from the API.
@@ -93,25 +250,10 @@ def fetch_ridb_related_data(api_key, endpoint, facility_id, params=None):
     }
     
     full_url = f"{base_url}facilities/{facility_id}/{endpoint}"
-    request_counter = 0 # Added counter to track requests
-    start_time = time.time() # start time
-    rate_limit = 50 # set the limit
-    rate_limit_delay = 1 # set a minimum delay of 1 second for the rate limiting
     try:
-      response = requests.get(full_url, headers=headers, params=params, timeout = 30)
-      response.raise_for_status()
-      data = response.json()
-      
-      
-      request_counter += 1 # increment counter
-
-      elapsed_time = time.time() - start_time # calculate elapsed time.
-      if  request_counter > rate_limit and elapsed_time < 1 : # limit to 50 requests per second
-            sleep_time = rate_limit_delay - elapsed_time # find how much we need to sleep.
-            if sleep_time > 0: # only sleep if we need to.
-                time.sleep(sleep_time)
-            start_time = time.time() # set new start time
-            request_counter = 0 # reset the counter
+      response = rate_limited_get(full_url, headers, params)
+      with stage_timer.stage("parse_json"):
+          data = response.json()
 
       if data and "RECDATA" in data:
         return data["RECDATA"]
@@ -119,47 +261,152 @@ def fetch_ridb_related_data(api_key, endpoint, facility_id, params=None):
         return [] # return empty list
     except requests.exceptions.RequestException as e:
       print(f"Error during API request: {e}")
+      if raise_errors:
+          raise
       return []
 
+def fetch_states_concurrently(api_key, endpoint, params=None, states=None, full=True, max_workers=MAX_WORKERS, checkpoint=None):
+    """Fetches each state's pages on its own thread and combines the results in the order of states.
+
+    Args:
+        api_key: Your Recreation.gov API key.
+        endpoint: The API endpoint to hit (e.g., 'facilities').
+        params: A dictionary of query parameters.
+        states: A list of states to pull data from.
+        full: boolean, if it should pull the full record or not.
+        max_workers: The maximum number of states fetched at the same time.
+        checkpoint: An optional CheckpointLog that pages are logged to and resumed from.
+
+    Returns:
+        A list of dictionaries representing the data from the API.
+    """
+    if states is None:
+        states = ["AZ"]
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(states)))) as executor:
+        results = executor.map(lambda state: fetch_ridb_data(api_key, endpoint, params, states=[state], full=full, checkpoint=checkpoint), states)
+        return [record for state_data in results for record in state_data]
+
+def fetch_related_data_concurrently(api_key, facilities_data, endpoints=("campsites",), max_workers=MAX_WORKERS, raise_errors=False, checkpoint=None, on_complete=None):
+    """Fetches related data for every facility with a thread pool and stores it on the facility records.
+
+    Args:
+        api_key: Your Recreation.gov API key.
+        facilities_data: The list of facility dictionaries from fetch_ridb_data, updated in place.
+        endpoints: The related endpoints to fetch for each facility (keys of RELATED_DATA_KEYS).
+        max_workers: The maximum number of requests in flight at the same time.
+        raise_errors: Re-raise the first request error instead of storing an empty list for that facility.
+        checkpoint: An optional CheckpointLog; logged facilities are filled from it and new results are logged to it.
+        on_complete: Optional callback given each facility (with its related data) as soon as all of its endpoints
+            are done.  When set, the related data is handed to the callback instead of being kept on facilities_data,
+            so memory does not grow with the number of campsites.
+
+    Returns:
+        The facilities_data list, with e.g. facility['CAMPSITE'] filled in unless on_complete was given.
+    """
+    pending = {}  # id(facility) -> {key: records} collected so far
+    remaining = {}  # id(facility) -> endpoints still in flight
+
+    def store(facility, endpoint, records):
+        pending[id(facility)][RELATED_DATA_KEYS[endpoint]] = records
+        remaining[id(facility)] -= 1
+        if remaining[id(facility)] == 0:
+            related = pending.pop(id(facility))
+            del remaining[id(facility)]
+            if on_complete:
+                on_complete({**facility, **related})
+            else:
+                facility.update(related)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        jobs = {}
+        for facility in facilities_data:
+            facility_id = facility.get("FacilityID")
+            if not facility_id:
+                if on_complete:
+                    on_complete(facility)
+                continue
+            pending[id(facility)] = {}
+            remaining[id(facility)] = len(endpoints)
+            for endpoint in endpoints:
+                if checkpoint and (facility_id, endpoint) in checkpoint.related:
+                    store(facility, endpoint, checkpoint.related[(facility_id, endpoint)])
+                    continue
+                future = executor.submit(fetch_ridb_related_data, api_key, endpoint, facility_id, raise_errors=True)
+                jobs[future] = (facility, endpoint)
+
+        total = len(jobs)
+        for count, future in enumerate(as_completed(jobs), start=1):
+            facility, endpoint = jobs.pop(future)
+            try:
+                records = future.result()
+                if checkpoint:
+                    checkpoint.record_related(facility["FacilityID"], endpoint, records)
+            except requests.exceptions.RequestException:
+                if raise_errors:
+                    raise
+                records = [] # not logged, so a --resume run asks for it again
+                if checkpoint:
+                    checkpoint.failed = True
+            store(facility, endpoint, records)
+            if count % 100 == 0 or count == total:
+                current_time = datetime.datetime.now().strftime("%H:%M:%S") # time stamp
+                print(f"... {count}/{total} {current_time}", end="", flush=True)
+    return facilities_data
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch facilities and their campsites from the RIDB API")
+    parser.add_argument("--states", nargs="+", default=["AZ", "UT", "OR"])
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="Concurrent requests in flight")
+    parser.add_argument("--rate-limit", type=int, default=RATE_LIMIT_PER_MINUTE, help="Requests per minute allowed by your API key")
+    parser.add_argument("--base-url", default=base_url, help="RIDB base URL, e.g. a local mock server")
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted run from its checkpoints")
+    parser.add_argument("--output", default=os.path.join('json_output', 'facilities_data.jsonl'),
+                        help="JSONL output file, add .gz or .zst to compress it")
+    parser.add_argument("--metrics-file", help="Also write the stage timings to this file in the Prometheus text format")
+    args = parser.parse_args()
+    base_url = args.base_url
+    session = create_session(args.workers)
+    rate_limiter = TokenBucket(args.rate_limit, per=60)
+    checkpoint = CheckpointLog(CHECKPOINT_DIR, resume=args.resume)
+
     # Example 1: Fetching facilities
     facilities_params = {
       'lastupdated': '10-01-2018',
     }
     facilities_endpoint = 'facilities'
-    states = ["AZ", "UT","OR"] # added a list of states
-    facilities_data = fetch_ridb_data(RecGov_API_Key, facilities_endpoint, facilities_params, states = states) # Used states and added max records
+    with stage_timer.stage("fetch_facilities"):
+        facilities_data = fetch_states_concurrently(RecGov_API_Key, facilities_endpoint, facilities_params, states = args.states, max_workers = args.workers, checkpoint = checkpoint)
    # Create a directory if it doesn't exist
-    data_dir = 'json_output'
-    if not os.path.exists(data_dir):
+    data_dir = os.path.dirname(args.output)
+    if data_dir and not os.path.exists(data_dir):
         os.makedirs(data_dir)
     
     if facilities_data:
-       # Save the raw JSON data to file
+      # Each facility is written to the JSONL file as soon as its related data is in
       print("Starting to fetch related data...", end="", flush=True) # output message
       start_time = datetime.datetime.now() # start time
-      for facility in facilities_data:
-          facility_id = facility.get("FacilityID")
-          if facility_id:
-            # activities = fetch_ridb_related_data(RecGov_API_Key, "activities", facility_id)
-            # facility['ACTIVITY'] = activities
-
-            campsites = fetch_ridb_related_data(RecGov_API_Key, "campsites", facility_id)
-            facility['CAMPSITE'] = campsites
-
-            # events = fetch_ridb_related_data(RecGov_API_Key, "events", facility_id)
-            # facility['EVENT'] = events
-            current_time = datetime.datetime.now().strftime("%H:%M:%S") # time stamp
-            print(f"... {current_time}", end="", flush=True)
-
-      output_file = os.path.join(data_dir, "facilities_data.json")
       try:
-          with open(output_file, 'w') as outfile:
-            json.dump(facilities_data, outfile, indent=4)
+          with JsonlWriter(args.output) as writer, stage_timer.stage("fetch_related"):
+            def write_facility(facility):
+                with stage_timer.stage("write_output", items=1):
+                    writer.write(facility)
+
+            # activities and events can be added to the endpoints, e.g. ("campsites", "activities")
+            fetch_related_data_concurrently(RecGov_API_Key, facilities_data, endpoints=("campsites",), max_workers=args.workers,
+                                            checkpoint=checkpoint, on_complete=write_facility)
 
-          print(f"\nRaw JSON data saved to: {output_file}")
+          print(f"\n{writer.count} facilities saved to: {args.output}")
           end_time = datetime.datetime.now() #calculate end time
           elapsed_time = end_time - start_time #calculate the time
           print(f"Time taken for fetching related data: {elapsed_time}") # Print the overall time.
-      except Exception as e:
-          print(f"Error while saving json file: {e}")
\ No newline at end of file
+          if checkpoint.failed:
+              print("Some requests failed, run again with --resume to fetch only the missing data.")
+          else:
+              checkpoint.clear()
+      except OSError as e:
+          print(f"Error while saving the output file: {e}")
+
+    print(f"\nTime per stage (summed over worker threads):\n{stage_timer.summary()}")
+    if args.metrics_file:
+        stage_timer.write_textfile(args.metrics_file)
+        print(f"Stage metrics written to: {args.metrics_file}")
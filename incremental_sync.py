@@ -0,0 +1,171 @@
+# Incremental (delta) sync of the LORD database from the RIDB API.
+# Instead of re-downloading everything and reloading the tables from scratch (SQL Files/query2.sql), this keeps a
+# high-water mark per endpoint/state in the "SyncState" table, asks RIDB only for facilities updated since then,
+# and upserts them (with their campsites, attributes, equipment and addresses) in a single transaction.
+# How to run:  "python incremental_sync.py --states AZ UT OR"  (the first run for a state fetches everything)
+import argparse
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg
+
+import fetch_and_save_data
+from config import DBpassword, RecGov_API_Key
+from create_dataframes import process_facilities_data
+from fetch_and_save_data import fetch_related_data_concurrently, fetch_ridb_data
+from load_to_postgres import copy_dataframe, get_table_columns, refresh_materialized_views
+from response_cache import bump_data_version, invalidate_api_cache
+
+# Database connection configuration
+DB_HOST = "localhost"
+DB_NAME = "LORD"
+DB_USER = "postgres"
+DB_PASSWORD = DBpassword  # Replace with your actual database password
+
+DEFAULT_LAST_UPDATED = datetime.date(2018, 10, 1)  # the date the full fetch has always used
+RIDB_DATE_FORMAT = "%m-%d-%Y"  # format of the lastupdated query parameter
+
+def get_db_connection():
+    return psycopg.connect(host=DB_HOST, dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD)
+
+def ensure_sync_state_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS "SyncState" (
+            "Endpoint" TEXT NOT NULL,
+            "State" TEXT NOT NULL,
+            "LastSynced" DATE NOT NULL,
+            CONSTRAINT "pk_SyncState" PRIMARY KEY ("Endpoint", "State")
+        )
+    """)
+
+def get_high_water_marks(conn, endpoint, states):
+    """Returns a dictionary of state -> date of the last successful sync, defaulting to DEFAULT_LAST_UPDATED."""
+    rows = conn.execute(
+        """SELECT "State", "LastSynced" FROM "SyncState" WHERE "Endpoint" = %s AND "State" = ANY(%s)""",
+        [endpoint, list(states)],
+    ).fetchall()
+    marks = dict(rows)
+    return {state: marks.get(state, DEFAULT_LAST_UPDATED) for state in states}
+
+def set_high_water_mark(conn, endpoint, state, synced_on):
+    conn.execute(
+        """INSERT INTO "SyncState" ("Endpoint", "State", "LastSynced") VALUES (%s, %s, %s)
+           ON CONFLICT ("Endpoint", "State") DO UPDATE SET "LastSynced" = EXCLUDED."LastSynced" """,
+        [endpoint, state, synced_on],
+    )
+
+def upsert_table(conn, df, table, key):
+    """Inserts or updates the rows of df in table, matching on the primary key column key."""
+    if df.empty:
+        return 0
+    conn.execute(f'CREATE TEMP TABLE "stage_{table}" (LIKE "{table}")')
+    copy_dataframe(conn, df, f"stage_{table}")
+    table_columns = list(get_table_columns(conn, table).values())
+    column_list = ", ".join(f'"{column}"' for column in table_columns)
+    updates = ", ".join(f'"{column}" = EXCLUDED."{column}"' for column in table_columns if column != key)
+    conn.execute(f"""
+        INSERT INTO "{table}" ({column_list}) SELECT {column_list} FROM "stage_{table}"
+        ON CONFLICT ("{key}") DO UPDATE SET {updates}
+    """)
+    conn.execute(f'DROP TABLE "stage_{table}"')
+    return len(df)
+
+def apply_delta(conn, facilities_data, related_endpoints):
+    """Upserts changed facilities and replaces their child rows, inside the caller's transaction.
+
+    Args:
+        conn: An open psycopg connection.
+        facilities_data: The changed facility records, with related data already attached.
+        related_endpoints: The related endpoints that were fetched; child tables of endpoints that were not fetched are left alone.
+
+    Returns:
+        A dictionary of table -> rows written.
+    """
+    (facilities_df, activities_df, campsites_df, permitted_equipment_df,
+     campsite_attributes_df, facility_address_df) = process_facilities_data(facilities_data)
+    facility_ids = facilities_df["FacilityID"].dropna().tolist()
+    written = {"Facilities": upsert_table(conn, facilities_df, "Facilities", "FacilityID")}
+
+    conn.execute("""DELETE FROM "FacilityAddresses" WHERE "FacilityID" = ANY(%s)""", [facility_ids])
+    written["FacilityAddresses"] = copy_dataframe(conn, facility_address_df, "FacilityAddresses")
+
+    if "activities" in related_endpoints:
+        conn.execute("""DELETE FROM "Activities" WHERE "FacilityID" = ANY(%s)""", [facility_ids])
+        written["Activities"] = copy_dataframe(conn, activities_df, "Activities")
+
+    if "campsites" in related_endpoints:
+        # Child rows of every campsite of a changed facility are replaced, then campsites that disappeared are removed
+        for child_table in ("CampSiteAttribute", "PermittedEquipment"):
+            conn.execute(f"""
+                DELETE FROM "{child_table}" WHERE "CampsiteID" IN
+                    (SELECT "CampsiteID" FROM "Campsites" WHERE "FacilityID" = ANY(%s))
+            """, [facility_ids])
+        campsite_ids = campsites_df["CampsiteID"].dropna().tolist() if not campsites_df.empty else []
+        conn.execute("""DELETE FROM "Campsites" WHERE "FacilityID" = ANY(%s) AND NOT ("CampsiteID" = ANY(%s))""",
+                     [facility_ids, campsite_ids])
+        written["Campsites"] = upsert_table(conn, campsites_df, "Campsites", "CampsiteID")
+        written["CampSiteAttribute"] = copy_dataframe(conn, campsite_attributes_df, "CampSiteAttribute")
+        written["PermittedEquipment"] = copy_dataframe(conn, permitted_equipment_df, "PermittedEquipment")
+    return written
+
+def fetch_state_delta(state, since):
+    """Fetches the facilities of one state updated on or after since, raising if any request fails."""
+    params = {"lastupdated": since.strftime(RIDB_DATE_FORMAT)}
+    return fetch_ridb_data(RecGov_API_Key, "facilities", params, states=[state], raise_errors=True)
+
+def incremental_sync(states, related_endpoints=("campsites",), max_workers=fetch_and_save_data.MAX_WORKERS):
+    """Fetches and upserts everything changed since each state's high-water mark.
+
+    A state's mark only moves forward when its delta is committed, so a failed run is simply repeated next time.
+
+    Returns:
+        A dictionary of state -> rows written per table (or the error message for states that failed).
+    """
+    synced_on = datetime.datetime.now(datetime.timezone.utc).date()  # marks are the day the fetch started
+    with get_db_connection() as conn:
+        ensure_sync_state_table(conn)
+        conn.commit()
+        marks = get_high_water_marks(conn, "facilities", states)
+
+    results = {}
+    deltas = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(states)))) as executor:
+        futures = {state: executor.submit(fetch_state_delta, state, marks[state]) for state in states}
+        for state, future in futures.items():
+            try:
+                deltas[state] = future.result()
+                print(f"\n{state}: {len(deltas[state])} facilities changed since {marks[state]}")
+            except Exception as e:
+                results[state] = f"fetch failed: {e}"
+
+    changed = [facility for state in deltas for facility in deltas[state]]
+    if changed:
+        fetch_related_data_concurrently(RecGov_API_Key, changed, endpoints=related_endpoints,
+                                        max_workers=max_workers, raise_errors=True)
+
+    with get_db_connection() as conn:
+        for state, facilities_data in deltas.items():
+            results[state] = apply_delta(conn, facilities_data, related_endpoints) if facilities_data else {}
+            set_high_water_mark(conn, "facilities", state, synced_on)
+        if changed:
+            refresh_materialized_views(conn)  # e.g. "FacilitiesWithState", committed together with the delta
+            bump_data_version(conn)
+        conn.commit()
+
+    if changed:
+        invalidate_api_cache()
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch and upsert RIDB facilities changed since the last sync")
+    parser.add_argument("--states", nargs="+", default=["AZ", "UT", "OR"])
+    parser.add_argument("--workers", type=int, default=fetch_and_save_data.MAX_WORKERS)
+    parser.add_argument("--base-url", default=fetch_and_save_data.base_url, help="RIDB base URL, e.g. a local mock server")
+    args = parser.parse_args()
+    fetch_and_save_data.base_url = args.base_url
+    fetch_and_save_data.session = fetch_and_save_data.create_session(args.workers)
+
+    start_time = datetime.datetime.now()
+    for state, result in incremental_sync(args.states, max_workers=args.workers).items():
+        print(f"{state}: {result}")
+    print(f"Time taken for the incremental sync: {datetime.datetime.now() - start_time}")
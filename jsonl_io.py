@@ -0,0 +1,55 @@
+# Newline-delimited JSON (JSONL) files, optionally gzip (.gz) or zstd (.zst) compressed.  Records are written one per
+# line as they arrive and read back one at a time, so neither the fetch nor the DataFrame stage has to hold the whole
+# dataset in memory.  zstd needs "pip install zstandard".
+import gzip
+import io
+import json
+import threading
+
+def open_text(path, mode):
+    """Opens path for reading ('r') or writing ('w') text, picking the compression from the file extension."""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    if path.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Reading or writing .zst files requires the zstandard package: pip install zstandard")
+        raw = open(path, mode + "b")
+        if mode == "w":
+            stream = zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+        else:
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+class JsonlWriter:
+    """Writes records to a JSONL file one line at a time; safe to call from several threads."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open_text(path, "w")
+        self.lock = threading.Lock()
+        self.count = 0
+
+    def write(self, record):
+        line = json.dumps(record) + "\n"
+        with self.lock:
+            self.file.write(line)
+            self.count += 1
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def read_jsonl(path):
+    """Yields the records of a JSONL file one at a time."""
+    with open_text(path, "r") as infile:
+        for line in infile:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,219 @@
+# Bulk loader from the ETL straight into the LORD database.
+# Replaces exporting CSVs and importing them by hand after running SQL Files/query2.sql: the fetched facilities are
+# flattened a chunk at a time and each DataFrame is streamed with COPY FROM STDIN into a staging copy of its table.
+# Once every chunk is in, the staging tables are swapped in for the live ones in the same transaction, so the API
+# keeps reading the old data until the commit and never sees half-loaded tables.
+# How to run:  "python load_to_postgres.py --input json_output/facilities_data.jsonl"  (the tables must already exist)
+#              or, from the typed files of "create_dataframes.py --columnar parquet":  "python load_to_postgres.py --columnar parquet"
+import argparse
+import datetime
+import os
+
+import pandas as pd
+import psycopg
+
+from columnar_io import COLUMNAR_DIR, iter_table_batches
+from config import DBpassword
+from create_dataframes import CHUNK_SIZE, process_facilities_data, read_facilities_in_chunks
+from response_cache import bump_data_version, invalidate_api_cache
+
+# Database connection configuration
+DB_HOST = "localhost"
+DB_NAME = "LORD"
+DB_USER = "postgres"
+DB_PASSWORD = DBpassword  # Replace with your actual database password
+
+# Table loaded from each DataFrame returned by process_facilities_data, in the same order
+LOAD_TABLES = ["Facilities", "Activities", "Campsites", "PermittedEquipment", "CampSiteAttribute", "FacilityAddresses"]
+STAGING_SUFFIX = "_staging"
+
+def get_db_connection():
+    return psycopg.connect(host=DB_HOST, dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD)
+
+def get_table_columns(conn, table):
+    """Returns a dictionary of stripped column name -> actual column name (the schema has a "MaxLength " column).
+
+    Generated columns such as "AdaAccessible" are left out, Postgres computes them and COPY cannot write them.
+    """
+    rows = conn.execute(
+        """SELECT column_name FROM information_schema.columns WHERE table_name = %s AND is_generated = 'NEVER'
+           ORDER BY ordinal_position""",
+        [table],
+    ).fetchall()
+    return {name.strip(): name for (name,) in rows}
+
+def clean_value(value):
+    """Converts a DataFrame cell to something COPY accepts: NaN becomes NULL and nested lists/dicts become text."""
+    if isinstance(value, (list, dict)):
+        return str(value)
+    if pd.isna(value):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)  # integer columns come back as floats when a chunk has missing values
+    if isinstance(value, pd.Timestamp):
+        return value.date()  # the LastUpdatedDate columns are DATE
+    return value
+
+def copy_dataframe(conn, df, table):
+    """Appends the rows of df to table with COPY FROM STDIN, using the columns the two have in common.
+
+    Returns:
+        The number of rows copied.
+    """
+    if df.empty:
+        return 0
+    table_columns = get_table_columns(conn, table)
+    columns = [column for column in df.columns if column.strip() in table_columns]
+    column_list = ", ".join(f'"{table_columns[column.strip()]}"' for column in columns)
+    with conn.cursor().copy(f'COPY "{table}" ({column_list}) FROM STDIN') as copy:
+        for row in df[columns].itertuples(index=False, name=None):
+            copy.write_row([clean_value(value) for value in row])
+    return len(df)
+
+def get_table_definitions(conn, table):
+    """Returns the statements that rebuild the keys, indexes and foreign keys of table.
+
+    LIKE does not copy foreign keys, and index names are unique per schema, so these are read from the live table
+    and re-run against the staging table once it has taken the live table's name.
+
+    Returns:
+        A tuple of (key and index statements, foreign key statements).
+    """
+    constraints = conn.execute("""
+        SELECT conname, pg_get_constraintdef(oid), contype FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'x', 'f') ORDER BY conname
+    """, [f'"{table}"']).fetchall()
+    indexes = conn.execute("""
+        SELECT pg_get_indexdef(indexrelid) FROM pg_index
+        WHERE indrelid = %s::regclass
+          AND indexrelid NOT IN (SELECT conindid FROM pg_constraint WHERE conrelid = %s::regclass)
+    """, [f'"{table}"', f'"{table}"']).fetchall()
+    keys = [f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" {definition}'
+            for name, definition, kind in constraints if kind != 'f']
+    keys += [definition for (definition,) in indexes]
+    foreign_keys = [f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" {definition}'
+                    for name, definition, kind in constraints if kind == 'f']
+    return keys, foreign_keys
+
+def get_dependent_views(conn, tables):
+    """Returns the statements that recreate the views and materialized views built on tables, with their indexes.
+
+    They have to be dropped before the live tables can be, and are recreated (so re-populated) after the swap.
+
+    Returns:
+        A tuple of (view names with their kind, statements recreating them).
+    """
+    views = conn.execute("""
+        SELECT DISTINCT view.oid, view.relname, view.relkind FROM pg_depend AS d
+        JOIN pg_rewrite AS r ON r.oid = d.objid
+        JOIN pg_class AS view ON view.oid = r.ev_class
+        WHERE d.classid = 'pg_rewrite'::regclass AND d.refobjid = ANY(%s::regclass[])
+          AND view.relkind IN ('v', 'm') AND view.oid <> d.refobjid
+        ORDER BY view.oid
+    """, [[f'"{table}"' for table in tables]]).fetchall()
+    names = []
+    statements = []
+    for oid, name, kind in views:
+        definition = conn.execute("SELECT pg_get_viewdef(%s)", [oid]).fetchone()[0]
+        kind = "MATERIALIZED VIEW" if kind == 'm' else "VIEW"
+        names.append((name, kind))
+        statements.append(f'CREATE {kind} "{name}" AS {definition}')
+        indexes = conn.execute("SELECT pg_get_indexdef(indexrelid) FROM pg_index WHERE indrelid = %s", [oid]).fetchall()
+        statements += [index for (index,) in indexes]
+    return names, statements
+
+def refresh_materialized_views(conn):
+    """Refreshes every materialized view, without blocking readers when it has a unique index."""
+    views = conn.execute("""
+        SELECT matviewname, EXISTS (SELECT 1 FROM pg_index WHERE indrelid = quote_ident(matviewname)::regclass AND indisunique)
+        FROM pg_matviews WHERE schemaname = current_schema()
+    """).fetchall()
+    for name, has_unique_index in views:
+        conn.execute(f'REFRESH MATERIALIZED VIEW {"CONCURRENTLY " if has_unique_index else ""}"{name}"')
+
+def create_staging_tables(conn, tables=LOAD_TABLES):
+    """Creates an empty staging copy of each table, without indexes so COPY does not have to maintain them."""
+    for table in tables:
+        conn.execute(f'DROP TABLE IF EXISTS "{table}{STAGING_SUFFIX}"')
+        conn.execute(f'CREATE TABLE "{table}{STAGING_SUFFIX}" (LIKE "{table}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED)')
+
+def swap_staging_tables(conn, tables=LOAD_TABLES):
+    """Replaces each live table with its staging table and rebuilds the keys, indexes, foreign keys and views.
+
+    Must run in the same transaction as the load: until the commit, readers keep seeing the old tables.
+    """
+    definitions = [get_table_definitions(conn, table) for table in tables]
+    views, view_statements = get_dependent_views(conn, tables)
+    for name, kind in reversed(views):
+        conn.execute(f'DROP {kind} "{name}"')
+    live_tables = ", ".join(f'"{table}"' for table in tables)
+    conn.execute(f"DROP TABLE {live_tables}")  # dropped together, so the foreign keys between them don't get in the way
+    for table in tables:
+        conn.execute(f'ALTER TABLE "{table}{STAGING_SUFFIX}" RENAME TO "{table}"')
+    for keys, _ in definitions:
+        for statement in keys:
+            conn.execute(statement)
+    for _, foreign_keys in definitions:  # after every primary key exists
+        for statement in foreign_keys:
+            conn.execute(statement)
+    for statement in view_statements:  # e.g. "FacilitiesWithState", populated from the new tables
+        conn.execute(statement)
+    for table in tables:
+        conn.execute(f'ANALYZE "{table}"')
+
+def load_tables(conn, frames):
+    """Streams DataFrames into the staging tables and swaps them in, inside the caller's transaction.
+
+    Args:
+        conn: An open psycopg connection; nothing is visible to other sessions until the caller commits.
+        frames: An iterable of (table, DataFrame) pairs; a table may appear any number of times.
+
+    Returns:
+        A dictionary of table -> rows loaded.
+    """
+    create_staging_tables(conn)
+    loaded = {table: 0 for table in LOAD_TABLES}
+    for table, df in frames:
+        loaded[table] += copy_dataframe(conn, df, f"{table}{STAGING_SUFFIX}")
+    swap_staging_tables(conn)
+    bump_data_version(conn)  # API workers drop their cached responses once this commits
+    return loaded
+
+def load_facilities(conn, chunks):
+    """Flattens chunks of facilities (e.g. read_facilities_in_chunks(input_file)) and loads them with load_tables."""
+    frames = ((table, df) for chunk in chunks for table, df in zip(LOAD_TABLES, process_facilities_data(chunk)))
+    return load_tables(conn, frames)
+
+def load_columnar(conn, input_dir=COLUMNAR_DIR, file_format="parquet"):
+    """Loads the Parquet or Arrow files written by create_dataframes.py --columnar with load_tables."""
+    frames = ((table, df) for table in LOAD_TABLES for df in iter_table_batches(table, input_dir, file_format))
+    return load_tables(conn, frames)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load the fetched facilities into the LORD database with COPY")
+    parser.add_argument("--input", default=os.path.join('json_output', 'facilities_data.jsonl'),
+                        help="Output of fetch_and_save_data.py (.jsonl, .jsonl.gz, .jsonl.zst or a legacy .json)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Facilities processed at a time")
+    parser.add_argument("--columnar", choices=["parquet", "arrow"],
+                        help="Load the files of create_dataframes.py --columnar from --columnar-dir instead of --input")
+    parser.add_argument("--columnar-dir", default=COLUMNAR_DIR)
+    args = parser.parse_args()
+
+    if args.columnar:
+        if not os.path.isdir(args.columnar_dir):
+            print(f"Error: {args.columnar_dir} not found. Please run create_dataframes.py --columnar {args.columnar} first.")
+            exit()
+    elif not os.path.exists(args.input):
+        print(f"Error: {args.input} not found. Please check that the script fetch_and_save_data.py was already run.")
+        exit()
+
+    start_time = datetime.datetime.now()
+    with get_db_connection() as conn:  # commits on success, rolls back (leaving the live tables untouched) on error
+        if args.columnar:
+            loaded = load_columnar(conn, args.columnar_dir, args.columnar)
+        else:
+            loaded = load_facilities(conn, read_facilities_in_chunks(args.input, args.chunk_size))
+    for table, rows in loaded.items():
+        print(f"{table}: {rows} rows loaded")
+    print(f"Time taken to load the database: {datetime.datetime.now() - start_time}")
+    invalidate_api_cache()
@@ -0,0 +1,196 @@
+# Counters, gauges and histograms in the Prometheus text format, shared by the API (/metrics) and the ETL scripts.
+# The ETL scripts time each of their stages with a StageTimer, print a summary at the end of a run and can write it
+# as a Prometheus textfile (e.g. for node_exporter's textfile collector) with --metrics-file.
+# Nothing to install: the exposition format is written directly instead of through prometheus_client.
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # seconds
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_labels(names, values, extra=""):
+    """Formats label names and values as {name="value",...}, with extra (e.g. 'le="0.5"') appended."""
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def format_number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """A named metric with optional labels, holding one value per combination of label values.
+
+    Args:
+        name: The metric name, e.g. 'lord_api_requests_total'.
+        documentation: The HELP text.
+        labelnames: Names of the labels every value is recorded with.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}  # tuple of label values -> value
+        self.lock = threading.Lock()
+
+    def set(self, labels, value):
+        """Sets the value for the tuple of label values labels, e.g. to a running total kept by another library."""
+        labels = tuple(labels)
+        with self.lock:
+            self.values[labels] = value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            for labels, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{format_labels(self.labelnames, labels)} {format_number(value)}")
+        return lines
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, labels=(), amount=1):
+        """Adds amount to the value for the tuple of label values labels."""
+        labels = tuple(labels)
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+class Gauge(Metric):
+    kind = "gauge"
+
+class Histogram(Metric):
+    """Counts observations into cumulative buckets, like a Prometheus histogram.
+
+    Args:
+        buckets: Upper bounds of the buckets, in increasing order; +Inf is added.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (math.inf,)
+
+    def observe(self, labels, value):
+        """Counts value into its bucket for the tuple of label values labels."""
+        labels = tuple(labels)
+        with self.lock:
+            counts, total = self.values.get(labels, ([0] * len(self.buckets), 0.0))
+            for position, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[position] += 1
+                    break
+            self.values[labels] = (counts, total + value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            for labels, (counts, total) in sorted(self.values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    bucket_labels = format_labels(self.labelnames, labels, f'le="{format_number(bound)}"')
+                    lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{self.name}_sum{format_labels(self.labelnames, labels)} {format_number(total)}")
+                lines.append(f"{self.name}_count{format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+class Registry:
+    """The metrics of one process, rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+class StageTimer:
+    """Accumulates the time, calls and items of each named stage of an ETL run, from any thread.
+
+    Args:
+        job: Name of the script, used as the job label, e.g. 'fetch_and_save_data'.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self.registry = Registry()
+        self.seconds = self.registry.counter("lord_etl_stage_seconds_total", "Time spent in each ETL stage", ("job", "stage"))
+        self.calls = self.registry.counter("lord_etl_stage_calls_total", "Times each ETL stage ran", ("job", "stage"))
+        self.items = self.registry.counter("lord_etl_stage_items_total", "Records handled by each ETL stage", ("job", "stage"))
+        self.stages = {}  # stage names in the order they first ran, for the summary
+
+    def add(self, stage, seconds, items=0):
+        """Records one run of stage that took seconds and handled items records."""
+        self.stages.setdefault(stage, None)
+        self.seconds.inc((self.job, stage), seconds)
+        self.calls.inc((self.job, stage))
+        if items:
+            self.items.inc((self.job, stage), items)
+
+    @contextmanager
+    def stage(self, stage, items=0):
+        """Times the block as one run of stage, e.g. "with stage_timer.stage('write_csv', len(df)):"."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start, items)
+
+    def timed_iter(self, stage, iterable):
+        """Yields from iterable, timing how long each item took to produce as one run of stage."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add(stage, time.perf_counter() - start)
+                return
+            self.add(stage, time.perf_counter() - start, len(item) if hasattr(item, "__len__") else 1)
+            yield item
+
+    def summary(self):
+        """Returns a table of seconds, calls and items per stage."""
+        lines = [f"{'stage':<24}{'seconds':>10}{'calls':>10}{'items':>12}"]
+        for stage in self.stages:
+            key = (self.job, stage)
+            lines.append(f"{stage:<24}{self.seconds.values.get(key, 0):>10.2f}{self.calls.values.get(key, 0):>10}"
+                         f"{self.items.values.get(key, 0):>12}")
+        return "\n".join(lines)
+
+    def write_textfile(self, path):
+        """Writes the counters in the Prometheus text format, replacing path atomically."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "w") as outfile:
+            outfile.write(self.registry.render())
+        os.replace(temporary_path, path)
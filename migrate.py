@@ -0,0 +1,77 @@
+# Applies the numbered SQL files in DBSetup/migrations/ to the LORD database, in order, each exactly once.
+# Applied versions are recorded in the "SchemaMigrations" table, so running this again only applies the new files.
+# Run it after creating the tables with "SQL Files/query2.sql" and after pulling new migrations.
+# How to run:  "python migrate.py"  (or "python migrate.py --list" to see what is applied and what is pending)
+import argparse
+import os
+
+import psycopg
+
+from config import DBpassword
+
+# Database connection configuration
+DB_HOST = "localhost"
+DB_NAME = "LORD"
+DB_USER = "postgres"
+DB_PASSWORD = DBpassword  # Replace with your actual database password
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'DBSetup', 'migrations')
+
+def get_db_connection():
+    return psycopg.connect(host=DB_HOST, dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD)
+
+def ensure_migrations_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS "SchemaMigrations" (
+            "Version" TEXT NOT NULL,
+            "AppliedAt" TIMESTAMPTZ NOT NULL DEFAULT now(),
+            CONSTRAINT "pk_SchemaMigrations" PRIMARY KEY ("Version")
+        )
+    """)
+
+def list_migrations(directory=MIGRATIONS_DIR):
+    """Returns (version, path) of every migration file, sorted by its number prefix (e.g. '003_api_join_indexes')."""
+    files = sorted(name for name in os.listdir(directory) if name.endswith(".sql"))
+    return [(name[:-len(".sql")], os.path.join(directory, name)) for name in files]
+
+def get_applied_versions(conn):
+    return {version for (version,) in conn.execute("""SELECT "Version" FROM "SchemaMigrations" """).fetchall()}
+
+def migrate(conn, directory=MIGRATIONS_DIR):
+    """Applies the pending migrations, each in its own transaction together with its "SchemaMigrations" row.
+
+    A failing migration is rolled back and stops the run; the ones before it stay applied.
+
+    Returns:
+        The list of versions applied.
+    """
+    ensure_migrations_table(conn)
+    applied = get_applied_versions(conn)
+    conn.commit()  # so each conn.transaction() below is a real transaction that commits on its own
+    newly_applied = []
+    for version, path in list_migrations(directory):
+        if version in applied:
+            continue
+        with open(path) as infile:
+            sql = infile.read()
+        with conn.transaction():
+            conn.execute(sql)
+            conn.execute("""INSERT INTO "SchemaMigrations" ("Version") VALUES (%s)""", [version])
+        print(f"Applied {version}")
+        newly_applied.append(version)
+    return newly_applied
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply the SQL migrations in DBSetup/migrations to the LORD database")
+    parser.add_argument("--list", action="store_true", help="Only show which migrations are applied and which are pending")
+    args = parser.parse_args()
+
+    with get_db_connection() as conn:
+        if args.list:
+            ensure_migrations_table(conn)
+            applied = get_applied_versions(conn)
+            for version, _ in list_migrations():
+                print(f"{'applied' if version in applied else 'pending'}  {version}")
+        else:
+            newly_applied = migrate(conn)
+            print(f"{len(newly_applied)} migrations applied" if newly_applied else "The database is up to date")
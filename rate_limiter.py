@@ -0,0 +1,98 @@
+# Rate limiting for the RIDB API.  RIDB allows a fixed number of requests per minute per API key, so every request
+# made by the fetcher (from any thread or coroutine) takes a token from one shared bucket before it is sent.
+# When RIDB still answers 429 the bucket pauses every caller for the Retry-After time and lowers its rate, then
+# creeps back up to the configured rate as requests succeed again.
+import asyncio
+import datetime
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+class TokenBucket:
+    """A thread-safe token bucket allowing `rate` requests every `per` seconds, with bursts of up to `capacity`.
+
+    Args:
+        rate: Requests allowed per `per` seconds.
+        per: Length of the rate window in seconds.
+        capacity: How many tokens can build up while idle.
+        backoff_factor: Multiplier applied to the rate on every 429 response.
+        min_rate: The rate never drops below this many requests per `per` seconds.
+        recovery: Fraction of the configured rate added back after each successful request.
+    """
+
+    def __init__(self, rate, per=60.0, capacity=1, backoff_factor=0.5, min_rate=1, recovery=0.02):
+        self.max_fill_rate = rate / per  # tokens added per second at full speed
+        self.fill_rate = self.max_fill_rate
+        self.min_fill_rate = min(min_rate / per, self.max_fill_rate)
+        self.backoff_factor = backoff_factor
+        self.recovery_step = self.max_fill_rate * recovery
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+        self.updated = now
+
+    def _try_take(self):
+        """Takes a token if one is available and returns 0, otherwise returns how long to wait before trying again."""
+        with self.lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return self.paused_until - now
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.fill_rate
+
+    def acquire(self):
+        """Blocks the calling thread until a token is available, then takes it."""
+        while True:
+            wait = self._try_take()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Waits without blocking the event loop until a token is available, then takes it."""
+        while True:
+            wait = self._try_take()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def backoff(self, retry_after=None):
+        """Slows down after a 429: pauses every caller for retry_after seconds (or one token interval) and lowers the rate."""
+        with self.lock:
+            now = time.monotonic()
+            self.fill_rate = max(self.min_fill_rate, self.fill_rate * self.backoff_factor)
+            delay = retry_after if retry_after is not None else 1 / self.fill_rate
+            self.paused_until = max(self.paused_until, now + delay)
+            self.tokens = 0
+            self.updated = max(now, self.paused_until)
+
+    def record_success(self):
+        """Moves the rate back toward the configured rate after a successful request."""
+        with self.lock:
+            self.fill_rate = min(self.max_fill_rate, self.fill_rate + self.recovery_step)
+
+    @property
+    def rate_per_minute(self):
+        return self.fill_rate * 60
+
+def parse_retry_after(value):
+    """Converts a Retry-After header (seconds or an HTTP date) to seconds, or None when missing or invalid."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
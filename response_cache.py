@@ -0,0 +1,176 @@
+# In-process response cache for the LORD API.  The data behind the read endpoints only changes when the ETL reloads
+# the database, so repeat queries are answered from memory and revalidated with ETags.  The loader calls
+# invalidate_api_cache() (POST /cache/invalidate) after a reload so clients never see stale data.
+# Every worker process (uvicorn --workers N) has its own cache and POST /cache/invalidate only reaches one of them, so
+# the loaders also bump the "DataVersion" row in the same transaction as the reload: each worker reads it every few
+# seconds and drops its cached responses when it changed.
+import hashlib
+import time
+from collections import OrderedDict
+
+import requests
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import Response
+
+# Kept by the loaders (load_to_postgres.load_tables and incremental_sync.py) and read by every API worker
+DATA_VERSION_TABLE = """
+    CREATE TABLE IF NOT EXISTS "DataVersion" (
+        "Id" BOOLEAN NOT NULL DEFAULT true CHECK ("Id"),
+        "Version" BIGINT NOT NULL,
+        "UpdatedAt" TIMESTAMPTZ NOT NULL DEFAULT now(),
+        CONSTRAINT "pk_DataVersion" PRIMARY KEY ("Id")
+    )
+"""
+DATA_VERSION_QUERY = """SELECT "Version" FROM "DataVersion" """
+
+class ResponseCache:
+    """A bounded LRU cache of serialized responses whose entries expire after ttl seconds.
+
+    Args:
+        max_entries: Most responses kept.
+        ttl: Seconds before an entry expires.
+        max_bytes: Most bytes of response bodies kept; a body larger than this is not cached at all.
+        version_check_interval: Seconds between two reads of the data version (see check_data_version).
+    """
+
+    def __init__(self, max_entries=256, ttl=3600, max_bytes=256 * 1024 * 1024, version_check_interval=5):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.size = 0  # bytes of the bodies stored
+        self.entries = OrderedDict()  # key -> (expires_at, etag, media_type, body, headers)
+        self.version_check_interval = version_check_interval
+        self.version_checked_at = None
+        self.data_version = None
+
+    def get(self, key):
+        """Returns the (etag, media_type, body, headers) tuple for key, or None when missing or expired."""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            self.remove(key)
+            return None
+        self.entries.move_to_end(key)  # most recently used goes to the back
+        return entry[1:]
+
+    def set(self, key, media_type, body, headers=None):
+        """Stores a response body, with the headers it must be sent with, and returns its (etag, media_type, body, headers) tuple.
+
+        Least recently used entries are evicted until both max_entries and max_bytes are respected.
+        """
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        headers = headers or {}
+        self.remove(key)
+        if len(body) > self.max_bytes:
+            return etag, media_type, body, headers  # served, but would push everything else out of the cache
+        self.entries[key] = (time.monotonic() + self.ttl, etag, media_type, body, headers)
+        self.size += len(body)
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)  # evict the least recently used
+            self.size -= len(evicted[3])
+        return etag, media_type, body, headers
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[3])
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+    async def check_data_version(self, read_version):
+        """Clears the cache when the data version changed, reading it with read_version at most every version_check_interval seconds.
+
+        Args:
+            read_version: Async function returning the current "DataVersion", or None when it cannot be read.
+        """
+        now = time.monotonic()
+        if self.version_checked_at is not None and now - self.version_checked_at < self.version_check_interval:
+            return
+        self.version_checked_at = now
+        version = await read_version()
+        if version is not None and version != self.data_version:
+            self.clear()
+            self.data_version = version
+
+# Response headers not kept with a cached body, they are set again when it is served.  The rest (Content-Encoding,
+# Vary, X-Total-Count, ...) is stored with it, the body being stored as sent, compressed or not.
+UNSTORED_HEADERS = ("content-length", "content-type", "etag", "x-cache")
+
+def cache_key(request):
+    """Builds the cache key from the path and the query parameters, sorted and with blank values dropped,
+    so ?ada_accessible=true&state=AZ and ?state=AZ&ada_accessible=true share an entry.  The Accept and
+    Accept-Encoding headers are part of the key, as the same query can be answered in another format or encoding."""
+    params = sorted((name, value) for name, value in request.query_params.multi_items() if value != "")
+    key = request.url.path + "?" + "&".join(f"{name}={value}" for name, value in params)
+    return f"{key}|{request.headers.get('accept', '')}|{request.headers.get('accept-encoding', '')}"
+
+def etag_matches(if_none_match, etag):
+    """Checks an If-None-Match header (which may list several, possibly weak, ETags) against etag."""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+class ResponseCacheMiddleware(BaseHTTPMiddleware):
+    """Serves GET requests for the given paths from a ResponseCache and answers If-None-Match with 304.
+
+    Args:
+        cache: The ResponseCache.
+        paths: Request paths whose responses are cached.
+        read_version: Optional async function returning the "DataVersion", so a reload clears the cache of every worker.
+    """
+
+    def __init__(self, app, cache, paths, read_version=None):
+        super().__init__(app)
+        self.cache = cache
+        self.paths = set(paths)
+        self.read_version = read_version
+
+    async def dispatch(self, request, call_next):
+        if request.method != "GET" or request.url.path not in self.paths:
+            return await call_next(request)
+
+        if self.read_version is not None:
+            await self.cache.check_data_version(self.read_version)
+        key = cache_key(request)
+        entry = self.cache.get(key)
+        cache_status = "HIT"
+        if entry is None:
+            response = await call_next(request)
+            if response.status_code != 200:
+                return response  # errors are never cached
+            body = b"".join([chunk async for chunk in response.body_iterator])
+            stored_headers = {name: value for name, value in response.headers.items() if name not in UNSTORED_HEADERS}
+            entry = self.cache.set(key, response.headers.get("content-type"), body, stored_headers)
+            cache_status = "MISS"
+
+        etag, media_type, body, stored_headers = entry
+        headers = {**stored_headers, "ETag": etag, "X-Cache": cache_status}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type=media_type, headers=headers)
+
+def bump_data_version(conn):
+    """Increments the "DataVersion" row, call it in the transaction that reloads the data so the API workers see both together."""
+    conn.execute(DATA_VERSION_TABLE)
+    conn.execute("""
+        INSERT INTO "DataVersion" ("Version") VALUES (1)
+        ON CONFLICT ("Id") DO UPDATE SET "Version" = "DataVersion"."Version" + 1, "UpdatedAt" = now()
+    """)
+
+def invalidate_api_cache(api_url="http://127.0.0.1:8000"):
+    """Asks a running API to drop its cached responses, call this after reloading the database.
+
+    Returns:
+        True if the API confirmed, False if it could not be reached (it will pick up new data when entries expire).
+    """
+    try:
+        response = requests.post(f"{api_url}/cache/invalidate", timeout=10)
+        response.raise_for_status()
+        return True
+    except requests.exceptions.RequestException as e:
+        print(f"Could not invalidate the API cache at {api_url}: {e}")
+        return False
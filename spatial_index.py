@@ -0,0 +1,102 @@
+# In-memory spatial index of facility locations, used by the API's /facilities/nearby and /facilities/bbox endpoints
+# when the database has no PostGIS.  Points are bucketed into a fixed latitude/longitude grid (like geohash cells),
+# so a radius or bounding-box query only looks at the few cells it overlaps instead of scanning every facility.
+# cluster_cell_degrees() and snap_bbox() size the cells /facilities/clusters groups facilities into for a map zoom level.
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180  # on the same sphere as haversine_km
+DEFAULT_CELL_DEGREES = 0.25  # about 28 km of latitude per cell
+TILE_SIZE_PIXELS = 256  # web map tiles, the whole world is 256 * 2**zoom pixels wide
+CLUSTER_CELL_PIXELS = 60  # on-screen width of a cluster cell, about the size of a marker cluster icon
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Returns the great-circle distance in kilometers between two points given in degrees."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def cluster_cell_degrees(zoom, cell_pixels=CLUSTER_CELL_PIXELS):
+    """Returns the size in degrees of a clustering cell that is about cell_pixels wide at a web map zoom level."""
+    return 360.0 * cell_pixels / (TILE_SIZE_PIXELS * 2 ** zoom)
+
+def snap_bbox(min_lat, min_lon, max_lat, max_lon, cell_degrees):
+    """Grows a box outward to whole cells of cell_degrees.
+
+    A cell is then never cut in two by the edge of the viewport, and slightly different viewports at the same zoom
+    ask for the same box (and hit the same cached response).
+
+    Returns:
+        A tuple of (min_lat, min_lon, max_lat, max_lon), clamped to the valid coordinates.
+    """
+    return (
+        max(-90.0, math.floor(min_lat / cell_degrees) * cell_degrees),
+        max(-180.0, math.floor(min_lon / cell_degrees) * cell_degrees),
+        min(90.0, math.ceil(max_lat / cell_degrees) * cell_degrees),
+        min(180.0, math.ceil(max_lon / cell_degrees) * cell_degrees),
+    )
+
+class GridIndex:
+    """A grid of cells of cell_degrees x cell_degrees, each holding the (id, lat, lon) points that fall inside it.
+
+    build() swaps in a whole new grid at once, so queries running on other threads never see a half-built index.
+    """
+
+    def __init__(self, cell_degrees=DEFAULT_CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self.cells = {}
+        self.size = 0
+
+    def cell(self, lat, lon):
+        return (math.floor(lat / self.cell_degrees), math.floor(lon / self.cell_degrees))
+
+    def build(self, points):
+        """Replaces the contents of the index with points, an iterable of (id, latitude, longitude)."""
+        cells = {}
+        size = 0
+        for point_id, lat, lon in points:
+            if lat is None or lon is None:
+                continue
+            cells.setdefault(self.cell(lat, lon), []).append((point_id, lat, lon))
+            size += 1
+        self.cells, self.size = cells, size
+
+    def _points_in_box(self, min_lat, min_lon, max_lat, max_lon):
+        cells = self.cells  # the grid being queried, even if build() swaps in a new one meanwhile
+        min_row, min_col = self.cell(min_lat, min_lon)
+        max_row, max_col = self.cell(max_lat, max_lon)
+        for row in range(min_row, max_row + 1):
+            for col in range(min_col, max_col + 1):
+                for point in cells.get((row, col), ()):
+                    if min_lat <= point[1] <= max_lat and min_lon <= point[2] <= max_lon:
+                        yield point
+
+    def within_bbox(self, min_lat, min_lon, max_lat, max_lon, limit=None):
+        """Returns the ids of the points inside the box (edges included), up to limit of them."""
+        ids = []
+        for point_id, _, _ in self._points_in_box(min_lat, min_lon, max_lat, max_lon):
+            ids.append(point_id)
+            if limit is not None and len(ids) >= limit:
+                break
+        return ids
+
+    def nearby(self, lat, lon, radius_km, limit=None):
+        """Returns (id, distance in km) of the points within radius_km of (lat, lon), nearest first.
+
+        Only the cells overlapping the bounding box of the circle are searched, then each point is checked with the
+        haversine distance.  Searches do not wrap around the antimeridian.
+        """
+        lat_delta = radius_km / KM_PER_DEGREE_LAT
+        min_lat, max_lat = max(-90.0, lat - lat_delta), min(90.0, lat + lat_delta)
+        widest = max(abs(min_lat), abs(max_lat))  # a degree of longitude is shortest at the highest latitude covered
+        if widest >= 89.9:
+            lon_delta = 180.0
+        else:
+            lon_delta = min(180.0, radius_km / (KM_PER_DEGREE_LAT * math.cos(math.radians(widest))))
+        found = []
+        for point_id, point_lat, point_lon in self._points_in_box(min_lat, lon - lon_delta, max_lat, lon + lon_delta):
+            distance = haversine_km(lat, lon, point_lat, point_lon)
+            if distance <= radius_km:
+                found.append((point_id, distance))
+        found.sort(key=lambda item: item[1])
+        return found[:limit] if limit is not None else found
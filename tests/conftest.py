@@ -0,0 +1,71 @@
+# Fixtures for the API tests: a throwaway "LORD_test" database (see benchmarks/postgres_fixture.py) with a handful of
+# rows, and a FastAPI TestClient of the API pointed at it.  Without a reachable Postgres server the tests are skipped.
+# How to run:  "python -m pytest tests"  (set PGHOST/PGPORT to use a server other than localhost:5432)
+import os
+import sys
+
+import psycopg
+import pytest
+from fastapi.testclient import TestClient
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "benchmarks"))
+import API_LORD_PGDB as api
+from load_to_postgres import DB_HOST, DB_PASSWORD, DB_USER
+from postgres_fixture import PostgresFixture
+
+TEST_DB_NAME = "LORD_test"
+
+# Facility 1 has two addresses (a physical and a mailing one, as 170 facilities in csv_output have), facility 2 has one
+SEED_SQL = """
+INSERT INTO "Facilities" ("FacilityID", "FacilityName", "FacilityLatitude", "FacilityLongitude", "FacilityAdaAccess", "Reservable")
+VALUES (1, 'Two Address Campground', 34.2, -111.6, 'Y', true),
+       (2, 'One Address Campground', 39.3, -111.7, 'N', false);
+
+INSERT INTO "FacilityAddresses" ("FacilityAddressID", "FacilityID", "AddressStateCode", "City")
+VALUES (11, 1, 'AZ', 'Payson'), (12, 1, 'AZ', 'Phoenix'), (21, 2, 'UT', 'Provo');
+
+INSERT INTO "Campsites" ("CampsiteID", "CampsiteName", "FacilityID", "TypeOfUse", "CampsiteReservable", "CampsiteAccessible")
+VALUES (101, 'Site A', 1, 'Overnight', true, false),
+       (102, 'Site B', 1, 'Overnight', true, true),
+       (103, 'Site C', 1, 'Day', false, false),
+       (201, 'Site D', 2, 'Overnight', true, false);
+
+INSERT INTO "CampSiteAttribute" ("CampsiteID", "AttributeName", "AttributeValue")
+VALUES (101, 'Shade', 'Yes'), (101, 'Pets Allowed', 'Yes'), (102, 'Shade', 'No'), (201, 'Shade', 'Yes');
+
+INSERT INTO "PermittedEquipment" ("CampsiteID", "EquipmentName", "MaxLength ")
+VALUES (101, 'Tent', 0), (102, 'RV', 35), (201, 'RV', 40);
+
+REFRESH MATERIALIZED VIEW "FacilitiesWithState";
+REFRESH MATERIALIZED VIEW "FacilitySearch";
+"""
+
+@pytest.fixture(scope="session")
+def database():
+    """Creates and seeds the test database, and drops it after the last test."""
+    server_kwargs = {"host": os.environ.get("PGHOST", DB_HOST), "port": int(os.environ.get("PGPORT", 5432)),
+                     "user": DB_USER, "password": DB_PASSWORD}
+    fixture = PostgresFixture(server_kwargs, TEST_DB_NAME)
+    try:
+        fixture.__enter__()
+    except psycopg.OperationalError as e:
+        pytest.skip(f"No Postgres server to test against: {e}")
+    try:
+        with psycopg.connect(**fixture.connection_kwargs()) as conn:
+            conn.execute(SEED_SQL)
+        yield fixture.connection_kwargs()
+    finally:
+        fixture.__exit__(None, None, None)
+
+@pytest.fixture(scope="session")
+def client(database):
+    api.pool.kwargs.update(database)
+    api.SLOW_QUERY_LOG_FILE = None  # the lifespan would open it in the working directory
+    with TestClient(api.app) as test_client:  # runs the lifespan, which opens the pool
+        yield test_client
+
+@pytest.fixture(autouse=True)
+def empty_response_cache():
+    api.response_cache.clear()
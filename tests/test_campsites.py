@@ -0,0 +1,25 @@
+def campsite_ids(response):
+    assert response.status_code == 200, response.text
+    return [campsite["CampsiteID"] for campsite in response.json()]
+
+def test_nested_campsites_once_per_campsite(client):
+    # Facility 1 has two addresses, its campsites must still come back once each
+    assert sorted(campsite_ids(client.get("/campsites?nested=true"))) == [101, 102, 103, 201]
+
+def test_nested_campsites_state_filter(client):
+    response = client.get("/campsites?nested=true&state=AZ")
+    assert sorted(campsite_ids(response)) == [101, 102, 103]
+    assert {campsite["AddressStateCode"] for campsite in response.json()} == {"AZ"}
+
+def test_nested_campsites_attributes(client):
+    campsites = {campsite["CampsiteID"]: campsite for campsite in client.get("/campsites?nested=true&state=AZ").json()}
+    assert campsites[101]["ATTRIBUTES"] == {"Shade": "Yes", "Pets Allowed": "Yes"}
+    assert campsites[103]["ATTRIBUTES"] == {}
+
+def test_query_next_after_with_reordered_fields(client):
+    # CampsiteID is not the first field, the header must still carry it and not the name
+    response = client.get("/campsites/query?fields=CampsiteName,CampsiteID&limit=2")
+    assert campsite_ids(response) == [101, 102]
+    assert response.headers["X-Next-After"] == "102"
+    next_page = client.get(f"/campsites/query?fields=CampsiteName,CampsiteID&limit=2&after={response.headers['X-Next-After']}")
+    assert campsite_ids(next_page) == [103, 201]
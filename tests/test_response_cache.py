@@ -0,0 +1,54 @@
+import asyncio
+
+import psycopg
+
+import API_LORD_PGDB as api
+from response_cache import ResponseCache, bump_data_version
+
+def test_byte_budget_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=10, max_bytes=10)
+    cache.set("a", "application/json", b"aaaaaa")
+    cache.set("b", "application/json", b"bbbbbb")
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+    assert cache.size == 6
+
+def test_body_over_byte_budget_is_not_stored():
+    cache = ResponseCache(max_entries=10, max_bytes=10)
+    cache.set("a", "application/json", b"aaa")
+    etag, _, body, _ = cache.set("big", "application/json", b"x" * 11)
+    assert body == b"x" * 11 and etag
+    assert cache.get("big") is None
+    assert cache.get("a") is not None
+    assert cache.size == 3
+
+def test_replacing_an_entry_keeps_the_size():
+    cache = ResponseCache(max_bytes=100)
+    cache.set("a", "application/json", b"12345")
+    cache.set("a", "application/json", b"123")
+    assert cache.size == 3
+
+def test_data_version_change_clears_the_cache():
+    cache = ResponseCache(version_check_interval=0)
+    versions = iter([1, 1, 2])
+
+    async def read_version():
+        return next(versions)
+
+    asyncio.run(cache.check_data_version(read_version))
+    cache.set("a", "application/json", b"data")
+    asyncio.run(cache.check_data_version(read_version))
+    assert cache.get("a") is not None
+    asyncio.run(cache.check_data_version(read_version))
+    assert cache.get("a") is None
+
+def test_reload_clears_the_api_cache(client, database):
+    api.response_cache.version_check_interval = 0
+    try:
+        assert client.get("/facilities?state=UT").headers["X-Cache"] == "MISS"
+        assert client.get("/facilities?state=UT").headers["X-Cache"] == "HIT"
+        with psycopg.connect(**database) as conn:
+            bump_data_version(conn)  # what the loaders do in their reload transaction
+        assert client.get("/facilities?state=UT").headers["X-Cache"] == "MISS"
+    finally:
+        api.response_cache.version_check_interval = api.CACHE_VERSION_CHECK
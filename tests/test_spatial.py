@@ -0,0 +1,24 @@
+import psycopg
+
+import API_LORD_PGDB as api
+from response_cache import bump_data_version
+
+def nearby_ids(client, lat, lon):
+    response = client.get(f"/facilities/nearby?lat={lat}&lon={lon}&radius_km=10")
+    assert response.status_code == 200, response.text
+    return [facility["FacilityID"] for facility in response.json()]
+
+def test_reload_rebuilds_the_spatial_index(client, database, monkeypatch):
+    monkeypatch.setattr(api, "CACHE_VERSION_CHECK", 0)
+    assert nearby_ids(client, 36.0, -112.0) == []  # builds the index
+    with psycopg.connect(**database) as conn:
+        conn.execute("""INSERT INTO "Facilities" ("FacilityID", "FacilityName", "FacilityLatitude", "FacilityLongitude")
+                        VALUES (3, 'New Campground', 36.0, -112.0)""")
+        bump_data_version(conn)  # what the loaders do in their reload transaction, without POST /cache/invalidate
+    try:
+        assert nearby_ids(client, 36.0, -112.0) == [3]
+    finally:
+        with psycopg.connect(**database) as conn:
+            conn.execute("""DELETE FROM "Facilities" WHERE "FacilityID" = 3""")
+            bump_data_version(conn)
+    assert nearby_ids(client, 36.0, -112.0) == []